@@ -0,0 +1,70 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, TypeVar
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 轮询客户端连接状态的间隔 (秒)
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+def sse(event: str, data: Any) -> str:
+    """
+    序列化为 SSE 帧
+    """
+    payload = json.dumps(jsonable_encoder(data), ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def cancel_on_disconnect(request: Request, events: AsyncGenerator[T, None]) -> AsyncIterator[T]:
+    """
+    转发上游事件，客户端断开时取消上游生成
+    上游在单独的任务中完整迭代 (ContextVar 中的计量器与追踪 Span 在整个生成过程中保持一致)，
+    断开后取消该任务，取消沿调用链传递到模型流式调用并关闭其连接，不再继续消耗 token。
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def produce():
+        try:
+            async for item in events:
+                await queue.put(item)
+        finally:
+            # 被取消时上游可能停在 yield 处 (生产者阻塞在队列写入)，显式关闭使其 finally
+            # (释放合并、结束 Span) 立即执行，而不是等到垃圾回收时调用方会话已关闭
+            await events.aclose()
+
+    async def watch():
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+    producer = asyncio.create_task(produce())
+    watcher = asyncio.create_task(watch())
+    getter = None
+    try:
+        while True:
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, producer, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            # 断开优先于待发送事件：客户端消费慢时队列总有事件就绪，否则断开永远不会被处理
+            if watcher in done:
+                logger.info(f"Client disconnected from {request.url.path}, generation cancelled")
+                return
+            if getter in done:
+                yield getter.result()
+                continue
+            getter.cancel()
+            # 上游结束：输出剩余事件，上游异常原样抛出
+            while not queue.empty():
+                yield queue.get_nowait()
+            producer.result()
+            return
+    finally:
+        for task in (producer, watcher, getter):
+            if task is not None:
+                task.cancel()
+        # 等待上游完成清理 (如 Span 结束、请求合并释放) 后再返回，调用方随后才关闭其数据库会话
+        await asyncio.gather(producer, watcher, return_exceptions=True)
@@ -1,6 +1,7 @@
 
-from fastapi import APIRouter, Depends, HTTPException, Body
-from typing import Any, List
+from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from datetime import date
+from typing import Any, Dict, List, Literal, Optional
 from uuid import UUID
 
 from app.api.deps import SessionDep, CurrentUser
@@ -11,13 +12,16 @@ from app.schemas.admin import (
     PolicyCreate, PolicyUpdate, PolicyResponse,
     AdminUserCreate, AdminUserUpdate, AdminUserResponse,
     SearchConfigResponse, UpdateSearchConfigRequest, GlobalSearchConfig,
-    AuditLogResponse, AuditExportRequest, AuditExportResponse, SystemHealthResponse
+    AuditLogResponse, AuditExportRequest, AuditExportResponse, SystemHealthResponse,
+    UsageSummaryItem
 )
-from app.schemas.document import KBCreate, KBUpdate, KBResponse
+from app.schemas.document import KBCreate, KBUpdate, KBResponse, DocumentResponse, DocumentClearanceUpdate
 from app.crud.crud_auth import auth_crud
 from app.crud.crud_gov import gov_crud
 from app.crud.crud_document import document_crud
+from app.core.tracing import tracer
 from app.services.admin_service import admin_service
+from app.services.search_config_service import search_config_service
 
 router = APIRouter()
 
@@ -164,6 +168,19 @@ async def delete_kb(
     await admin_service.delete_kb(db, id)
     return ApiResponse(data=True)
 
+@router.put("/documents/{id}/clearance", response_model=ApiResponse[DocumentResponse])
+async def update_document_clearance(
+    id: UUID,
+    body: DocumentClearanceUpdate,
+    db: SessionDep,
+    current_user: CurrentUser
+) -> Any:
+    """
+    文档重新定密 (文档与切片密级同步更新)
+    """
+    doc = await admin_service.update_document_clearance(db, id, body.clearance)
+    return ApiResponse(data=doc)
+
 
 # --- 4. QA 治理 (FAQ Governance) ---
 
@@ -193,7 +210,7 @@ async def create_manual_faq(
     db: SessionDep,
     current_user: CurrentUser
 ) -> Any:
-    faq = await gov_crud.create_faq(db, faq_in, status="APPROVED")
+    faq = await admin_service.create_faq(db, faq_in)
     c_map = {0: "非涉密", 1: "内部公开", 2: "秘密", 3: "机密"}
     return ApiResponse(data=FAQResponse(
         id=faq.id,
@@ -212,10 +229,7 @@ async def update_faq(
     db: SessionDep,
     current_user: CurrentUser
 ) -> Any:
-    faq = await gov_crud.get_faq(db, id)
-    if not faq:
-        raise HTTPException(status_code=404, detail="FAQ not found")
-    updated_faq = await gov_crud.update_faq(db, faq, faq_in)
+    updated_faq = await admin_service.update_faq(db, id, faq_in)
     c_map = {0: "非涉密", 1: "内部公开", 2: "秘密", 3: "机密"}
     return ApiResponse(data=FAQResponse(
         id=updated_faq.id,
@@ -254,6 +268,17 @@ async def reject_faq_route(
     await admin_service.reject_faq(db, id)
     return ApiResponse(data=True)
 
+@router.post("/faqs/embeddings/backfill", response_model=ApiResponse[int])
+async def backfill_faq_embeddings(
+    db: SessionDep,
+    current_user: CurrentUser
+) -> Any:
+    """
+    为存量已发布 FAQ 批量补齐问题向量，返回处理条数
+    """
+    count = await admin_service.backfill_faq_embeddings(db)
+    return ApiResponse(data=count)
+
 
 # --- 5. 合规策略 (DLP Policies) ---
 
@@ -304,18 +329,8 @@ async def get_search_config(
     db: SessionDep,
     current_user: CurrentUser
 ) -> Any:
-    config_data = await gov_crud.get_system_config(db, key="global_search_config")
-    
-    if not config_data:
-        default_config = GlobalSearchConfig(
-            strategy="hybrid",
-            tiers={"faq": True, "graph": True, "docs": True, "llm": True},
-            enhanced={"queryRewrite": True, "hyde": False, "stepback": True},
-            parameters={"topK": 5, "threshold": 0.75}
-        )
-        return ApiResponse(data=default_config)
-    
-    return ApiResponse(data=GlobalSearchConfig(**config_data))
+    config = await search_config_service.get_config(db)
+    return ApiResponse(data=config)
 
 @router.put("/search-config", response_model=ApiResponse[GlobalSearchConfig])
 async def update_search_config(
@@ -323,14 +338,8 @@ async def update_search_config(
     db: SessionDep,
     current_user: CurrentUser
 ) -> Any:
-    config_dict = req.config.model_dump()
-    updated_data = await gov_crud.upsert_system_config(
-        db, 
-        key="global_search_config", 
-        value=config_dict, 
-        description="Global RAG Search Parameters"
-    )
-    return ApiResponse(data=GlobalSearchConfig(**updated_data))
+    updated = await search_config_service.update_config(db, req.config)
+    return ApiResponse(data=updated)
 
 
 # --- 7. 审计日志 (Audit Logs) ---
@@ -392,3 +401,31 @@ async def check_system_health(
     """
     health = await admin_service.check_system_health(db)
     return ApiResponse(data=health)
+
+
+# --- 9. 资源消耗 (Usage) ---
+
+@router.get("/usage", response_model=ApiResponse[List[UsageSummaryItem]])
+async def get_usage_summary(
+    db: SessionDep,
+    current_user: CurrentUser,
+    group_by: Literal["user", "kb", "day"] = "day",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = Query(default=100, ge=1, le=1000)
+) -> Any:
+    """
+    按用户 / 知识库 / 日期聚合问答的 token 消耗与各阶段平均耗时
+    """
+    items = await admin_service.get_usage_summary(db, group_by, start_date, end_date, limit)
+    return ApiResponse(data=items)
+
+@router.get("/traces", response_model=ApiResponse[List[Dict[str, Any]]])
+async def get_recent_traces(
+    current_user: CurrentUser,
+    limit: int = Query(default=20, ge=1, le=200)
+) -> Any:
+    """
+    最近问答链路的阶段 Span (内存采集器，进程内有效)
+    """
+    return ApiResponse(data=tracer.recent(limit))
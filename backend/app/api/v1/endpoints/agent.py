@@ -1,7 +1,10 @@
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from typing import Any, List
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, List
 from app.api.deps import SessionDep, CurrentUser
+from app.api.streaming import cancel_on_disconnect, sse
 from app.schemas.common import ApiResponse
 from app.schemas.agent import (
     AgentWriteRequest, AgentOptimizeRequest, AgentFormatRequest, 
@@ -11,6 +14,8 @@ from app.schemas.agent import (
 from app.services.agent_service import agent_service
 from app.utils.file_converter import file_converter
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.post("/write", response_model=ApiResponse[str])
@@ -41,6 +46,49 @@ async def agent_optimize(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/write/stream")
+async def agent_write_stream(
+    req: AgentWriteRequest,
+    request: Request,
+    current_user: CurrentUser
+) -> StreamingResponse:
+    """
+    流式智能写作 (SSE)：token 事件推送增量文本，done 事件推送全文
+    """
+    return _text_stream(request, agent_service.stream_write(req))
+
+@router.post("/optimize/stream")
+async def agent_optimize_stream(
+    req: AgentOptimizeRequest,
+    request: Request,
+    current_user: CurrentUser
+) -> StreamingResponse:
+    """
+    流式文案优化 (SSE)
+    """
+    return _text_stream(request, agent_service.stream_optimize(req))
+
+def _text_stream(request: Request, deltas: AsyncIterator[str]) -> StreamingResponse:
+    """
+    将模型增量文本转换为 SSE 响应，客户端断开时取消生成
+    """
+    async def event_stream() -> AsyncIterator[str]:
+        parts: List[str] = []
+        try:
+            async for delta in cancel_on_disconnect(request, deltas):
+                parts.append(delta)
+                yield sse("token", {"text": delta})
+            yield sse("done", {"content": "".join(parts)})
+        except Exception as e:
+            logger.exception("Agent streaming failed")
+            yield sse("error", {"message": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/format", response_model=ApiResponse[str])
 async def agent_format(
     req: AgentFormatRequest,
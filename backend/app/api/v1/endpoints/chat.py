@@ -1,20 +1,70 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Any, List
+import base64
+import logging
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from typing import Any, AsyncIterator, List, Optional, Tuple
 from uuid import UUID
 
 from app.api.deps import SessionDep, CurrentUser
+from app.api.streaming import cancel_on_disconnect, sse
 from app.schemas.common import ApiResponse
 from app.schemas.chat import (
     SessionCreate, SessionUpdate, SessionResponse, 
     ChatMessageCreate, MessageResponse, QAResponse,
-    FeedbackCreate
+    FeedbackCreate, BatchQARequest
 )
 from app.crud.crud_chat import chat_crud
+from app.db.session import AsyncSessionLocal
+from app.models.chat import Message
 from app.services.rag_engine import rag_engine
+from app.services.batch_qa_service import batch_qa_service
+from app.utils import fast_json
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def _encode_message(m: Message, with_details: bool) -> bytes:
+    """
+    消息编码为 JSON (MessageResponse 结构)
+    with_details 时 assistant 消息的 qaResponse 直接嵌入生成时保存的序列化响应，不再构造与校验模型
+    """
+    item = {"id": m.id, "role": m.role, "content": m.content, "timestamp": m.created_at}
+    qa_raw = b"null"
+    if with_details and m.role == "assistant":
+        if m.response_json:
+            qa_raw = m.response_json.encode("utf-8")
+        elif m.thought_chain:
+            # 存量消息未保存完整响应：从思维链与引用重构，缺失字段给默认值
+            qa_raw = QAResponse(
+                id=m.id,
+                conversation_id=m.conversation_id,
+                answer=m.content,
+                confidence=0.9,
+                security_badge="内部",
+                is_desensitized=True,
+                thought_process=m.thought_chain or [],
+                provenance=m.citations or [],
+                timestamp=m.created_at
+            ).model_dump_json().encode("utf-8")
+    return fast_json.dumps_with_raw(item, "qaResponse", qa_raw)
+
+def _encode_cursor(created_at: datetime, message_id: UUID) -> str:
+    """
+    分页游标：最早一条消息的 (created_at, id)，URL 安全的 Base64 编码
+    """
+    raw = f"{created_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), UUID(message_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/sessions", response_model=ApiResponse[List[SessionResponse]])
 async def get_sessions(
     db: SessionDep,
@@ -74,51 +124,74 @@ async def delete_session(
     await chat_crud.delete_session(db, session_id, current_user.id)
     return ApiResponse(data=True)
 
+# 分页时指向更早一页的游标，放在响应头中以保持响应体为消息数组
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 @router.get("/sessions/{session_id}/messages", response_model=ApiResponse[List[MessageResponse]])
 async def get_messages(
     session_id: UUID,
     db: SessionDep,
-    current_user: CurrentUser
+    current_user: CurrentUser,
+    limit: Optional[int] = Query(default=None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    detail: bool = True
 ) -> Any:
     """
-    获取指定会话的历史消息记录
+    获取指定会话的历史消息记录 (按时间正序的消息数组)
+    - 省略 limit 时返回全部消息；指定 limit 时按游标分页 (从最新一页开始向前翻)，
+      更早一页的游标通过 X-Next-Cursor 响应头返回，无此响应头表示已到会话开头
+    - detail=True (默认) 时 qaResponse 为回答生成时保存的完整响应；
+      detail=False 时为轻量列表 (qaResponse 为空)，按需调用消息详情接口获取
     """
     # 鉴权
     session = await chat_crud.get_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    messages = await chat_crud.get_messages(db, session_id)
-    
-    # 将 ORM 对象转换为 Pydantic 响应模型
-    # 特别处理 assistant 消息的 qaResponse 构造
-    result_msgs = []
-    for m in messages:
-        qa_resp = None
-        if m.role == "assistant" and m.thought_chain:
-            # 尝试从存储的 JSON 重构 QAResponse 结构
-            # 注意：实际生产中建议存储完整的 QAResponse JSON 或按需拼装
-            qa_resp = QAResponse(
-                id=m.id,
-                conversation_id=m.conversation_id,
-                answer=m.content,
-                confidence=0.9, # 历史数据可能缺失，给默认值
-                security_badge="内部",
-                is_desensitized=True,
-                thought_process=m.thought_chain or [],
-                provenance=m.citations or [],
-                timestamp=m.created_at
-            )
-        
-        result_msgs.append(MessageResponse(
-            id=m.id,
-            role=m.role,
-            content=m.content,
-            timestamp=m.created_at,
-            qaResponse=qa_resp
-        ))
-        
-    return ApiResponse(data=result_msgs)
+
+    # 多取一条用于判断是否还有更早的消息
+    messages = await chat_crud.get_messages(
+        db, session_id,
+        limit=limit + 1 if limit is not None else None,
+        before=_decode_cursor(cursor) if cursor else None,
+        with_details=detail
+    )
+    headers = {}
+    if limit is not None and len(messages) > limit:
+        messages = messages[:limit]
+        oldest = messages[-1]
+        headers[NEXT_CURSOR_HEADER] = _encode_cursor(oldest.created_at, oldest.id)
+
+    # 逐条输出已序列化的消息 (页内按时间正序)，不经过响应模型的构造与校验
+    async def page_stream() -> AsyncIterator[bytes]:
+        yield b'{"code":200,"message":"OK","data":['
+        for i, m in enumerate(reversed(messages)):
+            yield (b"," if i else b"") + _encode_message(m, with_details=detail)
+        yield b'],"timestamp":null,"trace_id":null}'
+
+    return StreamingResponse(page_stream(), media_type="application/json", headers=headers)
+
+@router.get("/sessions/{session_id}/messages/{message_id}", response_model=ApiResponse[MessageResponse])
+async def get_message_detail(
+    session_id: UUID,
+    message_id: UUID,
+    db: SessionDep,
+    current_user: CurrentUser
+) -> Any:
+    """
+    获取单条消息详情 (含 AI 回答的思维链与引用溯源)
+    """
+    session = await chat_crud.get_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    message = await chat_crud.get_message(db, session_id, message_id)
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    body = (
+        b'{"code":200,"message":"OK","data":' + _encode_message(message, with_details=True)
+        + b',"timestamp":null,"trace_id":null}'
+    )
+    return Response(content=body, media_type="application/json")
 
 @router.post("/sessions/{session_id}/messages", response_model=ApiResponse[QAResponse])
 async def send_message(
@@ -141,6 +214,57 @@ async def send_message(
     
     return ApiResponse(data=response)
 
+@router.post("/sessions/{session_id}/messages/stream")
+async def stream_message(
+    session_id: UUID,
+    msg_in: ChatMessageCreate,
+    request: Request,
+    db: SessionDep,
+    current_user: CurrentUser
+) -> StreamingResponse:
+    """
+    流式问答接口 (SSE)：逐步推送思维链、回答增量文本，最后推送引用溯源与完整响应
+    客户端断开时取消检索与生成 (本轮不落库)
+    """
+    # 鉴权在建立流之前完成，失败时仍返回常规 HTTP 错误
+    session = await chat_crud.get_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    async def event_stream() -> AsyncIterator[str]:
+        # 流的生命周期长于请求依赖，使用独立的数据库会话
+        async with AsyncSessionLocal() as stream_db:
+            try:
+                events = rag_engine.stream_query(stream_db, current_user, session_id, msg_in)
+                async for event in cancel_on_disconnect(request, events):
+                    yield sse(event.event, event.data)
+            except Exception as e:
+                logger.exception("Streaming QA failed")
+                yield sse("error", {"message": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/batch")
+async def batch_answer(
+    batch_in: BatchQARequest,
+    request: Request,
+    current_user: CurrentUser
+) -> StreamingResponse:
+    """
+    批量问答接口：并发执行一组问题，按完成顺序以 JSONL (application/x-ndjson) 流式返回
+    无状态执行，不写入会话记录；客户端断开时取消未完成的问题。
+    """
+    async def result_stream() -> AsyncIterator[str]:
+        results = batch_qa_service.run(current_user, batch_in)
+        async for result in cancel_on_disconnect(request, results):
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
 @router.post("/feedback/faq", response_model=ApiResponse[bool])
 async def submit_faq_feedback(
     feedback: FeedbackCreate,
@@ -1,6 +1,6 @@
 
 import json
-from typing import Any, Optional
+from typing import Any, List, Optional
 from redis import asyncio as aioredis
 from app.core.config import settings
 
@@ -47,8 +47,41 @@ class CacheService:
         except Exception as e:
             print(f"Cache SET error: {e}")
 
+    async def mget(self, keys: List[str]) -> Optional[List[Optional[str]]]:
+        """
+        批量读取原始值 (单次往返)，Redis 不可用时返回 None
+        """
+        try:
+            return await self.redis.mget(keys)
+        except Exception as e:
+            print(f"Cache MGET error: {e}")
+            return None
+
+    async def incr(self, key: str) -> Optional[int]:
+        """
+        原子自增计数器，Redis 不可用时返回 None
+        """
+        try:
+            return await self.redis.incr(key)
+        except Exception as e:
+            print(f"Cache INCR error: {e}")
+            return None
+
+    async def set_nx(self, key: str, value: str, expire: int) -> Optional[bool]:
+        """
+        仅当键不存在时写入 (分布式锁)，返回是否写入成功；Redis 不可用时返回 None
+        """
+        try:
+            return bool(await self.redis.set(key, value, ex=expire, nx=True))
+        except Exception as e:
+            print(f"Cache SETNX error: {e}")
+            return None
+
     async def delete(self, key: str):
-        await self.redis.delete(key)
+        try:
+            await self.redis.delete(key)
+        except Exception as e:
+            print(f"Cache DELETE error: {e}")
 
     async def close(self):
         await self.redis.close()
@@ -48,6 +48,66 @@ class Settings(BaseSettings):
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     EMBEDDING_DIMENSION: int = 1536
 
+    # --- 向量检索配置 (pgvector) ---
+    # 单库切片数超过该阈值时，将其从 DEFAULT 分区迁出为独立分区 (独立 HNSW 索引)
+    VECTOR_PARTITION_THRESHOLD: int = 20000
+    # pgvector >= 0.8.0 的迭代索引扫描模式: off, strict_order, relaxed_order
+    VECTOR_ITERATIVE_SCAN: Literal["off", "strict_order", "relaxed_order"] = "strict_order"
+    # 迭代扫描最多访问的元组数，防止高选择性过滤时扫描失控
+    VECTOR_MAX_SCAN_TUPLES: int = 20000
+
+    # --- 重排序配置 (Cross-Encoder) ---
+    # 本地 CPU 推理的 Cross-Encoder 模型 (需安装 sentence-transformers)
+    RERANK_MODEL: str = "BAAI/bge-reranker-base"
+    # 重排序工作线程数 (各批次并行打分)
+    RERANK_WORKERS: int = 2
+
+    # --- 缓存配置 ---
+    # 检索结果缓存有效期 (秒)，知识库变更通过 Epoch 即时失效
+    RETRIEVAL_CACHE_TTL: int = 600
+    # 语义问答缓存最大条目数 (超出后淘汰最旧条目)
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 10000
+
+    # --- 请求合并配置 (Singleflight) ---
+    # 并发的相同问题 (同一知识库范围 / 密级 / Epoch) 只执行一次检索与生成
+    SINGLEFLIGHT_ENABLED: bool = True
+    # 跟随者等待领头请求结果的最长时间 (秒)，超时后自行计算
+    SINGLEFLIGHT_WAIT_SECONDS: int = 60
+
+    # --- 上下文组装配置 ---
+    # 单次问答上下文 token 上限 (与模型上下文窗口取较小值)
+    CONTEXT_MAX_TOKENS: int = 6000
+    # 为模型回答预留的 token 数
+    CONTEXT_ANSWER_RESERVE: int = 1024
+
+    # --- 多轮对话配置 ---
+    # 原文保留的最近对话轮数 (一问一答为一轮)，更早的轮次折叠进滚动摘要
+    HISTORY_RECENT_TURNS: int = 3
+    # 单条历史消息进入提示词的最大字符数
+    HISTORY_MESSAGE_MAX_CHARS: int = 500
+    # 滚动摘要的最大字符数
+    HISTORY_SUMMARY_MAX_CHARS: int = 800
+
+    # --- 数据库连接配置 ---
+    # 单次问答并发召回 (FAQ / 语义缓存 / 图谱 / 文档 / 扩展子查询) 可同时占用的数据库连接数，
+    # 不含请求本身的会话；至少为 2，文档召回持有连接时扩展子查询仍可执行
+    RAG_QUERY_MAX_SESSIONS: int = 3
+
+    # --- 批量问答配置 ---
+    # 批量问答的最大并发数
+    # 每个并发问题最多占用 1 + RAG_QUERY_MAX_SESSIONS 个连接，两者乘积应不超过连接池容量 (默认 5 + 10)
+    BATCH_QA_MAX_CONCURRENCY: int = 3
+    # 批量预计算查询向量时单次请求的最大文本数
+    BATCH_QA_EMBED_SIZE: int = 64
+
+    # --- 链路追踪配置 ---
+    # 阶段耗时 Span 导出方式: off, memory (内存环形缓冲), jsonl (本地文件), otel (OpenTelemetry)
+    TRACE_EXPORTER: Literal["off", "memory", "jsonl", "otel"] = "memory"
+    # jsonl 导出文件路径
+    TRACE_FILE: str = "logs/traces.jsonl"
+    # 内存中保留的最近 Span 数
+    TRACE_MEMORY_SPANS: int = 5000
+
     # --- 存储配置 ---
     MINIO_ENDPOINT: str = "minio:9000"
     MINIO_ACCESS_KEY: str = "minioadmin"
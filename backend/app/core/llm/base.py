@@ -1,6 +1,6 @@
 
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator
 
 class BaseLLMProvider(ABC):
     """
@@ -31,3 +31,15 @@ class BaseLLMProvider(ABC):
         生成 JSON 结构化响应
         """
         pass
+
+    async def stream_text(
+        self, 
+        system_prompt: str, 
+        user_prompt: str, 
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """
+        流式生成纯文本响应，逐段产出增量文本
+        默认实现退化为一次性返回完整结果，支持流式协议的适配器应覆盖此方法。
+        """
+        yield await self.generate_text(system_prompt, user_prompt, temperature)
@@ -1,10 +1,12 @@
 
+import asyncio
 import json
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator
 from openai import AsyncOpenAI
 from app.core.config import settings
 from app.core.llm.base import BaseLLMProvider
+from app.core.llm.usage import record_llm_usage
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +20,19 @@ class MockLLMProvider(BaseLLMProvider):
             return "<div style='color:red'>[Mock HTML] 这是一个模拟的排版结果。</div>"
         return f"[Mock Response] 收到指令：{user_prompt[:20]}... (这是模拟生成的文本)"
 
+    # 模拟流式输出：每段字符数与段间延迟
+    STREAM_CHUNK_CHARS = 4
+    STREAM_DELAY_SECONDS = 0.03
+
+    async def stream_text(self, system_prompt: str, user_prompt: str, temperature: float = 0.7) -> AsyncIterator[str]:
+        """
+        将模拟文本按固定长度切段逐段产出，段间等待以模拟真实模型的首字与逐字延迟
+        """
+        text = await self.generate_text(system_prompt, user_prompt, temperature)
+        for start in range(0, len(text), self.STREAM_CHUNK_CHARS):
+            await asyncio.sleep(self.STREAM_DELAY_SECONDS)
+            yield text[start:start + self.STREAM_CHUNK_CHARS]
+
     async def generate_json(self, system_prompt: str, user_prompt: str, temperature: float = 0.2) -> Dict[str, Any]:
         logger.info(f"[MockLLM] Generating JSON. System: {system_prompt[:20]}...")
         # 返回一个通用的 Mock JSON 结构，实际业务中可能需要根据 prompt 特征返回不同 mock 数据
@@ -49,11 +64,41 @@ class OpenAILikeProvider(BaseLLMProvider):
                 ],
                 temperature=temperature
             )
+            record_llm_usage(response.usage)
             return response.choices[0].message.content
         except Exception as e:
             logger.error(f"LLM Provider Error: {str(e)}")
             raise ValueError(f"模型调用失败: {str(e)}")
 
+    async def stream_text(self, system_prompt: str, user_prompt: str, temperature: float = 0.7) -> AsyncIterator[str]:
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=temperature,
+                stream=True,
+                # 末尾块携带整次调用的 usage
+                stream_options={"include_usage": True}
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.usage:
+                        record_llm_usage(chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield delta
+            finally:
+                # 调用方提前结束 (客户端断开 / 任务取消) 时立即关闭底层 HTTP 连接，模型端随之停止生成
+                await stream.close()
+        except Exception as e:
+            logger.error(f"LLM Provider Error: {str(e)}")
+            raise ValueError(f"模型调用失败: {str(e)}")
+
     async def generate_json(self, system_prompt: str, user_prompt: str, temperature: float = 0.2) -> Dict[str, Any]:
         try:
             response = await self.client.chat.completions.create(
@@ -65,6 +110,7 @@ class OpenAILikeProvider(BaseLLMProvider):
                 temperature=temperature,
                 response_format={"type": "json_object"}
             )
+            record_llm_usage(response.usage)
             content = response.choices[0].message.content
             return json.loads(content)
         except json.JSONDecodeError:
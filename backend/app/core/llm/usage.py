@@ -0,0 +1,79 @@
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class UsageMeter:
+    """
+    单次问答的资源计量：LLM / 向量化 token 数与各阶段耗时 (毫秒)
+    通过 ContextVar 在调用链中传递，问答内派生的异步任务 (查询扩展等) 共享同一计量器。
+    """
+    user_id: Optional[uuid.UUID] = None
+    kb_ids: List[uuid.UUID] = field(default_factory=list)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    embedding_tokens: int = 0
+    # 阶段耗时累加值；并发执行的同名阶段 (如多个扩展的向量化) 耗时相加
+    stages: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add_stage(self, name: str, elapsed_ms: float):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def latency_ms(self) -> Dict[str, int]:
+        return {name: int(round(ms)) for name, ms in self.stages.items()}
+
+
+_current_meter: ContextVar[Optional[UsageMeter]] = ContextVar("usage_meter", default=None)
+
+
+def start_meter(user_id: Optional[uuid.UUID] = None, kb_ids: Optional[List[uuid.UUID]] = None) -> UsageMeter:
+    """
+    为当前问答安装新的计量器 (覆盖上下文中已有的计量器)
+    """
+    meter = UsageMeter(user_id=user_id, kb_ids=list(kb_ids or []))
+    _current_meter.set(meter)
+    return meter
+
+
+def current_meter() -> Optional[UsageMeter]:
+    return _current_meter.get()
+
+
+def record_llm_usage(usage: Any):
+    """
+    记录 OpenAI 兼容响应中的 usage (prompt_tokens / completion_tokens)，无计量器或无 usage 时忽略
+    """
+    meter = _current_meter.get()
+    if meter is None or usage is None:
+        return
+    meter.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+    meter.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+
+def record_embedding_usage(usage: Any):
+    meter = _current_meter.get()
+    if meter is None or usage is None:
+        return
+    meter.embedding_tokens += getattr(usage, "prompt_tokens", 0) or 0
+
+
+@contextmanager
+def track_stage(name: str):
+    """
+    统计代码块耗时并计入当前计量器的指定阶段
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        meter = _current_meter.get()
+        if meter is not None:
+            meter.add_stage(name, (time.perf_counter() - start) * 1000)
@@ -55,9 +55,32 @@ CSS要求: {css_req}
     RAG_ANSWER_SYSTEM = "你是一个军工领域的专家助手。请基于提供的上下文回答问题。如果上下文不足以回答问题，请明确告知，不要编造信息。所有回答必须基于客观事实。"
     RAG_ANSWER_USER = """请基于以下参考资料回答问题：
 
-【参考资料】
+{history_str}【参考资料】
 {context_str}
 
 【问题】
 {query}"""
 
+    # --- Conversation History Prompts ---
+    RAG_HISTORY_SUMMARY_SYSTEM = "你是一名对话记录员。请将已有摘要与新增的对话轮次合并为一段简洁的对话摘要，保留用户关注的对象、型号、约束条件与已得出的结论，省略寒暄与重复内容。仅输出摘要本身。"
+    RAG_HISTORY_SUMMARY_USER = """摘要不超过 {max_chars} 字。
+
+【已有摘要】
+{summary}
+
+【新增对话】
+{turns}"""
+
+    # --- Query Expansion Prompts ---
+    RAG_REWRITE_SYSTEM = "你是一名检索专家。请结合对话历史，将用户的最新问题改写为语义完整、可独立检索的查询：补全指代与省略的对象，保留型号、数值等关键约束，去除口语化表达。仅输出改写后的查询本身。"
+    RAG_REWRITE_USER = "{history_str}【最新问题】\n{query}"
+
+    RAG_MULTI_QUERY_SYSTEM = "你是一名检索专家。请将用户问题改写为多个语义等价但表述不同的检索式，以覆盖不同的用词习惯。每行输出一个检索式，不要编号，不要输出其他内容。"
+    RAG_MULTI_QUERY_USER = "请生成 {n} 个检索式。\n问题：{query}"
+
+    RAG_HYDE_SYSTEM = "你是一名军工领域的技术文档撰写者。请针对用户问题，写一段可能出现在内部技术资料中的答案段落 (约 150 字)。无需保证事实准确，仅用于语义检索。"
+    RAG_HYDE_USER = "问题：{query}"
+
+    RAG_STEPBACK_SYSTEM = "你是一名检索专家。请将用户的具体问题抽象为一个更一般的背景性问题，以便检索相关原理与背景资料。仅输出改写后的问题本身。"
+    RAG_STEPBACK_USER = "问题：{query}"
+
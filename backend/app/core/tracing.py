@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterator, List, Optional
+from app.core.config import settings
+
+# 可选依赖：安装 opentelemetry-api (并由部署方配置 SDK / Exporter) 时同步产出 OTel Span
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """
+    轻量 Span，字段与 OpenTelemetry 对齐 (trace_id 32 位 / span_id 16 位十六进制)
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_time = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = "OK"
+        self._otel = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+        if self._otel is not None:
+            self._otel.set_attribute(key, value)
+
+    def end(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time.isoformat(),
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    阶段计时追踪器
+    TRACE_EXPORTER:
+      - off:    不记录
+      - memory: 保留最近 TRACE_MEMORY_SPANS 个 Span (管理端可查询)
+      - jsonl:  同 memory，并在根 Span 结束时将整条链路交由后台线程追加写入 TRACE_FILE (不阻塞事件循环)
+      - otel:   同 memory，并同步创建 OpenTelemetry Span (需安装 opentelemetry-api)
+    父子关系通过 ContextVar 传递，asyncio 派生任务自动继承当前 Span。
+    """
+
+    MAX_OPEN_TRACES = 1000
+
+    def __init__(self):
+        self.exporter = settings.TRACE_EXPORTER
+        self._spans: Deque[Span] = deque(maxlen=settings.TRACE_MEMORY_SPANS)
+        # 未结束链路的已完成 Span，根 Span 结束时整体写出
+        self._open_traces: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+        # jsonl 导出：待写出的链路队列，由后台线程串行写文件
+        self._write_queue: "queue.SimpleQueue[List[Span]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._otel_tracer = None
+        if self.exporter == "otel":
+            if otel_trace is None:
+                logger.warning("TRACE_EXPORTER=otel but opentelemetry is not installed, falling back to memory")
+            else:
+                self._otel_tracer = otel_trace.get_tracer("military-brain.rag")
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter != "off"
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        记录一个阶段 Span；关闭追踪时产出 None
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        span = Span(name, parent.trace_id if parent else secrets.token_hex(16),
+                    parent.span_id if parent else None, attributes)
+        token = _current_span.set(span)
+        otel_cm = None
+        if self._otel_tracer is not None:
+            otel_cm = self._otel_tracer.start_as_current_span(name, attributes=attributes)
+            span._otel = otel_cm.__enter__()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "ERROR"
+            span.attributes.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            span.end()
+            if otel_cm is not None:
+                otel_cm.__exit__(None, None, None)
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # 异步生成器在其他上下文中被关闭时无法复位，直接恢复父 Span
+                _current_span.set(parent)
+            self._finish(span)
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        最近的链路 (按根 Span 开始时间倒序)，每条链路包含其全部 Span
+        """
+        with self._lock:
+            spans = list(self._spans)
+        traces: Dict[str, List[Span]] = {}
+        for span in spans:
+            traces.setdefault(span.trace_id, []).append(span)
+        ordered = sorted(traces.values(), key=lambda group: min(s.start_time for s in group), reverse=True)
+        return [
+            {
+                "trace_id": group[0].trace_id,
+                "spans": [s.to_dict() for s in sorted(group, key=lambda s: s.start_time)],
+            }
+            for group in ordered[:limit]
+        ]
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+            if self.exporter != "jsonl":
+                return
+            if span.parent_id is not None:
+                self._open_traces.setdefault(span.trace_id, []).append(span)
+                # 根 Span 结束后才完成的子 Span (如被取消的后台任务) 不再写出，限制缓冲规模
+                while len(self._open_traces) > self.MAX_OPEN_TRACES:
+                    self._open_traces.pop(next(iter(self._open_traces)))
+                return
+            group = self._open_traces.pop(span.trace_id, []) + [span]
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+                self._writer.start()
+        self._write_queue.put(group)
+
+    def _write_loop(self):
+        while True:
+            self._write(self._write_queue.get())
+
+    def _write(self, spans: List[Span]):
+        try:
+            directory = os.path.dirname(settings.TRACE_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            lines = "".join(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n" for s in spans)
+            with open(settings.TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            logger.error(f"Trace export failed: {e}")
+
+tracer = Tracer()
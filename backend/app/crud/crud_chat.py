@@ -1,11 +1,22 @@
 
-from typing import List, Optional
+import uuid
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, desc
-from app.models.chat import Conversation, Message
+from sqlalchemy import Row, cast, select, delete, desc, func, literal, text, tuple_, update
+from sqlalchemy.orm import defer
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from app.core.llm.usage import UsageMeter
+from app.crud.crud_document import document_crud
+from app.models.auth import User
+from app.models.chat import Conversation, Message, SemanticCacheEntry, UsageRollup
+from app.models.kms import KnowledgeBase
 from app.schemas.chat import SessionCreate, SessionUpdate, MessageRole
 
+# 资源消耗日汇总中 (日期, 用户) 总计行的 kb_id
+USAGE_TOTAL_KB_ID = uuid.UUID(int=0)
+
 class CRUDChat:
     """
     Chat 模块的数据库操作
@@ -104,16 +115,319 @@ class CRUDChat:
         await db.refresh(db_obj)
         return db_obj
 
-    async def get_messages(self, db: AsyncSession, conversation_id: UUID) -> List[Message]:
+    async def save_exchange(
+        self,
+        db: AsyncSession,
+        conversation_id: UUID,
+        question: str,
+        answer: str,
+        asked_at: datetime,
+        thought_chain: list = None,
+        citations: list = None,
+        usage: Optional[UsageMeter] = None,
+        answer_id: Optional[UUID] = None,
+        answered_at: Optional[datetime] = None,
+        response_json: Optional[str] = None
+    ) -> Tuple[Message, Message]:
+        """
+        在单个事务中写入一轮问答 (用户提问 + AI 回答) 并刷新会话 updated_at
+        主键与时间戳在客户端生成，两条消息合并为一次批量 INSERT，提交后无需 refresh 回读。
+        usage: 本轮资源计量，写入 AI 消息并累加到日汇总表
+        answer_id / answered_at: 调用方已生成的 AI 消息 ID 与时间 (与 response_json 一致)
+        response_json: 完整 QAResponse 的紧凑 JSON
+        """
+        answered_at = answered_at or max(datetime.now(timezone.utc), asked_at)
+        user_msg = Message(
+            id=uuid.uuid4(),
+            conversation_id=conversation_id,
+            role=MessageRole.USER,
+            content=question,
+            created_at=asked_at
+        )
+        ai_msg = Message(
+            id=answer_id or uuid.uuid4(),
+            conversation_id=conversation_id,
+            role=MessageRole.ASSISTANT,
+            content=answer,
+            thought_chain=thought_chain,
+            citations=citations,
+            response_json=response_json,
+            created_at=answered_at
+        )
+        if usage is not None:
+            ai_msg.tokens_usage = usage.total_tokens
+            ai_msg.prompt_tokens = usage.prompt_tokens
+            ai_msg.completion_tokens = usage.completion_tokens
+            ai_msg.latency_ms = usage.latency_ms()
+        db.add_all([user_msg, ai_msg])
+        await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(updated_at=answered_at)
+        )
+        if usage is not None and usage.user_id is not None:
+            await self._add_usage_rollup(db, answered_at.date(), usage)
+        await db.commit()
+        return user_msg, ai_msg
+
+    async def _add_usage_rollup(self, db: AsyncSession, day: date, usage: UsageMeter):
+        """
+        累加日汇总 (INSERT ... ON CONFLICT DO UPDATE)，不提交
+        """
+        rows = self._usage_rollup_rows(day, usage)
+        metrics = [name for name in rows[0] if name not in ("day", "user_id", "kb_id")]
+        stmt = insert(UsageRollup).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UsageRollup.day, UsageRollup.user_id, UsageRollup.kb_id],
+            set_={
+                name: getattr(UsageRollup, name) + getattr(stmt.excluded, name)
+                for name in metrics
+            }
+        )
+        await db.execute(stmt)
+
+    def _usage_rollup_rows(self, day: date, usage: UsageMeter) -> List[dict]:
+        """
+        一轮问答对应的汇总行：
+        - kb_id = USAGE_TOTAL_KB_ID 的 (日期, 用户) 总计行，每轮问答只计一次，用于按用户 / 日期统计
+        - 检索涉及的每个知识库各一行 (跨库提问计入每个库)，仅用于按知识库统计
+        """
+        latency = usage.latency_ms()
+        metrics = {
+            "questions": 1,
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "embedding_tokens": usage.embedding_tokens,
+            "embed_ms": latency.get("embed", 0),
+            "retrieve_ms": latency.get("retrieve", 0),
+            "generate_ms": latency.get("generate", 0),
+            "total_ms": latency.get("total", 0),
+        }
+        kb_ids = [USAGE_TOTAL_KB_ID] + sorted(set(usage.kb_ids) - {USAGE_TOTAL_KB_ID}, key=str)
+        return [
+            {"day": day, "user_id": usage.user_id, "kb_id": kb_id, **metrics}
+            for kb_id in kb_ids
+        ]
+
+    async def get_usage_summary(
+        self,
+        db: AsyncSession,
+        group_by: str,
+        start: date,
+        end: date,
+        limit: int = 100
+    ) -> List[Row]:
         """
-        获取会话的所有消息
+        按用户 / 知识库 / 日期聚合资源消耗
+        group_by=user / kb 时按 token 总量降序 (定位成本大户)，group_by=day 时按日期升序
+        """
+        sums = [
+            func.sum(UsageRollup.questions).label("questions"),
+            func.sum(UsageRollup.prompt_tokens).label("prompt_tokens"),
+            func.sum(UsageRollup.completion_tokens).label("completion_tokens"),
+            func.sum(UsageRollup.embedding_tokens).label("embedding_tokens"),
+            func.sum(UsageRollup.embed_ms).label("embed_ms"),
+            func.sum(UsageRollup.retrieve_ms).label("retrieve_ms"),
+            func.sum(UsageRollup.generate_ms).label("generate_ms"),
+            func.sum(UsageRollup.total_ms).label("total_ms"),
+        ]
+        total_tokens = func.sum(UsageRollup.prompt_tokens + UsageRollup.completion_tokens)
+
+        # 按用户 / 日期统计只读总计行，按知识库统计只读各库行，避免跨库提问重复计数
+        if group_by == "user":
+            stmt = (
+                select(UsageRollup.user_id.label("key"), func.max(User.username).label("name"), *sums)
+                .outerjoin(User, User.id == UsageRollup.user_id)
+                .where(UsageRollup.kb_id == USAGE_TOTAL_KB_ID)
+                .group_by(UsageRollup.user_id)
+                .order_by(total_tokens.desc())
+            )
+        elif group_by == "kb":
+            stmt = (
+                select(UsageRollup.kb_id.label("key"), func.max(KnowledgeBase.name).label("name"), *sums)
+                .outerjoin(KnowledgeBase, KnowledgeBase.id == UsageRollup.kb_id)
+                .where(UsageRollup.kb_id != USAGE_TOTAL_KB_ID)
+                .group_by(UsageRollup.kb_id)
+                .order_by(total_tokens.desc())
+            )
+        else:
+            stmt = (
+                select(UsageRollup.day.label("key"), *sums)
+                .where(UsageRollup.kb_id == USAGE_TOTAL_KB_ID)
+                .group_by(UsageRollup.day)
+                .order_by(UsageRollup.day)
+            )
+
+        stmt = stmt.where(UsageRollup.day >= start, UsageRollup.day <= end).limit(limit)
+        result = await db.execute(stmt)
+        return list(result.all())
+
+    async def get_messages(
+        self,
+        db: AsyncSession,
+        conversation_id: UUID,
+        limit: Optional[int] = None,
+        before: Optional[Tuple[datetime, UUID]] = None,
+        with_details: bool = False
+    ) -> List[Message]:
+        """
+        按 (created_at, id) 游标倒序分页获取会话消息 (走 idx_msg_conv_time)，limit 为空时返回全部
+        before: 上一页最早一条消息的 (created_at, id)，仅返回早于它的消息
+        with_details: False 时延迟加载思维链 / 引用 / 耗时 / 完整响应等大字段 (访问即报错，需按条单独获取)
         """
         stmt = (
             select(Message)
             .where(Message.conversation_id == conversation_id)
-            .order_by(Message.created_at.asc())
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(limit)
         )
+        if before is not None:
+            created_at, message_id = before
+            stmt = stmt.where(tuple_(Message.created_at, Message.id) < tuple_(
+                literal(created_at, Message.created_at.type), literal(message_id, Message.id.type)
+            ))
+        if not with_details:
+            stmt = stmt.options(*(
+                defer(column, raiseload=True)
+                for column in (Message.thought_chain, Message.citations, Message.latency_ms, Message.response_json)
+            ))
         result = await db.execute(stmt)
         return list(result.scalars().all())
 
+    async def get_message(self, db: AsyncSession, conversation_id: UUID, message_id: UUID) -> Optional[Message]:
+        """
+        获取会话中的单条消息 (含全部 JSONB 列)
+        """
+        stmt = select(Message).where(
+            Message.id == message_id,
+            Message.conversation_id == conversation_id
+        )
+        result = await db.execute(stmt)
+        return result.scalars().first()
+
+    async def get_recent_messages(
+        self,
+        db: AsyncSession,
+        conversation_id: UUID,
+        limit: int,
+        offset: int = 0,
+        after: Optional[datetime] = None
+    ) -> List[Row]:
+        """
+        按时间倒序获取会话消息的轻量行 (role, content, created_at)，不加载 JSONB 列
+        after: 仅返回晚于该时间的消息
+        """
+        stmt = (
+            select(Message.role, Message.content, Message.created_at)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.created_at.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.where(Message.created_at > after)
+        result = await db.execute(stmt)
+        return list(result.all())
+
+    async def get_config_snapshot(self, db: AsyncSession, conversation_id: UUID) -> dict:
+        """
+        获取会话配置快照
+        """
+        result = await db.execute(
+            select(Conversation.config_snapshot).where(Conversation.id == conversation_id)
+        )
+        return result.scalar() or {}
+
+    async def update_config_snapshot(self, db: AsyncSession, conversation_id: UUID, patch: dict):
+        """
+        以 JSONB 合并方式更新会话配置快照的指定键 (不改变会话 updated_at)
+        """
+        await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(
+                config_snapshot=func.coalesce(Conversation.config_snapshot, cast({}, JSONB)).op("||")(cast(patch, JSONB)),
+                updated_at=Conversation.updated_at
+            )
+        )
+        await db.commit()
+
+    # --- 语义问答缓存 ---
+
+    async def find_semantic_cache_entry(
+        self, db: AsyncSession, scope_key: str, query_vector: List[float], ef_search: Optional[int] = None
+    ) -> Optional[Tuple[SemanticCacheEntry, float]]:
+        """
+        在同一作用域内查找与问题向量最相近的未过期缓存条目，返回 (条目, 余弦相似度)
+        作用域与有效期为 HNSW 扫描后的过滤条件，与切片检索一样开启迭代扫描，避免近邻均属其他作用域时漏检
+        """
+        await document_crud.apply_vector_scan_settings(db, ef_search)
+        distance = SemanticCacheEntry.embedding.cosine_distance(query_vector)
+        stmt = (
+            select(SemanticCacheEntry, (1 - distance).label("score"))
+            .where(
+                SemanticCacheEntry.scope_key == scope_key,
+                SemanticCacheEntry.expires_at > func.now()
+            )
+            .order_by(distance)
+            .limit(1)
+        )
+        result = await db.execute(stmt)
+        row = result.first()
+        return (row[0], float(row[1])) if row else None
+
+    async def touch_semantic_cache_entry(self, db: AsyncSession, entry_id: UUID):
+        """
+        记录一次缓存命中
+        """
+        await db.execute(
+            update(SemanticCacheEntry)
+            .where(SemanticCacheEntry.id == entry_id)
+            .values(hit_count=SemanticCacheEntry.hit_count + 1)
+        )
+        await db.commit()
+
+    async def create_semantic_cache_entry(
+        self,
+        db: AsyncSession,
+        scope_key: str,
+        question: str,
+        query_vector: List[float],
+        answer: str,
+        thought_chain: list,
+        citations: list,
+        expires_at: datetime
+    ) -> SemanticCacheEntry:
+        db_obj = SemanticCacheEntry(
+            scope_key=scope_key,
+            question=question,
+            embedding=query_vector,
+            answer=answer,
+            thought_chain=thought_chain,
+            citations=citations,
+            expires_at=expires_at
+        )
+        db.add(db_obj)
+        await db.commit()
+        return db_obj
+
+    async def purge_semantic_cache(self, db: AsyncSession, max_entries: int) -> int:
+        """
+        淘汰过期条目，并在总量超出上限时删除最旧的条目，返回删除条数
+        """
+        expired = await db.execute(
+            delete(SemanticCacheEntry).where(SemanticCacheEntry.expires_at <= func.now())
+        )
+        overflow_ids = (
+            select(SemanticCacheEntry.id)
+            .order_by(desc(SemanticCacheEntry.created_at))
+            .offset(max_entries)
+            .scalar_subquery()
+        )
+        overflow = await db.execute(
+            delete(SemanticCacheEntry).where(SemanticCacheEntry.id.in_(overflow_ids))
+        )
+        await db.commit()
+        return (expired.rowcount or 0) + (overflow.rowcount or 0)
+
 chat_crud = CRUDChat()
@@ -1,29 +1,59 @@
 
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, or_, and_, update, text
+from sqlalchemy import select, delete, or_, and_, update, text, func, literal_column, Row
 from sqlalchemy.orm import selectinload
 from app.models.kms import KnowledgeBase, KbACL, Document, DocumentChunk
 from app.schemas.auth import ClearanceLevel
 from app.models.auth import User
+from app.core.config import settings
 
 class CRUDDocument:
     """
     文档中心数据库操作
     """
 
+    def __init__(self):
+        # pgvector 扩展版本 (首次检索时探测并缓存)
+        self._pgvector_version: Optional[Tuple[int, ...]] = None
+
     # --- Knowledge Base Operations ---
 
     async def get_authorized_kbs(self, db: AsyncSession, user: User) -> List[KnowledgeBase]:
         """
         获取当前用户有权访问的知识库列表 (User Side)
         """
+        stmt = (
+            select(KnowledgeBase)
+            .where(*self._authorized_kb_filters(user))
+            .options(selectinload(KnowledgeBase.acls))
+        )
+        result = await db.execute(stmt)
+        return list(result.scalars().all())
+
+    async def filter_authorized_kb_ids(self, db: AsyncSession, user: User, kb_ids: List[UUID]) -> List[UUID]:
+        """
+        过滤出用户有权访问的知识库 ID (保持输入顺序)，仅查询 ID 不加载 ACL
+        """
+        if not kb_ids:
+            return []
+        stmt = select(KnowledgeBase.id).where(
+            KnowledgeBase.id.in_(kb_ids), *self._authorized_kb_filters(user)
+        )
+        result = await db.execute(stmt)
+        allowed = set(result.scalars().all())
+        return [kb_id for kb_id in kb_ids if kb_id in allowed]
+
+    def _authorized_kb_filters(self, user: User) -> list:
+        """
+        用户可访问知识库的过滤条件：密级满足、未归档，且为拥有者或命中 ACL (用户 / 角色 / 部门)
+        """
         # 1. 基础密级过滤
-        base_query = select(KnowledgeBase).where(
+        base_filters = [
             KnowledgeBase.base_clearance <= user.clearance_level,
             KnowledgeBase.is_archived == False
-        )
+        ]
 
         # 2. ACL 关联查询
         acl_filter = or_(
@@ -36,10 +66,7 @@ class CRUDDocument:
                 )
             )
         )
-        
-        stmt = base_query.where(acl_filter).options(selectinload(KnowledgeBase.acls))
-        result = await db.execute(stmt)
-        return list(result.scalars().all())
+        return base_filters + [acl_filter]
 
     async def get_all_kbs(self, db: AsyncSession) -> List[KnowledgeBase]:
         """
@@ -130,6 +157,25 @@ class CRUDDocument:
         await db.execute(stmt)
         await db.commit()
 
+    async def update_document_clearance(self, db: AsyncSession, doc_id: UUID, clearance: int) -> Optional[Document]:
+        """
+        文档重新定密：文档与其全部切片的密级在同一事务内更新
+        """
+        stmt = update(Document).where(Document.id == doc_id).values(clearance=clearance).returning(Document)
+        result = await db.execute(stmt)
+        doc = result.scalars().first()
+        if not doc:
+            await db.rollback()
+            return None
+
+        await db.execute(
+            update(DocumentChunk)
+            .where(DocumentChunk.kb_id == doc.kb_id, DocumentChunk.doc_id == doc_id)
+            .values(clearance=clearance)
+        )
+        await db.commit()
+        return doc
+
     async def get_documents_by_kb(self, db: AsyncSession, kb_id: UUID, user_clearance: int) -> List[Document]:
         """
         获取指定库内的文档列表
@@ -163,66 +209,251 @@ class CRUDDocument:
         db.add_all(chunks)
         await db.commit()
 
+    def _chunk_columns(self) -> list:
+        """
+        检索结果的精简投影列
+        不回传 1536 维 embedding，避免无谓的传输与解析开销 (MMR 所需向量由 get_chunk_embeddings 按需获取)。
+        """
+        columns = [
+            DocumentChunk.id,
+            DocumentChunk.content,
+            DocumentChunk.chunk_idx,
+            DocumentChunk.page_idx,
+            DocumentChunk.doc_id,
+            DocumentChunk.clearance,
+        ]
+        return columns
+
     async def search_similar_chunks(
         self, 
         db: AsyncSession, 
         query_vector: List[float], 
         kb_ids: List[UUID], 
         limit: int = 5,
-        score_threshold: float = 0.0
-    ) -> List[Tuple[DocumentChunk, float]]:
+        score_threshold: float = 0.0,
+        ef_search: Optional[int] = None,
+        max_clearance: Optional[int] = None
+    ) -> List[Row]:
         """
         核心向量检索方法 (Dense Retrieval)
         使用 pgvector 的 cosine_distance 操作符 (<=>)
         注意: cosine_distance = 1 - cosine_similarity
+        必须按 distance 升序排序，HNSW 索引才会被使用 (按 1 - distance 降序会退化为全表扫描)。
+
+        ANN 检索在子查询中完成 (LIMIT 后仅剩 Top-K)，外层再关联 documents 取标题，
+        单次往返返回轻量 Row: id, content, chunk_idx, page_idx, doc_id, clearance, score, title
+        max_clearance: 用户密级，按切片冗余密级在 ANN 查询内过滤 (配合迭代扫描保证返回数量)
         """
         if not kb_ids:
             return []
 
-        # 1 - cosine_distance 即为相似度
-        similarity = 1 - DocumentChunk.embedding.cosine_distance(query_vector)
-        
-        stmt = (
-            select(DocumentChunk, similarity.label("score"))
-            .join(DocumentChunk.document) # Join Document 表以获取 metadata/title
+        await self.apply_vector_scan_settings(db, ef_search)
+
+        distance = DocumentChunk.embedding.cosine_distance(query_vector)
+        ann = (
+            select(*self._chunk_columns(), (1 - distance).label("score"))
             .where(
                 DocumentChunk.kb_id.in_(kb_ids),
-                similarity > score_threshold
+                distance < 1 - score_threshold
             )
-            .order_by(similarity.desc())
+            .order_by(distance)
             .limit(limit)
-            .options(selectinload(DocumentChunk.document)) # 预加载 Document 信息
+        )
+        if max_clearance is not None:
+            ann = ann.where(DocumentChunk.clearance <= max_clearance)
+        ann = ann.subquery("ann")
+
+        stmt = (
+            select(ann, Document.title)
+            .join(Document, Document.id == ann.c.doc_id)
+            .order_by(ann.c.score.desc())
         )
         
         result = await db.execute(stmt)
-        return result.all() # 返回 [(Chunk, score), ...]
+        return list(result.all())
+
+    async def get_chunks_by_ids(
+        self,
+        db: AsyncSession,
+        chunk_ids: List[UUID],
+        kb_ids: List[UUID],
+        max_clearance: Optional[int] = None
+    ) -> List[Row]:
+        """
+        按 ID 批量获取切片 (检索缓存命中后回表)
+        附带 kb_id 条件以便分区裁剪；返回顺序与 chunk_ids 一致。
+        """
+        if not chunk_ids or not kb_ids:
+            return []
+
+        stmt = (
+            select(*self._chunk_columns(), Document.title)
+            .join(Document, Document.id == DocumentChunk.doc_id)
+            .where(
+                DocumentChunk.id.in_(chunk_ids),
+                DocumentChunk.kb_id.in_(kb_ids)
+            )
+        )
+        if max_clearance is not None:
+            stmt = stmt.where(DocumentChunk.clearance <= max_clearance)
+        result = await db.execute(stmt)
+        by_id = {row.id: row for row in result.all()}
+        return [by_id[cid] for cid in chunk_ids if cid in by_id]
+
+    async def get_chunk_embeddings(
+        self, db: AsyncSession, chunk_ids: List[UUID], kb_ids: List[UUID]
+    ) -> Dict[UUID, List[float]]:
+        """
+        按 ID 批量获取切片向量 (仅 MMR 候选池，检索阶段不回传向量)
+        """
+        if not chunk_ids or not kb_ids:
+            return {}
+
+        stmt = select(DocumentChunk.id, DocumentChunk.embedding).where(
+            DocumentChunk.id.in_(chunk_ids),
+            DocumentChunk.kb_id.in_(kb_ids)
+        )
+        result = await db.execute(stmt)
+        return {row.id: row.embedding for row in result.all()}
+
+    async def get_chunk_windows(
+        self,
+        db: AsyncSession,
+        windows: List[Tuple[UUID, int, int]],
+        kb_ids: List[UUID],
+        max_clearance: Optional[int] = None
+    ) -> List[Row]:
+        """
+        批量获取切片窗口 (Small-to-Big)
+        windows: [(doc_id, 起始 chunk_idx, 结束 chunk_idx), ...]，所有窗口在一次查询中取回，
+        按 (doc_id, chunk_idx) 排序返回，投影与检索结果一致。
+        """
+        if not windows or not kb_ids:
+            return []
+
+        stmt = (
+            select(*self._chunk_columns(), Document.title)
+            .join(Document, Document.id == DocumentChunk.doc_id)
+            .where(
+                DocumentChunk.kb_id.in_(kb_ids),
+                or_(*[
+                    and_(DocumentChunk.doc_id == doc_id, DocumentChunk.chunk_idx.between(lo, hi))
+                    for doc_id, lo, hi in windows
+                ])
+            )
+            .order_by(DocumentChunk.doc_id, DocumentChunk.chunk_idx)
+        )
+        if max_clearance is not None:
+            stmt = stmt.where(DocumentChunk.clearance <= max_clearance)
+        result = await db.execute(stmt)
+        return list(result.all())
+
+    async def _get_pgvector_version(self, db: AsyncSession) -> Tuple[int, ...]:
+        """
+        探测 pgvector 扩展版本 (进程内缓存)
+        """
+        if self._pgvector_version is None:
+            result = await db.execute(
+                text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            )
+            raw = result.scalar() or "0"
+            self._pgvector_version = tuple(int(p) for p in raw.split(".") if p.isdigit())
+        return self._pgvector_version
+
+    async def apply_vector_scan_settings(self, db: AsyncSession, ef_search: Optional[int] = None):
+        """
+        设置当前事务的 HNSW 检索参数
+        - hnsw.ef_search: 候选队列长度，由全局检索配置按请求下发
+        - hnsw.iterative_scan: 迭代索引扫描 (pgvector >= 0.8.0)，带过滤条件的查询在近邻被
+          过滤殆尽时继续扫描，而不是返回残缺结果
+        使用 set_config(..., is_local=true) 等价于 SET LOCAL，仅作用于当前事务。
+        """
+        if ef_search:
+            await db.execute(
+                text("SELECT set_config('hnsw.ef_search', :ef_search, true)"),
+                {"ef_search": str(ef_search)}
+            )
+
+        if settings.VECTOR_ITERATIVE_SCAN == "off":
+            return
+        if await self._get_pgvector_version(db) < (0, 8, 0):
+            return
+
+        await db.execute(
+            text("SELECT set_config('hnsw.iterative_scan', :mode, true), set_config('hnsw.max_scan_tuples', :max_tuples, true)"),
+            {"mode": settings.VECTOR_ITERATIVE_SCAN, "max_tuples": str(settings.VECTOR_MAX_SCAN_TUPLES)}
+        )
+
+    # --- Partition Management ---
+
+    async def count_kb_chunks(self, db: AsyncSession, kb_id: UUID) -> int:
+        """
+        统计指定知识库的切片数量
+        """
+        stmt = select(func.count()).select_from(DocumentChunk).where(DocumentChunk.kb_id == kb_id)
+        result = await db.execute(stmt)
+        return result.scalar() or 0
+
+    async def is_kb_partitioned(self, db: AsyncSession, kb_id: UUID) -> bool:
+        """
+        判断知识库是否已拥有独立的切片分区
+        """
+        part_name = f"document_chunks_{kb_id.hex}"
+        result = await db.execute(
+            text("SELECT to_regclass(format('kms.%I', CAST(:name AS text))) IS NOT NULL"),
+            {"name": part_name}
+        )
+        return bool(result.scalar())
+
+    async def promote_kb_partition(self, db: AsyncSession, kb_id: UUID) -> str:
+        """
+        将知识库切片从 DEFAULT 分区迁出为独立分区 (拥有独立 HNSW 索引)
+        迁移期间会锁定 DEFAULT 分区，建议在入库流水线或维护窗口内调用。
+        """
+        result = await db.execute(
+            text("SELECT kms.promote_kb_chunk_partition(:kb_id)"),
+            {"kb_id": kb_id}
+        )
+        part_name = result.scalar()
+        await db.commit()
+        return part_name
 
     async def search_keyword_chunks(
         self,
         db: AsyncSession,
         query_text: str,
         kb_ids: List[UUID],
-        limit: int = 5
-    ) -> List[DocumentChunk]:
+        limit: int = 5,
+        max_clearance: Optional[int] = None
+    ) -> List[Row]:
         """
         基于 PostgreSQL 全文检索 (Sparse Retrieval)
+        按 ts_rank_cd 相关度排序，返回与向量检索相同投影的轻量 Row
         """
         if not kb_ids:
             return []
             
         # 使用 websearch_to_tsquery 处理用户输入的自然语言
+        # 分词配置需以字面量内联，才能命中 idx_chunks_content_fts 表达式索引
+        ts_config = literal_column("'simple'")
+        ts_query = func.websearch_to_tsquery(ts_config, query_text)
+        ts_vector = func.to_tsvector(ts_config, DocumentChunk.content)
+        rank = func.ts_rank_cd(ts_vector, ts_query)
+
         stmt = (
-            select(DocumentChunk)
-            .join(DocumentChunk.document)
+            select(*self._chunk_columns(), rank.label("score"), Document.title)
+            .join(Document, Document.id == DocumentChunk.doc_id)
             .where(
                 DocumentChunk.kb_id.in_(kb_ids),
-                text("to_tsvector('simple', content) @@ websearch_to_tsquery('simple', :q)")
+                ts_vector.op("@@")(ts_query)
             )
+            .order_by(rank.desc())
             .limit(limit)
-            .options(selectinload(DocumentChunk.document))
         )
+        if max_clearance is not None:
+            stmt = stmt.where(DocumentChunk.clearance <= max_clearance)
         
-        result = await db.execute(stmt, {"q": query_text})
-        return list(result.scalars().all())
+        result = await db.execute(stmt)
+        return list(result.all())
 
 document_crud = CRUDDocument()
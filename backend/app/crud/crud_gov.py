@@ -1,8 +1,8 @@
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, desc
+from sqlalchemy import select, delete, desc, func
 from sqlalchemy.dialects.postgresql import insert
 from app.models.gov import FAQ, DLPPolicy, SystemConfig, AuditLog
 from app.schemas.admin import FAQCreate, FAQUpdate, PolicyCreate, PolicyUpdate
@@ -32,9 +32,15 @@ class CRUDGov:
         result = await db.execute(stmt)
         return result.scalars().first()
 
-    async def create_faq(self, db: AsyncSession, obj_in: FAQCreate, status: str = "APPROVED") -> FAQ:
+    async def create_faq(
+        self,
+        db: AsyncSession,
+        obj_in: FAQCreate,
+        status: str = "APPROVED",
+        embedding: Optional[List[float]] = None
+    ) -> FAQ:
         """
-        创建 FAQ (手动录入通常直接 Approved)
+        创建 FAQ (手动录入通常直接 Approved)，问题向量与条目一并写入 (为空时待回填)
         """
         # 密级映射
         c_map = {"非涉密": 0, "内部公开": 1, "秘密": 2, "机密": 3}
@@ -45,7 +51,8 @@ class CRUDGov:
             answer=obj_in.answer,
             category=obj_in.category,
             clearance=c_val,
-            status=status
+            status=status,
+            embedding=embedding
         )
         db.add(db_obj)
         await db.commit()
@@ -70,6 +77,39 @@ class CRUDGov:
         await db.refresh(db_obj)
         return db_obj
 
+    async def search_faq(
+        self, db: AsyncSession, query_vector: List[float], clearance: int
+    ) -> Optional[Tuple[FAQ, float]]:
+        """
+        检索与问题向量最相近的已发布 FAQ (密级不超过用户密级)，返回 (FAQ, 余弦相似度)
+        """
+        distance = FAQ.embedding.cosine_distance(query_vector)
+        stmt = (
+            select(FAQ, (1 - distance).label("score"))
+            .where(
+                FAQ.status == "APPROVED",
+                FAQ.clearance <= clearance,
+                FAQ.embedding.is_not(None)
+            )
+            .order_by(distance)
+            .limit(1)
+        )
+        result = await db.execute(stmt)
+        row = result.first()
+        return (row[0], float(row[1])) if row else None
+
+    async def get_faqs_without_embedding(self, db: AsyncSession, limit: int = 64) -> List[FAQ]:
+        """
+        获取尚未生成向量的已发布 FAQ (用于批量回填)
+        """
+        stmt = (
+            select(FAQ)
+            .where(FAQ.status == "APPROVED", FAQ.embedding.is_(None))
+            .limit(limit)
+        )
+        result = await db.execute(stmt)
+        return list(result.scalars().all())
+
     async def delete_faq(self, db: AsyncSession, faq_id: UUID):
         stmt = delete(FAQ).where(FAQ.id == faq_id)
         await db.execute(stmt)
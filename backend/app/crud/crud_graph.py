@@ -1,8 +1,10 @@
 
 import json
 from typing import List, Optional, Tuple, Dict, Any
+from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from sqlalchemy import select, text
+from app.models.kms import Document
 from app.schemas.graph import GraphData, GraphNode, GraphEdge, EntityDetail, EntityAttribute, RelatedDoc
 
 class CRUDGraph:
@@ -11,6 +13,9 @@ class CRUDGraph:
     注意：PostgreSQL + AGE 的交互通常通过 cypher() 函数执行原生 SQL。
     """
 
+    # 知识图谱召回取回的候选数 = limit × 该倍数 (按来源文档过滤范围后截断)
+    FACT_CANDIDATE_FACTOR = 5
+
     def _parse_age_vertex(self, row: Any) -> GraphNode:
         """
         解析 AGE 返回的顶点 (Vertex) 数据结构
@@ -160,6 +165,87 @@ class CRUDGraph:
             related_docs=related_docs
         )
 
+    async def search_facts(
+        self,
+        db: AsyncSession,
+        question: str,
+        kb_ids: List[UUID],
+        max_clearance: int,
+        limit: int = 10
+    ) -> List[Tuple[GraphNode, GraphEdge, GraphNode]]:
+        """
+        检索问题中提及的实体的一跳关系 (问答的知识图谱召回源)
+        以实体名称在问题文本中出现作为匹配条件，返回 (实体, 关系, 相邻实体) 三元组
+
+        图谱本身没有知识库 / 密级信息，以实体的来源文档 (MENTIONED_IN 关联的 Document 节点，
+        uuid 对应 kms.documents.id) 界定范围：关系两端的实体都须出现在目标知识库中
+        密级不超过 max_clearance 的文档里，否则不返回 (无来源文档的实体一律不返回)。
+        参数经 cypher() 的第三个参数 (agtype 映射) 传入，$$ 字面量内无法绑定 SQL 参数。
+        """
+        if not kb_ids:
+            return []
+
+        # 范围过滤在取回后进行，多取候选以保证过滤后数量
+        query = text("""
+            SELECT * FROM cypher('military_graph', $$
+                MATCH (n)-[r]-(m)
+                WHERE $question CONTAINS n.name
+                MATCH (n)-[\\:MENTIONED_IN]-(dn:Document), (m)-[\\:MENTIONED_IN]-(dm:Document)
+                RETURN n, r, m, collect(DISTINCT dn.uuid), collect(DISTINCT dm.uuid)
+            $$, :params) as (n agtype, r agtype, m agtype, n_docs agtype, m_docs agtype)
+            LIMIT :candidates;
+        """)
+        result = await db.execute(query, {
+            "params": json.dumps({"question": question}, ensure_ascii=False),
+            "candidates": limit * self.FACT_CANDIDATE_FACTOR,
+        })
+        rows = [
+            (row[0], row[1], row[2], self._parse_age_list(row[3]), self._parse_age_list(row[4]))
+            for row in result.all()
+        ]
+
+        allowed = await self._accessible_documents(
+            db, {doc for row in rows for doc in row[3] + row[4]}, kb_ids, max_clearance
+        )
+        facts = []
+        for n, r, m, n_docs, m_docs in rows:
+            if allowed.isdisjoint(n_docs) or allowed.isdisjoint(m_docs):
+                continue
+            facts.append((self._parse_age_vertex(n), self._parse_age_edge(r), self._parse_age_vertex(m)))
+            if len(facts) >= limit:
+                break
+        return facts
+
+    async def _accessible_documents(
+        self, db: AsyncSession, doc_ids: set, kb_ids: List[UUID], max_clearance: int
+    ) -> set:
+        """
+        来源文档中属于目标知识库且密级不超过 max_clearance 的文档 ID (字符串)
+        """
+        uuids = []
+        for doc_id in doc_ids:
+            try:
+                uuids.append(UUID(str(doc_id)))
+            except ValueError:
+                continue
+        if not uuids:
+            return set()
+        stmt = select(Document.id).where(
+            Document.id.in_(uuids),
+            Document.kb_id.in_(kb_ids),
+            Document.clearance <= max_clearance
+        )
+        result = await db.execute(stmt)
+        return {str(doc_id) for doc_id in result.scalars().all()}
+
+    def _parse_age_list(self, value: Any) -> List[str]:
+        """
+        解析 AGE 返回的字符串列表 (agtype)
+        """
+        if isinstance(value, str):
+            value = json.loads(value)
+        return [str(v) for v in value or [] if v is not None]
+
     async def find_path(self, db: AsyncSession, start_name: str, end_name: str) -> List[GraphData]:
         """
         发现两个实体之间的最短路径
@@ -1,4 +1,8 @@
 
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from app.core.config import settings
 
@@ -19,6 +23,34 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+# 当前问答的会话预算：问答内并发执行的召回源 / 扩展子查询共享，派生的异步任务自动继承
+_session_budget: ContextVar[Optional[asyncio.Semaphore]] = ContextVar("session_budget", default=None)
+
+
+def start_session_budget(limit: int) -> asyncio.Semaphore:
+    """
+    为当前问答安装会话预算：同时打开的 budgeted_session 不超过 limit 个
+    """
+    semaphore = asyncio.Semaphore(limit)
+    _session_budget.set(semaphore)
+    return semaphore
+
+
+@asynccontextmanager
+async def budgeted_session() -> AsyncIterator[AsyncSession]:
+    """
+    在当前问答的会话预算内打开独立会话，预算用尽时等待其他会话关闭；未安装预算时不受限制
+    """
+    semaphore = _session_budget.get()
+    if semaphore is None:
+        async with AsyncSessionLocal() as session:
+            yield session
+    else:
+        async with semaphore:
+            async with AsyncSessionLocal() as session:
+                yield session
+
+
 async def get_db():
     """
     FastAPI 依赖项：获取数据库会话。
@@ -35,6 +35,8 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # 消息历史分页游标 (浏览器端需显式暴露才能读取)
+        expose_headers=["X-Next-Cursor"],
     )
 
 # 注册 API 路由
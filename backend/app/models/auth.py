@@ -3,7 +3,7 @@ import uuid
 from datetime import datetime
 from sqlalchemy import Column, String, Integer, ForeignKey, Boolean, JSON, text, SmallInteger, DateTime, Text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, relationship, backref
 from sqlalchemy.sql import func
 from app.db.base import Base
 
@@ -27,7 +27,7 @@ class Department(Base):
 
     # 关系定义
     users: Mapped[list["User"]] = relationship(back_populates="department")
-    sub_departments: Mapped[list["Department"]] = relationship("Department", backref=relationship("Department", remote_side=[id]))
+    sub_departments: Mapped[list["Department"]] = relationship("Department", backref=backref("parent", remote_side=[id]))
 
 
 class Role(Base):
@@ -1,10 +1,11 @@
 
 import uuid
-from datetime import datetime
-from sqlalchemy import Column, String, Integer, ForeignKey, Boolean, text, SmallInteger, DateTime, Text
+from datetime import date, datetime
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, Boolean, text, SmallInteger, DateTime, Date, Text
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
 from app.db.base import Base
 
 # --- CHAT SCHEMA ---
@@ -56,7 +57,14 @@ class Message(Base):
     # 核心：引用源，存储 RAG 召回的切片 [{"doc_id": "...", "text": "..."}]
     citations: Mapped[list[dict] | None] = mapped_column(JSONB)
     
+    # LLM token 消耗 (prompt + completion)，仅 assistant 消息填写
     tokens_usage: Mapped[int | None] = mapped_column(Integer)
+    prompt_tokens: Mapped[int | None] = mapped_column(Integer)
+    completion_tokens: Mapped[int | None] = mapped_column(Integer)
+    # 各阶段耗时 (毫秒) {"embed": .., "retrieve": .., "generate": .., "total": ..}
+    latency_ms: Mapped[dict | None] = mapped_column(JSONB)
+    # 完整 QAResponse 的紧凑 JSON (写入时序列化)，历史回放原样输出，无需重新构造与校验
+    response_json: Mapped[str | None] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     # 关系
@@ -85,3 +93,54 @@ class Feedback(Base):
 
     # 关系
     message: Mapped["Message"] = relationship(back_populates="feedback")
+
+
+class SemanticCacheEntry(Base):
+    """
+    语义问答缓存表 (chat.semantic_cache)
+    存储已生成的回答及其问题向量。新问题与缓存问题的向量足够相近、且作用域
+    (知识库集合 + 密级 + 各库 Epoch + 检索配置) 完全一致时直接复用回答，跳过 LLM 生成。
+    """
+    __tablename__ = "semantic_cache"
+    __table_args__ = {"schema": "chat"}
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+
+    # 作用域指纹 (SHA-256)，知识库变更后 Epoch 改变，旧条目自然不可达
+    scope_key: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+
+    question: Mapped[str] = mapped_column(Text, nullable=False)
+    embedding = mapped_column(Vector(1536), nullable=False)
+
+    answer: Mapped[str] = mapped_column(Text, nullable=False)
+    thought_chain: Mapped[list[dict] | None] = mapped_column(JSONB)
+    citations: Mapped[list[dict] | None] = mapped_column(JSONB)
+
+    hit_count: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class UsageRollup(Base):
+    """
+    问答资源消耗日汇总表 (chat.usage_rollups)
+    按 (日期, 用户, 知识库) 累加，随问答落库在同一事务中 UPSERT：
+    - kb_id 为全零 UUID 的行是该用户当日的总计 (每轮问答只计一次)，按用户 / 日期统计只读此行
+    - 其余行按检索涉及的知识库累加 (跨库提问计入每个库)，仅用于按知识库统计；
+      各库行相加会重复计数，不应与总计行合并求和
+    """
+    __tablename__ = "usage_rollups"
+    __table_args__ = {"schema": "chat"}
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    kb_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+
+    questions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    prompt_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    completion_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    embedding_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    embed_ms: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    retrieve_ms: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    generate_ms: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    total_ms: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
@@ -99,15 +99,17 @@ class DocumentChunk(Base):
     """
     文档切片表 (kms.document_chunks)
     存储用于 RAG 检索的文本片段及其向量 Embedding
+    按 kb_id 列表分区 (LIST Partitioning)：大库独占分区及其 HNSW 索引，小库共享 DEFAULT 分区。
     """
     __tablename__ = "document_chunks"
-    __table_args__ = {"schema": "kms"}
+    __table_args__ = {"schema": "kms", "postgresql_partition_by": "LIST (kb_id)"}
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     doc_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("kms.documents.id", ondelete="CASCADE"), nullable=False)
-    
+
     # 冗余字段，用于快速按库过滤向量 (Partition Key)
-    kb_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, index=True)
+    # 分区表的主键必须包含分区键，因此主键为 (id, kb_id)
+    kb_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, nullable=False, index=True)
     
     content: Mapped[str] = mapped_column(Text, nullable=False)
     
@@ -116,6 +118,10 @@ class DocumentChunk(Base):
     
     page_idx: Mapped[int | None] = mapped_column(Integer)
     chunk_idx: Mapped[int | None] = mapped_column(Integer)
+
+    # 冗余文档密级，使密级过滤在 ANN 查询内完成而无需关联 documents
+    # 文档重新定密时与 documents.clearance 在同一事务内同步
+    clearance: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=1)
     
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
@@ -136,9 +136,13 @@ class PolicyResponse(BaseModel):
 class RetrievalTiers(BaseModel):
     """
     召回源配置
+    faq / graph / docs 并发召回，FAQ 高置信命中时直接返回并取消其余召回源；
+    llm 关闭时不调用模型生成，直接返回检索到的证据
+    graph 需按问题文本匹配全图实体 (无索引)，默认关闭，图谱规模较小时按需开启；
+    仅返回两端实体的来源文档 (MENTIONED_IN) 均在目标知识库与用户密级范围内的事实
     """
     faq: bool = True
-    graph: bool = True
+    graph: bool = False
     docs: bool = True
     llm: bool = True
 
@@ -147,6 +151,7 @@ class RetrievalEnhanced(BaseModel):
     增强策略配置
     """
     queryRewrite: bool = True
+    multiQuery: bool = False # 多查询改写，并行检索后融合
     hyde: bool = False
     stepback: bool = True
 
@@ -154,17 +159,69 @@ class RetrievalParameters(BaseModel):
     """
     数值参数
     """
-    topK: int = 5
-    threshold: float = 0.75
+    topK: int = Field(default=5, ge=1, le=50)
+    threshold: float = Field(default=0.75, ge=0.0, le=1.0)
+    # HNSW 检索候选队列长度 (hnsw.ef_search)，越大召回越高、延迟越高
+    efSearch: int = Field(default=40, ge=1, le=1000)
+    # FAQ 快速通道命中阈值 (问题向量余弦相似度)，命中后直接返回标准答案
+    faqThreshold: float = Field(default=0.92, ge=0.5, le=1.0)
+    # 多源召回 (FAQ / 图谱 / 文档) 的单次请求延迟预算，自提问起计，超时未完成的召回源被跳过
+    tierBudgetMs: int = Field(default=5000, ge=100, le=30000)
+
+class RerankConfig(BaseModel):
+    """
+    Cross-Encoder 重排序配置
+    """
+    enabled: bool = False
+    candidates: int = Field(default=20, ge=1, le=200) # 参与重排的融合候选数 (Top-N)
+    batchSize: int = Field(default=16, ge=1, le=128)
+    budgetMs: int = Field(default=300, ge=10, le=10000) # 超出预算的批次放弃打分，保持原排序
+
+class DiversityConfig(BaseModel):
+    """
+    去重与多样化 (MMR) 配置
+    """
+    enabled: bool = True
+    candidates: int = Field(default=20, ge=1, le=200) # MMR 候选池大小
+    mmrLambda: float = Field(default=0.7, ge=0.0, le=1.0) # 1.0 仅看相关度, 0.0 仅看多样性
+    dedupThreshold: float = Field(default=0.8, ge=0.0, le=1.0) # shingle Jaccard 近似重复阈值
+
+class SemanticCacheConfig(BaseModel):
+    """
+    语义问答缓存配置
+    """
+    enabled: bool = False
+    threshold: float = Field(default=0.95, ge=0.5, le=1.0) # 问题向量余弦相似度下限
+    ttlSeconds: int = Field(default=86400, ge=60)
+
+class ExpansionConfig(BaseModel):
+    """
+    查询重写与扩展 (多查询 / HyDE / Step-back) 配置
+    """
+    multiQueryCount: int = Field(default=3, ge=1, le=8)
+    # 重写与各扩展共享的延迟预算 (含 LLM 生成、向量化与检索)，超时未完成的任务被取消
+    budgetMs: int = Field(default=1500, ge=100, le=10000)
+
+class SmallToBigConfig(BaseModel):
+    """
+    Small-to-Big 检索配置：以小切片匹配，向 LLM 提供其前后相邻切片组成的窗口
+    """
+    enabled: bool = False
+    window: int = Field(default=1, ge=1, le=5) # 命中切片前后各扩展的切片数
 
 class GlobalSearchConfig(BaseModel):
     """
     全局检索策略配置实体
     """
     strategy: str = "hybrid" # hybrid, vector, keyword
-    tiers: RetrievalTiers
-    enhanced: RetrievalEnhanced
-    parameters: RetrievalParameters
+    tiers: RetrievalTiers = Field(default_factory=RetrievalTiers)
+    enhanced: RetrievalEnhanced = Field(default_factory=RetrievalEnhanced)
+    parameters: RetrievalParameters = Field(default_factory=RetrievalParameters)
+    rerank: RerankConfig = Field(default_factory=RerankConfig)
+    diversity: DiversityConfig = Field(default_factory=DiversityConfig)
+    expansion: ExpansionConfig = Field(default_factory=ExpansionConfig)
+    smallToBig: SmallToBigConfig = Field(default_factory=SmallToBigConfig)
+    semanticCache: SemanticCacheConfig = Field(default_factory=SemanticCacheConfig)
 
 class SearchConfigResponse(BaseModel):
     """
@@ -223,3 +280,21 @@ class SystemHealthResponse(BaseModel):
     overall: Literal['healthy', 'degraded', 'down']
     components: List[ComponentStatus]
     timestamp: datetime
+
+# --- Usage Accounting Schemas ---
+
+class UsageSummaryItem(BaseModel):
+    """
+    资源消耗聚合项 (按用户 / 知识库 / 日期)
+    """
+    key: str # user_id / kb_id / 日期 (YYYY-MM-DD)
+    name: Optional[str] = None # 用户名 / 知识库名
+    questions: int
+    prompt_tokens: int
+    completion_tokens: int
+    embedding_tokens: int
+    # 单次问答各阶段平均耗时 (毫秒)
+    avg_embed_ms: float
+    avg_retrieve_ms: float
+    avg_generate_ms: float
+    avg_total_ms: float
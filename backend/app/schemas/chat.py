@@ -25,6 +25,7 @@ class RetrievalTiers(BaseModel):
 
 class RetrievalEnhanced(BaseModel):
     queryRewrite: bool = True
+    multiQuery: bool = False # 多查询改写
     hyde: bool = False # 假设文档嵌入
     stepback: bool = False # 抽象回退策略
 
@@ -34,8 +35,9 @@ class ChatConfig(BaseModel):
     """
     selected_kb_ids: List[UUID]
     strategy: str = "hybrid" # hybrid, vector, keyword
-    tiers: RetrievalTiers
-    enhanced: RetrievalEnhanced
+    # 未提供的字段 (含嵌套字段) 沿用管理端全局配置
+    tiers: Optional[RetrievalTiers] = None
+    enhanced: Optional[RetrievalEnhanced] = None
 
 # --- Core Chat Objects ---
 
@@ -60,6 +62,7 @@ class ThoughtStep(BaseModel):
     title: str
     content: str
     type: str # search, reason, verify, etc.
+    duration_ms: Optional[float] = None # 阶段耗时 (开启链路追踪时填写)
 
 class QAResponse(BaseModel):
     """
@@ -75,6 +78,14 @@ class QAResponse(BaseModel):
     provenance: List[Provenance]
     timestamp: datetime
 
+class StreamEvent(BaseModel):
+    """
+    流式问答事件 (SSE)
+    event: thought (思维链步骤) / token (回答增量文本) / provenance (引用溯源) / done (完整响应) / error
+    """
+    event: str
+    data: Any
+
 # --- API Request/Response DTOs ---
 
 class ChatMessageCreate(BaseModel):
@@ -85,6 +96,32 @@ class ChatMessageCreate(BaseModel):
     config: Optional[ChatConfig] = None
     quote: Optional[str] = None # 针对特定上下文的追问
 
+class BatchQuestion(BaseModel):
+    """
+    批量问答中的单个问题
+    """
+    id: Optional[str] = None # 调用方自定义标识，原样回传
+    query: str
+    config: Optional[ChatConfig] = None
+
+class BatchQARequest(BaseModel):
+    """
+    批量问答请求 (回归评测 / 批量简报生成)
+    """
+    items: List[BatchQuestion] = Field(min_length=1, max_length=1000)
+    concurrency: int = Field(default=4, ge=1, le=16) # 实际并发另受 BATCH_QA_MAX_CONCURRENCY 限制
+
+class BatchQAResult(BaseModel):
+    """
+    批量问答结果 (JSONL 每行一条，按完成顺序输出)
+    """
+    index: int
+    id: Optional[str] = None
+    query: str
+    response: Optional[QAResponse] = None
+    error: Optional[str] = None
+    latency_ms: float
+
 class SessionCreate(BaseModel):
     title: Optional[str] = None
     bound_kb_ids: List[UUID]
@@ -65,6 +65,12 @@ class DocumentDetail(DocumentResponse):
     meta: Optional[Dict[str, Any]]
     s3_key: str # 仅供后端调试或特定权限查看
 
+class DocumentClearanceUpdate(BaseModel):
+    """
+    文档重新定密
+    """
+    clearance: str # "非涉密", "内部公开", "秘密", "机密"
+
 class DesensitizeResponse(BaseModel):
     url: str # 临时下载链接
 
@@ -1,7 +1,7 @@
 
 from uuid import UUID
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Optional
+from datetime import date, datetime, timedelta
 import csv
 import io
 import time
@@ -11,13 +11,17 @@ from sqlalchemy import text
 from app.crud.crud_auth import auth_crud
 from app.crud.crud_gov import gov_crud
 from app.crud.crud_document import document_crud
+from app.crud.crud_chat import chat_crud
 from app.models.auth import User
 from app.models.kms import KnowledgeBase, KbACL
+from app.models.gov import FAQ
 from app.core.security import get_password_hash
 from app.schemas.auth import ClearanceLevel
-from app.schemas.admin import AdminUserCreate, AdminUserUpdate, AuditExportRequest, AuditExportResponse, SystemHealthResponse, ComponentStatus
-from app.schemas.document import KBCreate, KBUpdate, KBResponse
+from app.schemas.admin import AdminUserCreate, AdminUserUpdate, AuditExportRequest, AuditExportResponse, SystemHealthResponse, ComponentStatus, FAQCreate, FAQUpdate, UsageSummaryItem
+from app.schemas.document import KBCreate, KBUpdate, KBResponse, DocumentResponse
 from app.core.config import settings
+from app.services.kb_epoch_service import kb_epoch_service
+from app.services.embedding_service import embedding_service
 
 class AdminService:
     """
@@ -172,6 +176,28 @@ class AdminService:
         if not kb:
             raise HTTPException(status_code=404, detail="KB not found")
         await document_crud.delete_kb(db, kb_id)
+        await kb_epoch_service.bump(kb_id)
+
+    async def update_document_clearance(self, db: AsyncSession, doc_id: UUID, clearance_str: str) -> DocumentResponse:
+        """
+        文档重新定密，同步切片冗余密级并使所在知识库的检索 / 问答缓存失效
+        """
+        doc = await document_crud.update_document_clearance(
+            db, doc_id, self._map_clearance_str_to_int(clearance_str)
+        )
+        if not doc:
+            raise HTTPException(status_code=404, detail="Document not found")
+        await kb_epoch_service.bump(doc.kb_id)
+
+        return DocumentResponse(
+            id=doc.id,
+            kb_id=doc.kb_id,
+            title=doc.title,
+            type="FILE",
+            clearance=self._map_clearance_int_to_str(doc.clearance),
+            created_at=doc.created_at,
+            status=doc.status
+        )
 
     # --- Approval Logic ---
 
@@ -199,14 +225,75 @@ class AdminService:
         await db.commit()
         return True
 
+    async def create_faq(self, db: AsyncSession, faq_in: FAQCreate) -> FAQ:
+        """
+        手动录入 FAQ (直接发布) 并生成问题向量
+        向量化失败时向量留空：FAQ 快速通道不检索无向量条目，由 backfill_faq_embeddings 补齐
+        """
+        vector = await self._embed_question(faq_in.question)
+        return await gov_crud.create_faq(db, faq_in, status="APPROVED", embedding=vector)
+
+    async def update_faq(self, db: AsyncSession, faq_id: UUID, faq_in: FAQUpdate) -> FAQ:
+        """
+        更新 FAQ，问题文本或状态变化时重新生成向量
+        """
+        faq = await gov_crud.get_faq(db, faq_id)
+        if not faq:
+            raise HTTPException(status_code=404, detail="FAQ not found")
+        question = faq_in.question if faq_in.question is not None else faq.question
+        status = faq_in.status if faq_in.status is not None else faq.status
+        if status == "APPROVED" and (faq.embedding is None or question != faq.question):
+            # 向量化失败时清空旧向量 (问题已变化)，与其余字段同一次提交
+            faq.embedding = await self._embed_question(question)
+        return await gov_crud.update_faq(db, faq, faq_in)
+
     async def approve_faq(self, db: AsyncSession, faq_id: UUID) -> bool:
         faq = await gov_crud.get_faq(db, faq_id)
         if not faq:
             raise HTTPException(status_code=404, detail="FAQ not found")
+        # 发布时生成向量，FAQ 快速通道仅检索已发布且有向量的条目
+        # 状态与向量同一次提交；向量化失败时向量留空，由回填补齐
+        faq.embedding = await self._embed_question(faq.question)
         faq.status = "APPROVED"
         await db.commit()
         return True
 
+    async def backfill_faq_embeddings(self, db: AsyncSession, batch_size: int = 64) -> int:
+        """
+        分批为缺失向量的已发布 FAQ 生成向量，返回处理条数
+        """
+        total = 0
+        while True:
+            faqs = await gov_crud.get_faqs_without_embedding(db, limit=batch_size)
+            if not faqs:
+                break
+            if not await self._embed_faqs(db, faqs):
+                # 向量化不可用：保留空向量，下次回填重试
+                break
+            total += len(faqs)
+            if len(faqs) < batch_size:
+                break
+        return total
+
+    async def _embed_faqs(self, db: AsyncSession, faqs: List[FAQ]) -> bool:
+        """
+        批量向量化 FAQ 问题文本 (单次 Embedding 请求)，失败时不写入并返回 False
+        """
+        vectors = await embedding_service.get_embeddings_or_none([f.question for f in faqs])
+        if vectors is None:
+            return False
+        for faq, vector in zip(faqs, vectors):
+            faq.embedding = vector
+        await db.commit()
+        return True
+
+    async def _embed_question(self, question: str) -> Optional[List[float]]:
+        """
+        单条 FAQ 问题向量，失败时为 None (从不返回伪随机向量)
+        """
+        vectors = await embedding_service.get_embeddings_or_none([question])
+        return vectors[0] if vectors else None
+
     async def reject_faq(self, db: AsyncSession, faq_id: UUID) -> bool:
         faq = await gov_crud.get_faq(db, faq_id)
         if not faq:
@@ -252,6 +339,41 @@ class AdminService:
         
         return AuditExportResponse(url=data_url)
 
+    async def get_usage_summary(
+        self,
+        db: AsyncSession,
+        group_by: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        limit: int = 100
+    ) -> List[UsageSummaryItem]:
+        """
+        资源消耗聚合 (默认最近 30 天，日期为 UTC)
+        """
+        end_date = end_date or datetime.utcnow().date()
+        start_date = start_date or end_date - timedelta(days=29)
+        rows = await chat_crud.get_usage_summary(db, group_by, start_date, end_date, limit)
+
+        def avg(total, questions: int) -> float:
+            return round(float(total or 0) / questions, 1) if questions else 0.0
+
+        items = []
+        for row in rows:
+            questions = int(row.questions or 0)
+            items.append(UsageSummaryItem(
+                key=str(row.key),
+                name=row._mapping.get("name"),
+                questions=questions,
+                prompt_tokens=int(row.prompt_tokens or 0),
+                completion_tokens=int(row.completion_tokens or 0),
+                embedding_tokens=int(row.embedding_tokens or 0),
+                avg_embed_ms=avg(row.embed_ms, questions),
+                avg_retrieve_ms=avg(row.retrieve_ms, questions),
+                avg_generate_ms=avg(row.generate_ms, questions),
+                avg_total_ms=avg(row.total_ms, questions)
+            ))
+        return items
+
     async def check_system_health(self, db: AsyncSession) -> SystemHealthResponse:
         """
         检查系统各组件健康状态
@@ -2,7 +2,7 @@
 import json
 import logging
 import base64
-from typing import List, Any
+from typing import Any, AsyncIterator, List, Tuple
 from fastapi import UploadFile
 
 from app.schemas.agent import (
@@ -46,25 +46,34 @@ class AgentService:
         self.llm = get_llm()
 
     async def write(self, req: AgentWriteRequest) -> str:
+        return await self.llm.generate_text(*self._write_prompts(req))
+
+    def stream_write(self, req: AgentWriteRequest) -> AsyncIterator[str]:
+        """
+        流式写作：逐段产出模型输出
+        """
+        return self.llm.stream_text(*self._write_prompts(req))
+
+    async def optimize(self, req: AgentOptimizeRequest) -> str:
+        return await self.llm.generate_text(*self._optimize_prompts(req))
+
+    def stream_optimize(self, req: AgentOptimizeRequest) -> AsyncIterator[str]:
+        return self.llm.stream_text(*self._optimize_prompts(req))
+
+    def _write_prompts(self, req: AgentWriteRequest) -> Tuple[str, str]:
         # 使用模板组装 Prompt
         user_prompt = PromptTemplate.AGENT_WRITE_USER.value.format(
             topic=req.topic, 
             outline=req.outline or '请自行构思合理大纲'
         )
-        return await self.llm.generate_text(
-            system_prompt=PromptTemplate.AGENT_WRITE_SYSTEM.value,
-            user_prompt=user_prompt
-        )
+        return PromptTemplate.AGENT_WRITE_SYSTEM.value, user_prompt
 
-    async def optimize(self, req: AgentOptimizeRequest) -> str:
+    def _optimize_prompts(self, req: AgentOptimizeRequest) -> Tuple[str, str]:
         user_prompt = PromptTemplate.AGENT_OPTIMIZE_USER.value.format(
             content=req.content,
             instruction=req.instruction or '无特殊要求，请全面优化'
         )
-        return await self.llm.generate_text(
-            system_prompt=PromptTemplate.AGENT_OPTIMIZE_SYSTEM.value,
-            user_prompt=user_prompt
-        )
+        return PromptTemplate.AGENT_OPTIMIZE_SYSTEM.value, user_prompt
 
     async def format(self, req: AgentFormatRequest) -> str:
         # 1. 获取标准配置
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.auth import User
+from app.schemas.chat import BatchQARequest, BatchQAResult, BatchQuestion, ChatMessageCreate
+from app.services.embedding_service import embedding_service
+from app.services.rag_engine import rag_engine
+from app.services.retrieval_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+class BatchQAService:
+    """
+    批量问答服务
+    1. 对全部问题去重后批量向量化 (每批 BATCH_QA_EMBED_SIZE 条，一次请求)，向量传入 RAG 流水线复用
+    2. 以信号量限制并发，各问题使用独立数据库会话，无状态执行 (不读取对话历史、不落库)
+    3. 结果按完成顺序产出，调用方逐行输出 JSONL
+    """
+
+    async def run(self, user: User, request: BatchQARequest) -> AsyncIterator[BatchQAResult]:
+        concurrency = min(request.concurrency, settings.BATCH_QA_MAX_CONCURRENCY)
+        # 每次批量执行对应一个虚拟会话 ID，仅用于响应体与链路标识
+        run_id = uuid.uuid4()
+        vectors = await self._embed_queries([item.query for item in request.items])
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def answer(index: int, item: BatchQuestion) -> BatchQAResult:
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    async with AsyncSessionLocal() as db:
+                        response = await rag_engine.process_query(
+                            db, user, run_id,
+                            ChatMessageCreate(query=item.query, config=item.config),
+                            persist=False,
+                            query_vec=vectors.get(normalize_query(item.query))
+                        )
+                    error = None
+                except Exception as e:
+                    logger.error(f"Batch QA item {index} failed: {e}")
+                    response, error = None, str(e)
+                return BatchQAResult(
+                    index=index,
+                    id=item.id,
+                    query=item.query,
+                    response=response,
+                    error=error,
+                    latency_ms=round((time.perf_counter() - started) * 1000, 1)
+                )
+
+        tasks = [asyncio.create_task(answer(i, item)) for i, item in enumerate(request.items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 客户端断开 / 生成器提前关闭时取消未完成的问题，并等待其清理完成 (释放合并、关闭会话)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _embed_queries(self, queries: List[str]) -> Dict[str, Optional[List[float]]]:
+        """
+        按规范化文本去重后分批向量化，返回 {规范化查询: 向量}
+        """
+        unique: Dict[str, str] = {}
+        for query in queries:
+            unique.setdefault(normalize_query(query), query)
+        keys = list(unique.keys())
+
+        vectors: Dict[str, Optional[List[float]]] = {}
+        size = settings.BATCH_QA_EMBED_SIZE
+        for start in range(0, len(keys), size):
+            batch = keys[start:start + size]
+            embeddings = await embedding_service.get_embeddings([unique[k] for k in batch])
+            vectors.update(zip(batch, embeddings))
+        return vectors
+
+batch_qa_service = BatchQAService()
@@ -0,0 +1,164 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+
+# 可选依赖：安装 tiktoken 时精确计数，否则按字符类型估算
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# 常见模型的上下文窗口 (token)，未列出的模型按 DEFAULT_CONTEXT_WINDOW 处理
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "deepseek-chat": 64000,
+    "deepseek-reasoner": 64000,
+    "qwen-turbo": 131072,
+    "qwen-plus": 131072,
+    "qwen-max": 32768,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+class TokenCounter:
+    """
+    Token 计数器
+    tiktoken 可用时使用模型对应编码；否则 CJK 字符按 1 token、其余字符按 3.5 字符 / token 保守估算。
+    """
+
+    def __init__(self, model: str):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        cjk = len(_CJK_RE.findall(text))
+        return cjk + int((len(text) - cjk) / 3.5 + 0.5)
+
+
+@dataclass
+class AssembledContext:
+    """
+    上下文组装结果
+    """
+    text: str
+    tokens: int
+    budget: int
+    # 实际进入上下文的命中 (保持得分顺序)，用于构造溯源
+    used_hits: List[Tuple[Any, float]] = field(default_factory=list)
+    dropped: int = 0
+
+
+class ContextAssembler:
+    """
+    上下文组装器
+    1. 按得分顺序贪心装填切片，直至达到模型相关的 token 预算
+    2. 同一文档中 chunk_idx 相邻的切片合并为连续片段，并去除切片间的重叠文本
+    3. 每个文档只输出一次标题，文档按其最高得分排序
+    """
+
+    # 相邻切片重叠检测的长度范围 (字符)，上限覆盖入库切片的 overlap 设置，
+    # 下限避免把偶然相同的标点 / 短词当作重叠删除
+    MIN_OVERLAP = 8
+    MAX_OVERLAP = 200
+
+    def budget_for(self, model: str, reserved_tokens: int = 0) -> int:
+        """
+        计算上下文可用 token 数：min(模型窗口 - 回答预留 - 提示词开销, CONTEXT_MAX_TOKENS)
+        """
+        window = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+        available = window - settings.CONTEXT_ANSWER_RESERVE - reserved_tokens
+        return max(0, min(available, settings.CONTEXT_MAX_TOKENS))
+
+    def assemble(
+        self,
+        hits: Sequence[Tuple[Any, float]],
+        model: Optional[str] = None,
+        reserved_text: str = ""
+    ) -> AssembledContext:
+        """
+        hits: [(chunk, score), ...]，chunk 需具备 doc_id / title / chunk_idx / content 属性，已按得分排序
+        reserved_text: 提示词中上下文以外的部分 (系统提示、模板、问题)，计入预算开销
+        """
+        model = model or settings.LLM_MODEL_NAME
+        counter = TokenCounter(model)
+        budget = self.budget_for(model, counter.count(reserved_text))
+
+        used: List[Tuple[Any, float]] = []
+        seen_docs = set()
+        spent = 0
+        for chunk, score in hits:
+            cost = counter.count(chunk.content) + 2
+            if chunk.doc_id not in seen_docs:
+                cost += counter.count(self._doc_header(chunk.title)) + 2
+            if spent + cost > budget:
+                continue
+            used.append((chunk, score))
+            seen_docs.add(chunk.doc_id)
+            spent += cost
+
+        text = self._render(used)
+        dropped = len(hits) - len(used)
+        if dropped:
+            logger.info(f"Context budget {budget} tokens: packed {len(used)} chunks, dropped {dropped}")
+        return AssembledContext(
+            text=text,
+            tokens=counter.count(text),
+            budget=budget,
+            used_hits=used,
+            dropped=dropped
+        )
+
+    def _doc_header(self, title: str) -> str:
+        return f"[文档: {title}]"
+
+    def _render(self, used: Sequence[Tuple[Any, float]]) -> str:
+        """
+        按文档分组输出，组内按 chunk_idx 合并相邻切片
+        """
+        groups: Dict[Any, List[Any]] = {}
+        for chunk, _ in used:
+            groups.setdefault(chunk.doc_id, []).append(chunk)
+
+        blocks = []
+        for chunks in groups.values():
+            ordered = sorted(chunks, key=lambda c: (c.chunk_idx is None, c.chunk_idx or 0))
+            spans: List[str] = []
+            prev_idx: Optional[int] = None
+            for chunk in ordered:
+                if spans and prev_idx is not None and chunk.chunk_idx == prev_idx + 1:
+                    spans[-1] = self._merge(spans[-1], chunk.content)
+                else:
+                    spans.append(chunk.content)
+                prev_idx = chunk.chunk_idx
+            blocks.append(self._doc_header(ordered[0].title) + "\n" + "\n……\n".join(spans))
+        return "\n\n".join(blocks)
+
+    def _merge(self, left: str, right: str) -> str:
+        """
+        拼接相邻切片，去除 left 末尾与 right 开头的最长重叠
+        """
+        max_len = min(len(left), len(right), self.MAX_OVERLAP)
+        for size in range(max_len, self.MIN_OVERLAP - 1, -1):
+            if left.endswith(right[:size]):
+                return left + right[size:]
+        return left + right
+
+context_assembler = ContextAssembler()
@@ -1,7 +1,8 @@
 
-from typing import List
+from typing import List, Optional
 import openai
 from app.core.config import settings
+from app.core.llm.usage import record_embedding_usage, track_stage
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,16 +34,61 @@ class EmbeddingService:
         try:
             # 移除换行符以优化向量质量
             text = text.replace("\n", " ")
-            response = await self.client.embeddings.create(
-                input=[text],
-                model=settings.EMBEDDING_MODEL
-            )
+            with track_stage("embed"):
+                response = await self.client.embeddings.create(
+                    input=[text],
+                    model=settings.EMBEDDING_MODEL
+                )
+            record_embedding_usage(response.usage)
             return response.data[0].embedding
         except Exception as e:
             logger.error(f"Embedding failed: {e}")
             # Fallback to mock in dev/error cases to keep system running
             return self._mock_embedding()
 
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量获取文本向量 (单次请求，结果与输入顺序对齐)
+        """
+        if not texts:
+            return []
+        if not self.client:
+            return [self._mock_embedding() for _ in texts]
+
+        try:
+            with track_stage("embed"):
+                response = await self.client.embeddings.create(
+                    input=[t.replace("\n", " ") for t in texts],
+                    model=settings.EMBEDDING_MODEL
+                )
+            record_embedding_usage(response.usage)
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+        except Exception as e:
+            logger.error(f"Batch embedding failed: {e}")
+            return [self._mock_embedding() for _ in texts]
+
+    async def get_embeddings_or_none(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """
+        批量获取需要持久化的文本向量 (如 FAQ)
+        未配置模型或调用失败时返回 None，不使用伪随机向量，调用方保留空向量待回填
+        """
+        if not texts:
+            return []
+        if not self.client:
+            return None
+
+        try:
+            with track_stage("embed"):
+                response = await self.client.embeddings.create(
+                    input=[t.replace("\n", " ") for t in texts],
+                    model=settings.EMBEDDING_MODEL
+                )
+            record_embedding_usage(response.usage)
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+        except Exception as e:
+            logger.error(f"Batch embedding failed: {e}")
+            return None
+
     def _mock_embedding(self) -> List[float]:
         """
         生成伪随机向量 (用于开发环境/无 Key 状态)
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.llm.factory import get_llm
+from app.core.prompts import PromptTemplate
+from app.crud.crud_chat import chat_crud
+from app.db.session import AsyncSessionLocal
+from app.schemas.chat import MessageRole
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConversationHistory:
+    """
+    进入提示词的对话历史：滚动摘要 + 最近若干轮原文
+    """
+    summary: str = ""
+    # [(role, content), ...]，按时间正序
+    recent: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not self.summary and not self.recent
+
+
+class HistoryManager:
+    """
+    多轮对话历史管理
+    最近 HISTORY_RECENT_TURNS 轮原文进入提示词，更早的轮次折叠为滚动摘要，
+    摘要保存在 Conversation.config_snapshot["history_summary"] = {"text": ..., "upto": 已折叠的最后一条消息时间}。
+    每次回答后在后台增量刷新摘要，提示词长度与会话长度无关。
+    """
+
+    SNAPSHOT_KEY = "history_summary"
+    # 单次折叠的最大消息数，摘要长期未刷新时只折叠最近的部分，保证刷新开销有界
+    FOLD_MAX_MESSAGES = 20
+
+    def __init__(self):
+        self.llm = get_llm()
+        self._pending: Set[asyncio.Task] = set()
+        # 正在刷新摘要的会话，避免同一会话并发折叠
+        self._refreshing: Set[uuid.UUID] = set()
+
+    @property
+    def window(self) -> int:
+        return settings.HISTORY_RECENT_TURNS * 2
+
+    async def load(self, db: AsyncSession, conversation_id: uuid.UUID) -> ConversationHistory:
+        """
+        读取滚动摘要与最近若干轮原文 (本轮提问尚未落库，不在其中)
+        """
+        snapshot = await chat_crud.get_config_snapshot(db, conversation_id)
+        summary = (snapshot.get(self.SNAPSHOT_KEY) or {}).get("text", "")
+        rows = await chat_crud.get_recent_messages(db, conversation_id, limit=self.window)
+        recent = [(row.role, self._clip(row.content)) for row in reversed(rows)]
+        return ConversationHistory(summary=summary, recent=recent)
+
+    def render(self, history: ConversationHistory) -> str:
+        """
+        渲染为提示词片段 (无历史时为空串)
+        """
+        if history.empty:
+            return ""
+        lines = ["【对话历史】"]
+        if history.summary:
+            lines.append(f"(摘要) {history.summary}")
+        lines.extend(self._format_turns(history.recent))
+        return "\n".join(lines) + "\n\n"
+
+    def refresh_later(self, conversation_id: uuid.UUID):
+        """
+        在后台刷新会话摘要，不阻塞问答响应
+        """
+        if conversation_id in self._refreshing:
+            return
+        self._refreshing.add(conversation_id)
+        task = asyncio.create_task(self._refresh(conversation_id))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _refresh(self, conversation_id: uuid.UUID):
+        """
+        将滑出最近窗口、且尚未折叠的消息合并进摘要
+        """
+        try:
+            async with AsyncSessionLocal() as db:
+                snapshot = await chat_crud.get_config_snapshot(db, conversation_id)
+                state = snapshot.get(self.SNAPSHOT_KEY) or {}
+                upto = datetime.fromisoformat(state["upto"]) if state.get("upto") else None
+
+                rows = await chat_crud.get_recent_messages(
+                    db, conversation_id, limit=self.FOLD_MAX_MESSAGES, offset=self.window, after=upto
+                )
+                if not rows:
+                    return
+                rows.reverse()
+
+                user_prompt = PromptTemplate.RAG_HISTORY_SUMMARY_USER.value.format(
+                    max_chars=settings.HISTORY_SUMMARY_MAX_CHARS,
+                    summary=state.get("text") or "(无)",
+                    turns="\n".join(self._format_turns([(r.role, self._clip(r.content)) for r in rows]))
+                )
+                summary = await self.llm.generate_text(
+                    system_prompt=PromptTemplate.RAG_HISTORY_SUMMARY_SYSTEM.value,
+                    user_prompt=user_prompt,
+                    temperature=0.2
+                )
+                await chat_crud.update_config_snapshot(db, conversation_id, {
+                    self.SNAPSHOT_KEY: {
+                        "text": summary.strip()[:settings.HISTORY_SUMMARY_MAX_CHARS],
+                        "upto": rows[-1].created_at.isoformat(),
+                    }
+                })
+        except Exception as e:
+            logger.error(f"History summary refresh failed for {conversation_id}: {e}")
+        finally:
+            self._refreshing.discard(conversation_id)
+
+    def _format_turns(self, turns: List[Tuple[str, str]]) -> List[str]:
+        return [
+            f"{'用户' if role == MessageRole.USER else '助手'}：{content}"
+            for role, content in turns
+        ]
+
+    def _clip(self, content: str) -> str:
+        limit = settings.HISTORY_MESSAGE_MAX_CHARS
+        return content if len(content) <= limit else content[:limit] + "…"
+
+history_manager = HistoryManager()
@@ -5,10 +5,12 @@ from typing import List
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import UploadFile
 
+from app.core.config import settings
 from app.db.session import AsyncSessionLocal
 from app.models.kms import Document, DocumentChunk
 from app.crud.crud_document import document_crud
 from app.services.embedding_service import embedding_service
+from app.services.kb_epoch_service import kb_epoch_service
 from app.utils.file_converter import file_converter
 
 logger = logging.getLogger(__name__)
@@ -63,7 +65,8 @@ class IngestionService:
                         content=text_chunk,
                         embedding=vector,
                         chunk_idx=i,
-                        page_idx=0 # 解析器暂未返回页码，默认为 0
+                        page_idx=0, # 解析器暂未返回页码，默认为 0
+                        clearance=doc.clearance
                     )
                     chunk_objs.append(chunk_obj)
 
@@ -74,10 +77,33 @@ class IngestionService:
                 await document_crud.update_document_status(db, doc_id, "READY")
                 logger.info(f"Document {doc_id} processing complete.")
 
+                # 知识库内容已变更，使相关检索缓存失效
+                await kb_epoch_service.bump(doc.kb_id)
+
+                # 6. 大库迁出为独立分区，保证带库过滤的 ANN 检索精度
+                await self._maybe_promote_partition(db, doc.kb_id)
+
             except Exception as e:
                 logger.error(f"Ingestion failed for doc {doc_id}: {str(e)}")
                 await document_crud.update_document_status(db, doc_id, "FAILED")
 
+    async def _maybe_promote_partition(self, db: AsyncSession, kb_id: uuid.UUID):
+        """
+        切片数超过阈值的知识库迁出 DEFAULT 分区
+        迁移失败不影响文档入库结果，仅记录日志 (检索仍可在 DEFAULT 分区上进行)。
+        """
+        try:
+            if await document_crud.is_kb_partitioned(db, kb_id):
+                return
+            chunk_count = await document_crud.count_kb_chunks(db, kb_id)
+            if chunk_count < settings.VECTOR_PARTITION_THRESHOLD:
+                return
+            part_name = await document_crud.promote_kb_partition(db, kb_id)
+            logger.info(f"KB {kb_id} ({chunk_count} chunks) promoted to partition {part_name}")
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Partition promotion failed for KB {kb_id}: {str(e)}")
+
     def _recursive_split(self, text: str, chunk_size: int, overlap: int) -> List[str]:
         """
         简易切片算法
@@ -0,0 +1,36 @@
+import uuid
+from typing import List, Optional
+from app.core.cache import cache
+
+class KBEpochService:
+    """
+    知识库索引版本号 (Epoch) 服务
+    每个知识库在 Redis 中维护一个单调递增的计数器。文档入库、删除或密级调整后递增，
+    所有以 Epoch 作为缓存键组成部分的检索 / 问答缓存随之在 O(1) 内整体失效，
+    无需逐条扫描删除，旧条目由 TTL 自然淘汰。
+    """
+
+    KEY_PREFIX = "kb_epoch:"
+
+    def _key(self, kb_id: uuid.UUID) -> str:
+        return f"{self.KEY_PREFIX}{kb_id}"
+
+    async def get_epochs(self, kb_ids: List[uuid.UUID]) -> Optional[List[int]]:
+        """
+        批量获取知识库 Epoch (与 kb_ids 顺序对齐)
+        Redis 不可用时返回 None，调用方应跳过缓存以保证数据新鲜度。
+        """
+        if not kb_ids:
+            return []
+        values = await cache.mget([self._key(kb_id) for kb_id in kb_ids])
+        if values is None:
+            return None
+        return [int(v) if v else 0 for v in values]
+
+    async def bump(self, kb_id: uuid.UUID) -> Optional[int]:
+        """
+        递增知识库 Epoch，使其相关缓存失效
+        """
+        return await cache.incr(self._key(kb_id))
+
+kb_epoch_service = KBEpochService()
@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import re
+import uuid
+from dataclasses import dataclass
+from typing import List
+from app.core.cache import cache
+from app.core.llm.factory import get_llm
+from app.core.prompts import PromptTemplate
+from app.services.retrieval_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# 指代 / 省略标记：命中时问题通常依赖上文，需要结合对话历史改写
+_ANAPHORA_RE = re.compile(r"它|其|该|此|这|那|上述|前者|后者|他们|它们|上面|刚才|之前")
+
+
+@dataclass
+class RewriteContext:
+    """
+    查询重写所需的会话上下文
+    """
+    conversation_id: uuid.UUID
+    # 渲染后的对话历史 (无历史时为空串)
+    history_str: str = ""
+
+class QueryExpansionService:
+    """
+    查询扩展服务
+    - rewrite: 结合对话历史改写为可独立检索的查询 (按会话 + 查询缓存)
+    - multi_query: 多查询改写，覆盖不同用词习惯
+    - hyde: 假设文档嵌入 (Hypothetical Document Embeddings)，以假想答案段落的向量检索
+    - step_back: 抽象回退，检索更一般的背景 / 原理资料
+    各方法仅负责生成扩展文本，检索与预算控制由 RAGEngine 编排。
+    """
+
+    REWRITE_CACHE_PREFIX = "rag:rewrite:"
+    REWRITE_CACHE_TTL = 3600
+    # 不含指代的短查询视为自足，跳过重写
+    REWRITE_MIN_CHARS = 12
+
+    def __init__(self):
+        self.llm = get_llm()
+
+    def needs_rewrite(self, query: str, has_history: bool) -> bool:
+        """
+        启发式判断是否值得发起重写：
+        有对话历史且含指代 -> 重写；否则短查询跳过，长查询 (口语化 / 多约束) 重写
+        """
+        if has_history and _ANAPHORA_RE.search(query):
+            return True
+        return len(normalize_query(query)) >= self.REWRITE_MIN_CHARS
+
+    async def rewrite(self, query: str, ctx: RewriteContext) -> str:
+        """
+        重写查询，结果按 (会话, 规范化查询) 缓存；返回空串表示无有效改写
+        """
+        digest = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+        key = f"{self.REWRITE_CACHE_PREFIX}{ctx.conversation_id}:{digest}"
+        cached = await cache.get(key)
+        if isinstance(cached, dict):
+            return cached.get("q", "")
+
+        output = await self.llm.generate_text(
+            system_prompt=PromptTemplate.RAG_REWRITE_SYSTEM.value,
+            user_prompt=PromptTemplate.RAG_REWRITE_USER.value.format(
+                history_str=ctx.history_str, query=query
+            ),
+            temperature=0.1
+        )
+        rewritten = output.strip().splitlines()[0].strip() if output.strip() else ""
+        if normalize_query(rewritten) == normalize_query(query):
+            rewritten = ""
+        await cache.set(key, {"q": rewritten}, expire=self.REWRITE_CACHE_TTL)
+        return rewritten
+
+    async def multi_query(self, query: str, n: int) -> List[str]:
+        output = await self.llm.generate_text(
+            system_prompt=PromptTemplate.RAG_MULTI_QUERY_SYSTEM.value,
+            user_prompt=PromptTemplate.RAG_MULTI_QUERY_USER.value.format(n=n, query=query),
+            temperature=0.5
+        )
+        queries = []
+        for line in output.splitlines():
+            line = line.strip().lstrip("-•0123456789.、) ").strip()
+            if line and line != query and line not in queries:
+                queries.append(line)
+        return queries[:n]
+
+    async def hyde(self, query: str) -> str:
+        return await self.llm.generate_text(
+            system_prompt=PromptTemplate.RAG_HYDE_SYSTEM.value,
+            user_prompt=PromptTemplate.RAG_HYDE_USER.value.format(query=query),
+            temperature=0.3
+        )
+
+    async def step_back(self, query: str) -> str:
+        output = await self.llm.generate_text(
+            system_prompt=PromptTemplate.RAG_STEPBACK_SYSTEM.value,
+            user_prompt=PromptTemplate.RAG_STEPBACK_USER.value.format(query=query),
+            temperature=0.2
+        )
+        return output.strip()
+
+query_expansion_service = QueryExpansionService()
@@ -1,21 +1,75 @@
 
+import asyncio
+import logging
+import time
 import uuid
 import json
-from typing import List, Tuple
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.schemas.chat import ChatMessageCreate, QAResponse, Provenance, ThoughtStep, ChatConfig
+from app.schemas.chat import ChatMessageCreate, QAResponse, Provenance, ThoughtStep, ChatConfig, StreamEvent
+from app.schemas.admin import GlobalSearchConfig
+from app.schemas.graph import GraphEdge, GraphNode
 from app.models.auth import User
+from app.models.chat import SemanticCacheEntry
+from app.models.gov import FAQ
 from app.crud.crud_chat import chat_crud
 from app.crud.crud_document import document_crud
+from app.crud.crud_gov import gov_crud
+from app.crud.crud_graph import graph_crud
 from app.core.llm.factory import get_llm
+from app.core.llm.usage import current_meter, start_meter, track_stage
+from app.core.config import settings
 from app.core.prompts import PromptTemplate
+from app.core.tracing import Span, tracer
+from app.db.session import budgeted_session, start_session_budget
 from app.services.embedding_service import embedding_service
+from app.services.search_config_service import search_config_service
+from app.services.rerank_service import rerank_service
+from app.services.retrieval_cache import retrieval_cache
+from app.services.semantic_cache import semantic_cache
+from app.services.query_expansion import RewriteContext, query_expansion_service
+from app.services.context_assembler import context_assembler
+from app.services.history_manager import ConversationHistory, history_manager
+from app.services.singleflight import Flight, singleflight
+from app.services.tier_orchestrator import TierRun, tier_orchestrator
+from app.utils.diversity import dedupe_passages, mmr_select
+
+logger = logging.getLogger(__name__)
+
+# 知识图谱召回源返回的最大事实数
+GRAPH_FACT_LIMIT = 10
+
+# 密级数值 <-> 展示标签
+CLEARANCE_LABELS = {0: "非涉密", 1: "内部公开", 2: "秘密", 3: "机密"}
+CLEARANCE_LEVELS = {label: level for level, label in CLEARANCE_LABELS.items()}
+
+@dataclass
+class QueryTurn:
+    """
+    单轮问答的会话上下文
+    persist=False 时为无状态执行 (批量评测等)：不读取对话历史，不落库
+    """
+    conversation_id: uuid.UUID
+    question: str
+    asked_at: datetime
+    persist: bool = True
+    # 本轮作为合并领头请求时持有的句柄，生成完成后发布结果
+    flight: Optional[Flight] = None
+    # 思维链中与提问用户无关、可共享给其他请求的起始位置 (安全围栏检查之后)
+    shared_steps_from: int = 0
+
 
 class RAGEngine:
     """
     安全智能问答引擎 (RAG Engine) - Real Implementation
     负责编排检索、推理和生成流程。
     """
+
+    # Reciprocal Rank Fusion 平滑常数
+    RRF_K = 60
     
     def __init__(self):
         self.llm = get_llm()
@@ -25,136 +79,992 @@ class RAGEngine:
         db: AsyncSession, 
         user: User, 
         conversation_id: uuid.UUID, 
-        query_in: ChatMessageCreate
+        query_in: ChatMessageCreate,
+        persist: bool = True,
+        query_vec: Optional[List[float]] = None
     ) -> QAResponse:
         """
-        处理用户提问的主入口
+        处理用户提问的主入口 (非流式)，消费事件流并返回完整响应
         """
-        # 1. 保存用户提问
-        await chat_crud.create_message(
-            db, conversation_id, "user", query_in.query
-        )
+        response: Optional[QAResponse] = None
+        async for event in self.stream_query(db, user, conversation_id, query_in, persist, query_vec):
+            if event.event == "done":
+                response = event.data
+        return response
+
+    async def stream_query(
+        self, 
+        db: AsyncSession, 
+        user: User, 
+        conversation_id: uuid.UUID, 
+        query_in: ChatMessageCreate,
+        persist: bool = True,
+        query_vec: Optional[List[float]] = None
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        流式问答：思维链步骤完成即推送 (thought)，回答按模型输出增量推送 (token)，
+        生成结束后保存 AI 回答，最后推送引用溯源 (provenance) 与完整响应 (done)
+        整个问答记录为一条链路 (根 Span: rag.query)，各阶段为其子 Span。
+        persist: False 时不读取对话历史、不落库 (批量评测)
+        query_vec: 调用方已批量计算的查询向量
+        """
+        # 提问时间在入口记录，问答两条消息在回答生成后于同一事务中落库
+        turn = QueryTurn(conversation_id, query_in.query, datetime.now(timezone.utc), persist)
+        try:
+            with tracer.span("rag.query", conversation_id=str(conversation_id), user_id=str(user.id)):
+                async for event in self._run_query(db, user, turn, query_in, query_vec):
+                    yield event
+        finally:
+            # 领头请求失败 / 被取消时释放等待中的相同请求，由其自行计算
+            if turn.flight is not None:
+                await turn.flight.abandon()
 
+    async def _run_query(
+        self, 
+        db: AsyncSession, 
+        user: User, 
+        turn: QueryTurn, 
+        query_in: ChatMessageCreate,
+        query_vec: Optional[List[float]] = None
+    ) -> AsyncIterator[StreamEvent]:
+        conversation_id = turn.conversation_id
         thought_process: List[ThoughtStep] = []
+        emitted = 0
+
+        def new_steps() -> List[StreamEvent]:
+            # 取出上次推送后新增的思维链步骤 (检索子流程内部也会追加步骤)
+            nonlocal emitted
+            steps = thought_process[emitted:]
+            emitted = len(thought_process)
+            return [StreamEvent(event="thought", data=step) for step in steps]
+
+        # 本轮资源计量 (token 与各阶段耗时)，随问答一并落库
+        target_kb_ids = query_in.config.selected_kb_ids if query_in.config else []
+        meter = start_meter(user_id=user.id, kb_ids=target_kb_ids)
+        # 本轮并发召回共享的数据库连接预算，避免单个问题占满连接池
+        start_session_budget(settings.RAG_QUERY_MAX_SESSIONS)
+
+        # 全局检索策略 (管理端配置) 与本次请求显式指定的策略合并
+        search_config = self._resolve_search_config(
+            await search_config_service.get_config(db), query_in.config
+        )
         
+        # 多轮上下文：最近若干轮原文 + 滚动摘要，长度有界
+        history = await history_manager.load(db, conversation_id) if turn.persist else ConversationHistory()
+        history_str = history_manager.render(history)
+
         # --- Step 1: 意图识别与重写 (Query Rewrite) ---
+        # 重写与多查询 / HyDE / Step-back 扩展一样在检索阶段投机执行：原始查询立即检索，
+        # 重写结果在预算内到达才参与融合，不额外增加一次串行 LLM 往返
         rewritten_query = query_in.query
-        # 简单实现：如果有配置且需要，可以调用 LLM 进行重写
-        # 这里为了响应速度，若 query 较短或 config 开启，则记录步骤
-        if query_in.config and query_in.config.enhanced.queryRewrite:
-             thought_process.append(ThoughtStep(
-                title="语义重写", 
-                content=f"分析历史上下文，检索式保持: '{rewritten_query}' (当前仅做 Passthrough)", 
-                type="rewrite"
-            ))
+        rewrite_ctx = RewriteContext(conversation_id=conversation_id, history_str=history_str)
 
         # --- Step 2: 权限边界界定 (Security Boundary) ---
-        target_kb_ids = query_in.config.selected_kb_ids if query_in.config else []
-        # TODO: 验证 target_kb_ids 是否均在用户 authorized_kbs 中
+        # 无权访问的知识库 (ACL / 密级 / 已归档) 从检索范围中排除，后续召回与缓存键只使用授权范围
+        requested = len(target_kb_ids)
+        with tracer.span("acl_check", kb_count=requested) as span:
+            target_kb_ids = await document_crud.filter_authorized_kb_ids(db, user, target_kb_ids)
+            if span is not None:
+                span.set_attribute("denied", requested - len(target_kb_ids))
+        meter.kb_ids = list(target_kb_ids)
+        denied = requested - len(target_kb_ids)
+        content = f"已验证用户 {user.username} 对目标知识库的访问权限：{len(target_kb_ids)} 个库可访问"
+        if denied:
+            content += f"，{denied} 个库无权访问已排除"
         thought_process.append(ThoughtStep(
             title="安全围栏检查", 
-            content=f"已验证用户 {user.username} 对目标知识库 {len(target_kb_ids)} 个库的访问权限 (ACL Pass)。", 
-            type="security_check"
+            content=content + "。", 
+            type="security_check",
+            duration_ms=self._span_ms(span)
         ))
+        turn.shared_steps_from = len(thought_process)
+        for event in new_steps():
+            yield event
 
-        # --- Step 3: 混合检索 (Hybrid Retrieval) ---
-        # 调用真实检索
-        retrieved_texts, provenance_list = await self._hybrid_retrieval(
-            db, rewritten_query, target_kb_ids, limit=5
-        )
-        
-        thought_process.append(ThoughtStep(
-            title="混合检索执行", 
-            content=f"执行向量检索(pgvector)与关键词检索，召回 {len(provenance_list)} 个高相关切片。", 
-            type="search"
-        ))
+        params = search_config.parameters
+        cache_cfg = search_config.semanticCache
+        tiers = search_config.tiers
+
+        # --- 请求合并 (Singleflight) ---
+        # 同一范围内相同的首轮提问并发到达时只执行一次召回与生成，其余请求等待并复用结果 (各自落库)
+        if settings.SINGLEFLIGHT_ENABLED and history.empty:
+            flight_key = await singleflight.build_key(
+                query_in.query, target_kb_ids, user.clearance_level, search_config
+            )
+            with tracer.span("singleflight") as span:
+                turn.flight, shared = await singleflight.acquire(flight_key)
+                if span is not None:
+                    span.set_attribute("shared", shared is not None)
+            if shared is not None:
+                thought_process.append(ThoughtStep(
+                    title="请求合并",
+                    content="相同问题正在处理中，已等待并复用其检索与生成结果。",
+                    type="search",
+                    duration_ms=self._span_ms(span)
+                ))
+                thought_process.extend(ThoughtStep.model_validate(t) for t in shared["thought_process"])
+                provenance_list = [Provenance.model_validate(p) for p in shared["provenance"]]
+                async for event in self._finish(
+                    db, turn, shared["answer"], thought_process, provenance_list, new_steps()
+                ):
+                    yield event
+                return
+
+        # 追问的回答依赖对话上下文，语义缓存仅用于会话首轮提问
+        scope_key: Optional[str] = None
+        if cache_cfg.enabled and history.empty:
+            scope_key = await semantic_cache.build_scope_key(
+                target_kb_ids, user.clearance_level, search_config
+            )
+        # 查询向量只计算一次，FAQ 通道、语义缓存与向量检索共用
+        if query_vec is None and (tiers.faq or scope_key):
+            with tracer.span("embed"):
+                query_vec = await embedding_service.get_embedding(rewritten_query)
+
+        # --- Step 3: 多源召回 (FAQ / 语义缓存 / 知识图谱 / 文档) ---
+        # 各召回源并发执行 (独立会话)；FAQ 或语义缓存高置信命中时直接返回并取消其余召回源，
+        # 整体受单次请求延迟预算约束，超时的召回源被跳过
+        docs_steps: List[ThoughtStep] = []
+        sources = {}
+        if tiers.faq:
+            sources["faq"] = lambda: self._faq_tier(query_vec, user.clearance_level)
+        if scope_key:
+            sources["cache"] = lambda: self._cache_tier(scope_key, query_vec, cache_cfg.threshold, params.efSearch)
+        if tiers.graph and target_kb_ids:
+            sources["graph"] = lambda: self._graph_tier(query_in.query, target_kb_ids, user.clearance_level)
+        if tiers.docs and target_kb_ids:
+            sources["docs"] = lambda: self._docs_tier(
+                rewritten_query, target_kb_ids, user.clearance_level, search_config,
+                query_vec, docs_steps, rewrite_ctx
+            )
+        budget = params.tierBudgetMs / 1000 - (datetime.now(timezone.utc) - turn.asked_at).total_seconds()
+        with tracer.span("tiers", sources=",".join(sources)) as span:
+            run = await tier_orchestrator.run(sources, budget, decisive={
+                "faq": lambda hit: hit is not None and hit[1] >= params.faqThreshold,
+                "cache": lambda hit: hit is not None,
+            })
+            if span is not None:
+                span.set_attribute("winner", run.winner or "")
+        if sources:
+            thought_process.append(ThoughtStep(
+                title="多源召回",
+                content=self._describe_tiers(run),
+                type="search",
+                duration_ms=self._span_ms(span)
+            ))
+
+        # FAQ 快速通道：命中已发布的标准问答时直接返回，跳过 LLM 生成
+        if run.winner == "faq":
+            faq, similarity = run.value("faq")
+            thought_process.append(ThoughtStep(
+                title="FAQ 命中",
+                content=f"匹配标准问答「{faq.question[:50]}」(相似度 {similarity:.3f})，直接返回审核发布的答案。",
+                type="search",
+                duration_ms=run.outcomes["faq"].duration_ms
+            ))
+            provenance_list = [Provenance(
+                sentence_id=str(faq.id),
+                source_type="FAQ",
+                source_name=faq.category or "标准问答库",
+                text=faq.question,
+                score=round(similarity, 3),
+                security_level=CLEARANCE_LABELS.get(faq.clearance, "内部公开")
+            )]
+            async for event in self._finish(
+                db, turn, faq.answer, thought_process, provenance_list, new_steps()
+            ):
+                yield event
+            return
+
+        # 语义缓存：复用释义相近问题的已生成回答
+        if run.winner == "cache":
+            entry, similarity = run.value("cache")
+            thought_process.append(ThoughtStep(
+                title="语义缓存命中",
+                content=f"与历史问题「{entry.question[:50]}」语义相似度 {similarity:.3f}，复用已生成回答。",
+                type="search",
+                duration_ms=run.outcomes["cache"].duration_ms
+            ))
+            provenance_list = [Provenance.model_validate(c) for c in entry.citations or []]
+            async for event in self._finish(
+                db, turn, entry.answer, thought_process, provenance_list, new_steps()
+            ):
+                yield event
+            return
 
-        # --- Step 4: 答案生成 (Generation) ---
-        if not retrieved_texts:
+        hits = run.value("docs") or []
+        facts = run.value("graph") or []
+        if run.value("docs") is not None:
+            thought_process.extend(docs_steps)
+            thought_process.append(ThoughtStep(
+                title="混合检索执行", 
+                content=(
+                    f"检索策略: {search_config.strategy} (topK={params.topK}, threshold={params.threshold}, "
+                    f"ef_search={params.efSearch}{', Cross-Encoder 重排' if search_config.rerank.enabled else ''})，"
+                    f"召回 {len(hits)} 个高相关切片。"
+                ),
+                type="search",
+                duration_ms=run.outcomes["docs"].duration_ms
+            ))
+        for event in new_steps():
+            yield event
+
+        # --- Step 4: 上下文组装 (Context Assembly) ---
+        # 按模型 token 预算装填，相邻切片合并去重叠，溯源仅包含实际进入上下文的切片；
+        # 知识图谱事实整体置于文档上下文之前
+        facts_str = self._format_facts(facts)
+        with tracer.span("context_assembly") as span:
+            assembled = context_assembler.assemble(
+                hits,
+                reserved_text=(
+                    PromptTemplate.RAG_ANSWER_SYSTEM.value + PromptTemplate.RAG_ANSWER_USER.value
+                    + history_str + facts_str + query_in.query
+                )
+            )
+        provenance_list = self._build_graph_provenance(facts) + self._build_provenance(assembled.used_hits)
+        if hits:
+            thought_process.append(ThoughtStep(
+                title="上下文组装",
+                content=(
+                    f"装填 {len(assembled.used_hits)}/{len(hits)} 个切片，"
+                    f"约 {assembled.tokens} tokens (预算 {assembled.budget})。"
+                ),
+                type="reason",
+                duration_ms=self._span_ms(span)
+            ))
+            for event in new_steps():
+                yield event
+
+        # --- Step 5: 答案生成 (Generation) ---
+        # 关闭 LLM 召回源时不调用模型，直接返回进入上下文的证据
+        if not tiers.llm:
+            thought_process.append(ThoughtStep(
+                title="证据直出",
+                content=f"未启用 LLM 生成，直接返回 {len(provenance_list)} 条召回证据。",
+                type="reason"
+            ))
+            async for event in self._finish(
+                db, turn, self._evidence_answer(provenance_list), thought_process, provenance_list, new_steps()
+            ):
+                yield event
+            return
+
+        if not assembled.text and not facts_str:
             context_str = "未找到相关内部资料。"
         else:
-            context_str = "\n\n".join(retrieved_texts)
+            context_str = facts_str + assembled.text
             
         user_prompt = PromptTemplate.RAG_ANSWER_USER.value.format(
+            history_str=history_str,
             context_str=context_str,
             query=query_in.query
         )
         
-        answer_text = await self.llm.generate_text(
-            system_prompt=PromptTemplate.RAG_ANSWER_SYSTEM.value,
-            user_prompt=user_prompt
-        )
-
-        thought_process.append(ThoughtStep(
+        if not history.empty:
+            thought_process.append(ThoughtStep(
+                title="多轮上下文",
+                content=(
+                    f"引入最近 {len(history.recent)} 条对话原文"
+                    f"{'及更早轮次的滚动摘要' if history.summary else ''}。"
+                ),
+                type="reason"
+            ))
+        generate_step = ThoughtStep(
             title="逻辑增强生成", 
             content="基于召回的上下文，利用 LLM 进行事实聚合与逻辑推理，生成最终回答。", 
             type="reason"
-        ))
+        )
+        thought_process.append(generate_step)
+        for event in new_steps():
+            yield event
 
-        # 3. 保存 AI 回答
-        citations_json = [p.model_dump(mode='json') for p in provenance_list]
-        thoughts_json = [t.model_dump(mode='json') for t in thought_process]
-        
-        ai_msg = await chat_crud.create_message(
-            db, conversation_id, "assistant", answer_text, 
-            thought_chain=thoughts_json,
-            citations=citations_json
+        parts: List[str] = []
+        generate_started = time.perf_counter()
+        with tracer.span("generate") as span:
+            async for delta in self.llm.stream_text(
+                system_prompt=PromptTemplate.RAG_ANSWER_SYSTEM.value,
+                user_prompt=user_prompt
+            ):
+                parts.append(delta)
+                yield StreamEvent(event="token", data={"text": delta})
+        answer_text = "".join(parts)
+        # 生成步骤先于回答推送，耗时在生成结束后补记 (随 done 事件与落库的思维链返回)
+        generate_step.duration_ms = self._span_ms(span)
+        meter = current_meter()
+        if meter is not None:
+            meter.add_stage("generate", (time.perf_counter() - generate_started) * 1000)
+
+        response = await self._save_answer(
+            db, turn, answer_text, thought_process, provenance_list
         )
 
-        # 4. 构造响应
-        return QAResponse(
-            id=ai_msg.id,
-            conversation_id=conversation_id,
+        # 写入语义缓存，供后续释义相近的提问复用 (后台写入，不占用响应路径)
+        if scope_key:
+            semantic_cache.store_later(
+                scope_key, rewritten_query, query_vec, answer_text,
+                thought_chain=[t.model_dump(mode='json') for t in thought_process[turn.shared_steps_from:]],
+                citations=[p.model_dump(mode='json') for p in provenance_list],
+                ttl_seconds=cache_cfg.ttlSeconds
+            )
+        yield StreamEvent(event="provenance", data=provenance_list)
+        yield StreamEvent(event="done", data=response)
+
+    async def _finish(
+        self,
+        db: AsyncSession,
+        turn: QueryTurn,
+        answer_text: str,
+        thought_process: List[ThoughtStep],
+        provenance_list: List[Provenance],
+        pending: List[StreamEvent]
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        直接返回已有答案 (FAQ / 语义缓存命中、请求合并、证据直出)：答案作为单个 token 事件整体推送
+        """
+        for event in pending:
+            yield event
+        yield StreamEvent(event="token", data={"text": answer_text})
+        response = await self._save_answer(
+            db, turn, answer_text, thought_process, provenance_list
+        )
+        yield StreamEvent(event="provenance", data=provenance_list)
+        yield StreamEvent(event="done", data=response)
+
+    async def _save_answer(
+        self,
+        db: AsyncSession,
+        turn: QueryTurn,
+        answer_text: str,
+        thought_process: List[ThoughtStep],
+        provenance_list: List[Provenance]
+    ) -> QAResponse:
+        """
+        保存本轮问答并构造响应
+        提问与回答在同一事务中提交，提交完成 (持久化) 后才返回响应。
+        """
+        # 合并领头请求在落库前发布结果，等待中的相同请求无需等待本轮落库
+        # 只发布与用户无关的步骤，跟随者在自己的安全围栏检查之后接续
+        if turn.flight is not None:
+            await turn.flight.publish({
+                "answer": answer_text,
+                "thought_process": [
+                    t.model_dump(mode='json') for t in thought_process[turn.shared_steps_from:]
+                ],
+                "provenance": [p.model_dump(mode='json') for p in provenance_list],
+            })
+
+        meter = current_meter()
+        if meter is not None:
+            meter.add_stage("total", (datetime.now(timezone.utc) - turn.asked_at).total_seconds() * 1000)
+
+        # 响应先于落库构造 (消息 ID 与时间戳在应用端生成)，完整响应序列化后随消息保存，历史回放直接输出
+        response = QAResponse(
+            id=uuid.uuid4(),
+            conversation_id=turn.conversation_id,
             answer=answer_text,
             confidence=0.92, # 可根据检索分数计算
-            security_badge="内部", # 应取召回文档最高密级
+            security_badge=self._security_badge(provenance_list),
             is_desensitized=True,
             thought_process=thought_process,
             provenance=provenance_list,
-            timestamp=ai_msg.created_at
+            timestamp=max(datetime.now(timezone.utc), turn.asked_at)
         )
 
+        if turn.persist:
+            citations_json = [p.model_dump(mode='json') for p in provenance_list]
+            thoughts_json = [t.model_dump(mode='json') for t in thought_process]
+            with tracer.span("persist"):
+                await chat_crud.save_exchange(
+                    db, turn.conversation_id, turn.question, answer_text, turn.asked_at,
+                    thought_chain=thoughts_json,
+                    citations=citations_json,
+                    usage=meter,
+                    answer_id=response.id,
+                    answered_at=response.timestamp,
+                    response_json=response.model_dump_json()
+                )
+            # 滑出最近窗口的轮次在后台折叠进滚动摘要
+            history_manager.refresh_later(turn.conversation_id)
+
+        return response
+
+    def _span_ms(self, span: Optional[Span]) -> Optional[float]:
+        """
+        已结束 Span 的耗时 (追踪关闭时为 None)
+        """
+        return span.duration_ms if span is not None else None
+
+    async def _faq_tier(self, query_vec: List[float], user_clearance: int) -> Optional[Tuple[FAQ, float]]:
+        """
+        FAQ 召回源：最相近的已发布标准问答
+        召回源并发执行，AsyncSession 不支持并发使用，各召回源在本轮会话预算内使用独立会话。
+        """
+        async with budgeted_session() as session:
+            return await gov_crud.search_faq(session, query_vec, user_clearance)
+
+    async def _cache_tier(
+        self, scope_key: str, query_vec: List[float], threshold: float, ef_search: int
+    ) -> Optional[Tuple[SemanticCacheEntry, float]]:
+        async with budgeted_session() as session:
+            return await semantic_cache.lookup(session, scope_key, query_vec, threshold, ef_search=ef_search)
+
+    async def _graph_tier(
+        self, query: str, kb_ids: List[uuid.UUID], user_clearance: int
+    ) -> List[Tuple[GraphNode, GraphEdge, GraphNode]]:
+        """
+        知识图谱召回源：仅返回来源文档在授权知识库与用户密级范围内的事实
+        """
+        async with budgeted_session() as session:
+            return await graph_crud.search_facts(
+                session, query, kb_ids, user_clearance, limit=GRAPH_FACT_LIMIT
+            )
+
+    async def _docs_tier(
+        self,
+        query: str,
+        kb_ids: List[uuid.UUID],
+        user_clearance: int,
+        search_config: GlobalSearchConfig,
+        query_vec: Optional[List[float]],
+        thought_process: List[ThoughtStep],
+        rewrite_ctx: Optional[RewriteContext]
+    ) -> List[Tuple[Row, float]]:
+        """
+        文档召回源：混合检索，开启 Small-to-Big 时扩展为相邻切片窗口
+        """
+        async with budgeted_session() as session:
+            with track_stage("retrieve"):
+                hits = await self._hybrid_retrieval(
+                    session, query, kb_ids, user_clearance, search_config,
+                    query_vec=query_vec, thought_process=thought_process, rewrite_ctx=rewrite_ctx
+                )
+                if search_config.smallToBig.enabled and hits:
+                    with tracer.span("small_to_big"):
+                        hits = await self._expand_windows(
+                            session, hits, kb_ids, user_clearance, search_config.smallToBig.window
+                        )
+        return hits
+
+    def _describe_tiers(self, run: TierRun) -> str:
+        """
+        多源召回的思维链描述：各召回源结果与耗时
+        """
+        labels = {"faq": "FAQ", "cache": "语义缓存", "graph": "知识图谱", "docs": "文档"}
+        parts = []
+        for name, outcome in run.outcomes.items():
+            if outcome.status == "hit":
+                result = "高置信命中"
+            elif outcome.status == "ok":
+                if name == "graph":
+                    result = f"{len(outcome.value)} 条事实"
+                elif name == "docs":
+                    result = f"{len(outcome.value)} 个切片"
+                else:
+                    result = "未命中"
+            elif outcome.status == "cancelled":
+                result = "已取消"
+            elif outcome.status == "timeout":
+                result = "超出预算已跳过"
+            else:
+                result = "失败"
+            if outcome.duration_ms is not None and outcome.status in ("hit", "ok"):
+                result += f" ({outcome.duration_ms:.0f}ms)"
+            parts.append(f"{labels[name]} {result}")
+        summary = f"并发召回：{'；'.join(parts)}。"
+        if run.winner:
+            summary += f"{labels[run.winner]} 命中，其余召回源提前结束。"
+        return summary
+
+    def _format_facts(self, facts: List[Tuple[GraphNode, GraphEdge, GraphNode]]) -> str:
+        """
+        知识图谱事实渲染为上下文片段 (无事实时为空串)
+        """
+        if not facts:
+            return ""
+        lines = ["【知识图谱】"]
+        lines.extend(f"- {n.label} -[{r.label}]- {m.label}" for n, r, m in facts)
+        return "\n".join(lines) + "\n\n"
+
+    def _evidence_answer(self, provenance_list: List[Provenance]) -> str:
+        """
+        不调用 LLM 时的回答：逐条列出召回证据
+        """
+        if not provenance_list:
+            return "未找到相关内部资料。"
+        lines = ["未启用模型生成，以下为检索到的相关资料：", ""]
+        lines.extend(
+            f"{i}. 【{p.source_name}】{p.text}" for i, p in enumerate(provenance_list, 1)
+        )
+        return "\n".join(lines)
+
+    def _security_badge(self, provenance_list: List[Provenance]) -> str:
+        """
+        回答密级标识取所引用证据的最高密级 (无引用时按内部公开处理)
+        """
+        level = max(
+            (CLEARANCE_LEVELS.get(p.security_level, 1) for p in provenance_list),
+            default=1
+        )
+        return CLEARANCE_LABELS[level]
+
+    def _resolve_search_config(
+        self, global_config: GlobalSearchConfig, chat_config: Optional[ChatConfig]
+    ) -> GlobalSearchConfig:
+        """
+        合并检索配置：以全局配置为基准，逐字段覆盖请求中显式指定的策略字段
+        (tiers / enhanced 按嵌套字段合并，未提供的开关沿用全局配置)
+        数值参数 (topK / threshold / efSearch) 始终由管理端统一控制。
+        """
+        if not chat_config:
+            return global_config
+
+        merged = global_config.model_dump()
+        changed = False
+        if "strategy" in chat_config.model_fields_set:
+            merged["strategy"] = chat_config.strategy
+            changed = True
+        for field in ("tiers", "enhanced"):
+            value = getattr(chat_config, field)
+            if value is None:
+                continue
+            explicit = value.model_dump(exclude_unset=True)
+            if explicit:
+                merged[field] = merged[field] | explicit
+                changed = True
+
+        if not changed:
+            return global_config
+        return GlobalSearchConfig.model_validate(merged)
+
     async def _hybrid_retrieval(
-        self, db: AsyncSession, query: str, kb_ids: List[uuid.UUID], limit: int = 5
-    ) -> Tuple[List[str], List[Provenance]]:
+        self,
+        db: AsyncSession,
+        query: str,
+        kb_ids: List[uuid.UUID],
+        user_clearance: int,
+        search_config: GlobalSearchConfig,
+        query_vec: Optional[List[float]] = None,
+        thought_process: Optional[List[ThoughtStep]] = None,
+        rewrite_ctx: Optional[RewriteContext] = None
+    ) -> List[Tuple[Row, float]]:
         """
-        执行混合检索 (Dense + Sparse)
+        执行混合检索 (Dense + Sparse)，结果经检索缓存 (KB Epoch 失效) 加速
         """
         if not kb_ids:
-            return [], []
+            return []
 
-        # 1. 向量化查询
-        query_vec = await embedding_service.get_embedding(query)
-        
-        # 2. 数据库检索 (Cosine Similarity)
-        # 阈值设为 0.5 过滤低质量结果
-        chunks_with_score = await document_crud.search_similar_chunks(
-            db, query_vec, kb_ids, limit=limit, score_threshold=0.5
+        hits = None
+        # 结合对话历史的重写使召回依赖会话上下文，此时缓存键按会话隔离
+        cache_scope = None
+        if rewrite_ctx and rewrite_ctx.history_str and search_config.enhanced.queryRewrite:
+            cache_scope = str(rewrite_ctx.conversation_id)
+        cache_key = await retrieval_cache.build_key(
+            query, kb_ids, user_clearance, search_config, scope=cache_scope
         )
-        
-        # 3. 格式化结果
-        retrieved_texts = []
+        if cache_key:
+            cached = await retrieval_cache.get(cache_key)
+            if cached is not None:
+                # 命中：跳过向量化与向量检索，仅按 ID 回表取切片内容
+                scores = dict(cached)
+                rows = await document_crud.get_chunks_by_ids(
+                    db, list(scores.keys()), kb_ids, max_clearance=user_clearance
+                )
+                hits = [(row, scores[row.id]) for row in rows]
+
+        if hits is None:
+            hits = await self._retrieve_hits(
+                db, query, kb_ids, user_clearance, search_config, query_vec, thought_process, rewrite_ctx
+            )
+            if cache_key:
+                await retrieval_cache.set(cache_key, [(chunk.id, score) for chunk, score in hits])
+
+        return hits
+
+    async def _retrieve_hits(
+        self,
+        db: AsyncSession,
+        query: str,
+        kb_ids: List[uuid.UUID],
+        user_clearance: int,
+        search_config: GlobalSearchConfig,
+        query_vec: Optional[List[float]] = None,
+        thought_process: Optional[List[ThoughtStep]] = None,
+        rewrite_ctx: Optional[RewriteContext] = None
+    ) -> List[Tuple[Row, float]]:
+        """
+        召回 + 后处理流水线
+        strategy: vector 仅向量检索, keyword 仅全文检索, hybrid 两路召回后 RRF 融合
+        开启查询重写 / 扩展时，各扩展与原始查询并行召回，在共享预算内完成的结果一并参与 RRF 融合。
+        之后依次执行可选的 Cross-Encoder 重排与去重 / MMR 多样化。
+        """
+        params = search_config.parameters
+        strategy = search_config.strategy
+        rerank_cfg = search_config.rerank
+        diversity_cfg = search_config.diversity
+        use_rerank = rerank_cfg.enabled and rerank_service.available
+        # 开启重排 / 多样化时扩大召回深度，为后处理阶段提供 Top-N 候选池
+        depth = params.topK
+        if use_rerank:
+            depth = max(depth, rerank_cfg.candidates)
+        if diversity_cfg.enabled:
+            depth = max(depth, diversity_cfg.candidates)
+        dense_hits: List[Tuple[Row, float]] = []
+        sparse_hits: List[Tuple[Row, float]] = []
+
+        # 查询扩展先行启动 (各自独立会话)，与原始查询检索并发执行
+        started = time.perf_counter()
+        expansion_tasks = self._start_expansions(
+            query, kb_ids, user_clearance, search_config, depth, rewrite_ctx
+        )
+
+        try:
+            if strategy != "keyword":
+                # 1. 向量化查询 (调用方已计算时直接复用)
+                if query_vec is None:
+                    with tracer.span("embed"):
+                        query_vec = await embedding_service.get_embedding(query)
+                # 2. 数据库检索 (Cosine Similarity)，阈值与 ef_search 来自全局配置
+                with tracer.span("dense_search", limit=depth, ef_search=params.efSearch):
+                    rows = await document_crud.search_similar_chunks(
+                        db, query_vec, kb_ids,
+                        limit=depth,
+                        score_threshold=params.threshold,
+                        ef_search=params.efSearch,
+                        max_clearance=user_clearance # 密级过滤下推到 ANN 查询内
+                    )
+                dense_hits = [(row, row.score) for row in rows]
+
+            if strategy != "vector":
+                with tracer.span("sparse_search", limit=depth):
+                    rows = await document_crud.search_keyword_chunks(
+                        db, query, kb_ids, limit=depth,
+                        max_clearance=user_clearance
+                    )
+                sparse_hits = [(row, row.score) for row in rows]
+        except BaseException:
+            # 原始查询检索失败 / 请求被取消时一并取消扩展任务
+            for task in expansion_tasks:
+                task.cancel()
+            raise
+
+        if strategy == "vector":
+            ranked_lists = [dense_hits]
+        elif strategy == "keyword":
+            ranked_lists = [sparse_hits]
+        else:
+            ranked_lists = [dense_hits, sparse_hits]
+
+        if expansion_tasks:
+            budget = search_config.expansion.budgetMs / 1000 - (time.perf_counter() - started)
+            expanded_lists = await self._collect_expansions(expansion_tasks, budget, thought_process)
+            ranked_lists.extend(expanded_lists)
+
+        if len(ranked_lists) == 1:
+            hits = ranked_lists[0]
+        else:
+            hits = self._fuse_rrf(ranked_lists, limit=depth)
+
+        # 可选：Cross-Encoder 重排序，提升 Top-K 精度
+        if use_rerank and len(hits) > 1:
+            with tracer.span("rerank", candidates=len(hits)):
+                hits = await self._rerank(query, hits, search_config)
+
+        # 去重 + MMR 多样化：同样的上下文预算承载更多不同证据
+        if diversity_cfg.enabled and len(hits) > 1:
+            with tracer.span("diversify", candidates=len(hits)):
+                hits = await self._diversify(db, hits, params.topK, kb_ids, search_config)
+        return hits[:params.topK]
+
+    def _start_expansions(
+        self,
+        query: str,
+        kb_ids: List[uuid.UUID],
+        user_clearance: int,
+        search_config: GlobalSearchConfig,
+        depth: int,
+        rewrite_ctx: Optional[RewriteContext] = None
+    ) -> Dict[asyncio.Task, str]:
+        """
+        按配置启动查询扩展任务，返回 {任务: 扩展名称}
+        查询重写需要会话上下文，且按启发式跳过自足的短查询；
+        HyDE 生成的是段落而非检索式，仅用于向量检索 (keyword 策略下跳过)。
+        """
+        enhanced = search_config.enhanced
+        kinds = []
+        if enhanced.queryRewrite and rewrite_ctx and query_expansion_service.needs_rewrite(
+            query, bool(rewrite_ctx.history_str)
+        ):
+            kinds.append("rewrite")
+        if enhanced.multiQuery:
+            kinds.append("multi_query")
+        if enhanced.hyde and search_config.strategy != "keyword":
+            kinds.append("hyde")
+        if enhanced.stepback:
+            kinds.append("step_back")
+
+        return {
+            asyncio.create_task(
+                self._run_expansion(kind, query, kb_ids, user_clearance, search_config, depth, rewrite_ctx)
+            ): kind
+            for kind in kinds
+        }
+
+    async def _run_expansion(
+        self,
+        kind: str,
+        query: str,
+        kb_ids: List[uuid.UUID],
+        user_clearance: int,
+        search_config: GlobalSearchConfig,
+        depth: int,
+        rewrite_ctx: Optional[RewriteContext] = None
+    ) -> List[List[Tuple[Row, float]]]:
+        """
+        单个扩展：LLM 生成扩展文本 -> 批量向量化 -> 各子查询并发检索
+        """
+        with tracer.span(f"expansion.{kind}"):
+            if kind == "rewrite":
+                texts = [await query_expansion_service.rewrite(query, rewrite_ctx)]
+            elif kind == "multi_query":
+                texts = await query_expansion_service.multi_query(query, search_config.expansion.multiQueryCount)
+            elif kind == "hyde":
+                texts = [await query_expansion_service.hyde(query)]
+            else:
+                texts = [await query_expansion_service.step_back(query)]
+            texts = [t for t in texts if t]
+            if not texts:
+                return []
+
+            if search_config.strategy == "keyword":
+                vectors = [None] * len(texts)
+            else:
+                vectors = await embedding_service.get_embeddings(texts)
+
+            return list(await asyncio.gather(*[
+                self._search_expansion(text, vector, kb_ids, user_clearance, search_config, depth)
+                for text, vector in zip(texts, vectors)
+            ]))
+
+    async def _search_expansion(
+        self,
+        text: str,
+        vector: Optional[List[float]],
+        kb_ids: List[uuid.UUID],
+        user_clearance: int,
+        search_config: GlobalSearchConfig,
+        depth: int
+    ) -> List[Tuple[Row, float]]:
+        """
+        扩展子查询检索
+        AsyncSession 不支持并发使用，每个子查询在本轮会话预算内使用独立会话。
+        """
+        params = search_config.parameters
+        async with budgeted_session() as session:
+            if vector is None:
+                rows = await document_crud.search_keyword_chunks(
+                    session, text, kb_ids, limit=depth,
+                    max_clearance=user_clearance
+                )
+            else:
+                rows = await document_crud.search_similar_chunks(
+                    session, vector, kb_ids,
+                    limit=depth,
+                    score_threshold=params.threshold,
+                    ef_search=params.efSearch,
+                    max_clearance=user_clearance
+                )
+        return [(row, row.score) for row in rows]
+
+    async def _collect_expansions(
+        self,
+        tasks: Dict[asyncio.Task, str],
+        budget: float,
+        thought_process: Optional[List[ThoughtStep]] = None
+    ) -> List[List[Tuple[Row, float]]]:
+        """
+        在剩余预算内等待扩展任务，超时未完成的任务直接取消，避免拉长尾延迟
+        """
+        done, pending = set(), set(tasks)
+        try:
+            if budget > 0:
+                done, pending = await asyncio.wait(tasks.keys(), timeout=budget)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        ranked_lists: List[List[Tuple[Row, float]]] = []
+        completed, failed = [], []
+        for task in done:
+            if task.exception() is not None:
+                logger.error(f"Query expansion {tasks[task]} failed: {task.exception()}")
+                failed.append(tasks[task])
+                continue
+            ranked_lists.extend(task.result())
+            completed.append(tasks[task])
+
+        if thought_process is not None:
+            labels = {"rewrite": "查询重写", "multi_query": "多查询改写", "hyde": "HyDE", "step_back": "Step-back"}
+            parts = [f"完成: {'、'.join(labels[k] for k in completed) or '无'}"]
+            if pending:
+                parts.append(f"超出预算已取消: {'、'.join(labels[tasks[t]] for t in pending)}")
+            if failed:
+                parts.append(f"失败: {'、'.join(labels[k] for k in failed)}")
+            thought_process.append(ThoughtStep(
+                title="查询扩展",
+                content=f"{'；'.join(parts)}，共 {len(ranked_lists)} 路扩展召回参与融合。",
+                type="rewrite"
+            ))
+        return ranked_lists
+
+    async def _expand_windows(
+        self,
+        db: AsyncSession,
+        hits: List[Tuple[Row, float]],
+        kb_ids: List[uuid.UUID],
+        user_clearance: int,
+        window: int
+    ) -> List[Tuple[Row, float]]:
+        """
+        将命中切片扩展为 [chunk_idx - window, chunk_idx + window] 窗口 (单次批量查询)
+        窗口内切片紧随其命中切片、沿用命中得分，保持得分顺序以便上下文组装按预算截断；
+        重叠窗口中的切片只保留一次。
+        """
+        spans = [
+            (chunk.doc_id, chunk.chunk_idx - window, chunk.chunk_idx + window)
+            for chunk, _ in hits if chunk.chunk_idx is not None
+        ]
+        rows = await document_crud.get_chunk_windows(db, spans, kb_ids, max_clearance=user_clearance)
+        by_doc: Dict[uuid.UUID, List[Row]] = {}
+        for row in rows:
+            by_doc.setdefault(row.doc_id, []).append(row)
+
+        expanded: List[Tuple[Row, float]] = []
+        seen = set()
+        for chunk, score in hits:
+            if chunk.chunk_idx is None:
+                neighbours = [chunk]
+            else:
+                neighbours = [
+                    row for row in by_doc.get(chunk.doc_id, [])
+                    if abs(row.chunk_idx - chunk.chunk_idx) <= window
+                ] or [chunk]
+            for row in neighbours:
+                if row.id not in seen:
+                    seen.add(row.id)
+                    expanded.append((row, score))
+        return expanded
+
+    def _build_graph_provenance(self, facts: List[Tuple[GraphNode, GraphEdge, GraphNode]]) -> List[Provenance]:
+        """
+        知识图谱事实的溯源对象 (图谱无切片得分，按 1.0 计)
+        """
+        return [
+            Provenance(
+                sentence_id=r.id,
+                source_type="KG",
+                source_name="知识图谱",
+                text=f"{n.label} -[{r.label}]- {m.label}",
+                score=1.0,
+                security_level="内部公开"
+            )
+            for n, r, m in facts
+        ]
+
+    def _build_provenance(self, hits: List[Tuple[Row, float]]) -> List[Provenance]:
+        """
+        将召回切片转换为溯源对象
+        """
         provenances = []
         
-        for chunk, score in chunks_with_score:
-            # 构造上下文文本
-            text_preview = f"[文档: {chunk.document.title}] {chunk.content}"
-            retrieved_texts.append(text_preview)
-            
+        for chunk, score in hits:
             # 构造溯源对象
             prov = Provenance(
                 sentence_id=str(chunk.id),
                 source_type="DOCS",
-                source_name=chunk.document.title,
+                source_name=chunk.title,
                 doc_id=chunk.doc_id,
                 text=chunk.content[:200] + "...", # 截断显示
                 score=round(score, 3),
-                security_level="内部", # 简化，应从 Document.clearance 映射
+                security_level=CLEARANCE_LABELS.get(chunk.clearance, "内部公开"),
                 start=0,
                 end=len(chunk.content)
             )
             provenances.append(prov)
             
-        return retrieved_texts, provenances
+        return provenances
+
+    async def _rerank(
+        self, query: str, hits: List[Tuple[Row, float]], search_config: GlobalSearchConfig
+    ) -> List[Tuple[Row, float]]:
+        """
+        对融合候选进行 Cross-Encoder 重排
+        预算内完成打分的候选按重排分数降序在前，未打分的候选保持原顺序追加在后。
+        """
+        rerank_cfg = search_config.rerank
+        candidates = hits[:rerank_cfg.candidates]
+        scores = await rerank_service.score(
+            query,
+            [chunk.content for chunk, _ in candidates],
+            batch_size=rerank_cfg.batchSize,
+            budget_ms=rerank_cfg.budgetMs
+        )
+
+        scored = [(hit, s) for hit, s in zip(candidates, scores) if s is not None]
+        unscored = [hit for hit, s in zip(candidates, scores) if s is None]
+        scored.sort(key=lambda x: x[1], reverse=True)
+        return [hit for hit, _ in scored] + unscored + hits[rerank_cfg.candidates:]
+
+    async def _diversify(
+        self,
+        db: AsyncSession,
+        hits: List[Tuple[Row, float]],
+        k: int,
+        kb_ids: List[uuid.UUID],
+        search_config: GlobalSearchConfig
+    ) -> List[Tuple[Row, float]]:
+        """
+        精确 / shingle 近似去重后执行 MMR 选择
+        相关度按当前排序 (向量、RRF 或重排结果) 线性归一化，保持上游排序的语义。
+        各路召回不回传向量，仅为去重后的候选池回表获取一次向量。
+        """
+        diversity_cfg = search_config.diversity
+        pool = hits[:diversity_cfg.candidates]
+
+        kept = dedupe_passages(
+            [chunk.content for chunk, _ in pool],
+            threshold=diversity_cfg.dedupThreshold
+        )
+        pool = [pool[i] for i in kept]
+        if len(pool) <= 1:
+            return pool
+
+        if len(pool) <= k:
+            return pool
+
+        embeddings = await document_crud.get_chunk_embeddings(db, [chunk.id for chunk, _ in pool], kb_ids)
+        relevance = [1.0 - i / len(pool) for i in range(len(pool))]
+        selected = mmr_select(
+            [embeddings.get(chunk.id) for chunk, _ in pool],
+            relevance,
+            k=k,
+            lambda_mult=diversity_cfg.mmrLambda
+        )
+        return [pool[i] for i in selected]
+
+    def _fuse_rrf(
+        self, ranked_lists: List[List[Tuple[Row, float]]], limit: int
+    ) -> List[Tuple[Row, float]]:
+        """
+        Reciprocal Rank Fusion: 按各路排名倒数之和融合多路召回结果
+        返回的分数保留该切片在首个命中列表中的原始分数 (向量相似度优先)，便于前端展示。
+        """
+        fused: Dict[uuid.UUID, List] = {}
+        for hits in ranked_lists:
+            for rank, (chunk, score) in enumerate(hits):
+                entry = fused.setdefault(chunk.id, [chunk, float(score), 0.0])
+                entry[2] += 1.0 / (self.RRF_K + rank + 1)
+
+        ordered = sorted(fused.values(), key=lambda e: e[2], reverse=True)
+        return [(chunk, score) for chunk, score, _ in ordered[:limit]]
 
 rag_engine = RAGEngine()
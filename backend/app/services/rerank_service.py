@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from app.core.config import settings
+
+# 可选依赖：未安装 sentence-transformers 时重排序自动跳过
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:
+    CrossEncoder = None
+
+logger = logging.getLogger(__name__)
+
+class RerankService:
+    """
+    Cross-Encoder 重排序服务
+    在本地 CPU 上对 (query, chunk) 对打分。推理在线程池中分批并行执行，
+    不阻塞事件循环；超出延迟预算的批次放弃打分，由调用方保留原排序。
+    """
+
+    def __init__(self):
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.RERANK_WORKERS,
+            thread_name_prefix="rerank"
+        )
+
+    @property
+    def available(self) -> bool:
+        return CrossEncoder is not None
+
+    def _get_model(self):
+        """
+        懒加载模型 (首次调用在工作线程中加载，避免拖慢服务启动)
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    logger.info(f"Loading rerank model {settings.RERANK_MODEL}")
+                    self._model = CrossEncoder(settings.RERANK_MODEL, device="cpu", max_length=512)
+        return self._model
+
+    def _score_batch(self, query: str, passages: List[str]) -> List[float]:
+        model = self._get_model()
+        scores = model.predict(
+            [(query, p) for p in passages],
+            batch_size=len(passages),
+            show_progress_bar=False
+        )
+        return [float(s) for s in scores]
+
+    async def score(
+        self, query: str, passages: List[str], batch_size: int, budget_ms: int
+    ) -> List[Optional[float]]:
+        """
+        对候选段落打分，返回与 passages 对齐的分数列表
+        在预算内未完成的批次对应位置为 None。
+        """
+        if not passages or not self.available:
+            return [None] * len(passages)
+
+        loop = asyncio.get_running_loop()
+        offsets = list(range(0, len(passages), batch_size))
+        futures = [
+            loop.run_in_executor(self._executor, self._score_batch, query, passages[i:i + batch_size])
+            for i in offsets
+        ]
+
+        done, pending = await asyncio.wait(futures, timeout=budget_ms / 1000)
+        for fut in pending:
+            # 尚未开始的批次直接取消；已在执行的批次结果将被丢弃
+            fut.cancel()
+        if pending:
+            logger.warning(f"Rerank budget {budget_ms}ms exceeded, {len(pending)}/{len(futures)} batches skipped")
+
+        scores: List[Optional[float]] = [None] * len(passages)
+        for offset, fut in zip(offsets, futures):
+            if fut not in done:
+                continue
+            if fut.exception() is not None:
+                logger.error(f"Rerank batch failed: {fut.exception()}")
+                continue
+            for j, s in enumerate(fut.result()):
+                scores[offset + j] = s
+        return scores
+
+rerank_service = RerankService()
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import re
+import unicodedata
+import uuid
+from typing import List, Optional, Tuple
+from app.core.cache import cache
+from app.core.config import settings
+from app.schemas.admin import GlobalSearchConfig
+from app.services.kb_epoch_service import kb_epoch_service
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    查询规范化：全角转半角 (NFKC)、小写、合并空白
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", query)).strip().lower()
+
+
+class RetrievalCache:
+    """
+    检索结果缓存
+    缓存 _hybrid_retrieval 的输出 (切片 ID 与分数)，命中时跳过向量化与向量检索。
+    键 = (规范化查询, 排序后的知识库集合, 用户密级, 各库 Epoch, 检索参数指纹)，
+    知识库内容变更时递增 Epoch 即可令相关条目全部失效。
+    """
+
+    KEY_PREFIX = "rag:retrieval:"
+
+    async def build_key(
+        self,
+        query: str,
+        kb_ids: List[uuid.UUID],
+        clearance: int,
+        search_config: GlobalSearchConfig,
+        scope: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        构造缓存键，无法获取 Epoch (Redis 不可用) 时返回 None
+        scope: 额外的作用域 (如依赖会话上下文的查询重写时为会话 ID)
+        """
+        sorted_kbs = sorted(kb_ids, key=str)
+        epochs = await kb_epoch_service.get_epochs(sorted_kbs)
+        if epochs is None:
+            return None
+
+        # 仅检索相关的配置参与指纹 (生成类开关不影响检索结果)
+        fingerprint = search_config.model_dump(
+            include={"strategy", "enhanced", "parameters", "rerank", "diversity", "expansion"}
+        )
+        raw = json.dumps({
+            "q": normalize_query(query),
+            "kbs": [str(k) for k in sorted_kbs],
+            "epochs": epochs,
+            "clearance": clearance,
+            "cfg": fingerprint,
+            "scope": scope,
+        }, sort_keys=True, ensure_ascii=False)
+        return self.KEY_PREFIX + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[List[Tuple[uuid.UUID, float]]]:
+        data = await cache.get(key)
+        if not isinstance(data, list):
+            return None
+        return [(uuid.UUID(chunk_id), score) for chunk_id, score in data]
+
+    async def set(self, key: str, hits: List[Tuple[uuid.UUID, float]]):
+        await cache.set(
+            key,
+            [[str(chunk_id), float(score)] for chunk_id, score in hits],
+            expire=settings.RETRIEVAL_CACHE_TTL
+        )
+
+retrieval_cache = RetrievalCache()
@@ -0,0 +1,58 @@
+import time
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import cache
+from app.crud.crud_gov import gov_crud
+from app.schemas.admin import GlobalSearchConfig
+
+class SearchConfigService:
+    """
+    全局检索策略配置访问器
+    问答链路每次提问都需要读取配置，采用两级缓存避免重复查库：
+    进程内缓存 (短 TTL) -> Redis -> gov.system_configs
+    管理端更新配置时清除缓存，其他 Worker 在进程内 TTL 到期后生效。
+    """
+
+    CONFIG_KEY = "global_search_config"
+    CACHE_KEY = "config:global_search_config"
+    LOCAL_TTL_SECONDS = 5
+    REDIS_TTL_SECONDS = 3600
+
+    def __init__(self):
+        self._local: Optional[GlobalSearchConfig] = None
+        self._local_expire_at: float = 0.0
+
+    async def get_config(self, db: AsyncSession) -> GlobalSearchConfig:
+        """
+        获取当前生效的全局检索配置 (未配置时返回默认值)
+        """
+        now = time.monotonic()
+        if self._local is not None and now < self._local_expire_at:
+            return self._local
+
+        data = await cache.get(self.CACHE_KEY)
+        if not isinstance(data, dict):
+            data = await gov_crud.get_system_config(db, key=self.CONFIG_KEY)
+            if data:
+                await cache.set(self.CACHE_KEY, data, expire=self.REDIS_TTL_SECONDS)
+
+        config = GlobalSearchConfig(**data) if data else GlobalSearchConfig()
+        self._local = config
+        self._local_expire_at = now + self.LOCAL_TTL_SECONDS
+        return config
+
+    async def update_config(self, db: AsyncSession, config: GlobalSearchConfig) -> GlobalSearchConfig:
+        """
+        持久化配置并使缓存失效
+        """
+        updated_data = await gov_crud.upsert_system_config(
+            db,
+            key=self.CONFIG_KEY,
+            value=config.model_dump(),
+            description="Global RAG Search Parameters"
+        )
+        await cache.delete(self.CACHE_KEY)
+        self._local = None
+        return GlobalSearchConfig(**updated_data)
+
+search_config_service = SearchConfigService()
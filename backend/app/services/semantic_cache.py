@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.crud.crud_chat import chat_crud
+from app.db.session import AsyncSessionLocal
+from app.models.chat import SemanticCacheEntry
+from app.schemas.admin import GlobalSearchConfig
+from app.services.kb_epoch_service import kb_epoch_service
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """
+    语义问答缓存
+    新问题与缓存问题的向量相似度达到阈值、且作用域 (知识库集合 + 密级 + 各库 Epoch +
+    检索 / 增强配置) 完全一致时，直接返回缓存的回答与溯源，跳过检索与 LLM 生成。
+    知识库变更后 Epoch 递增，作用域指纹随之改变，旧条目不再可达，由 TTL / 容量淘汰清理。
+    """
+
+    # 每写入多少条执行一次过期与容量淘汰
+    PURGE_EVERY = 50
+
+    def __init__(self):
+        self._writes = 0
+        # 持有后台写入任务的引用，防止任务在完成前被回收
+        self._pending: Set[asyncio.Task] = set()
+
+    async def build_scope_key(
+        self,
+        kb_ids: List[uuid.UUID],
+        clearance: int,
+        search_config: GlobalSearchConfig
+    ) -> Optional[str]:
+        """
+        构造作用域指纹，无法获取 Epoch (Redis 不可用) 时返回 None
+        """
+        sorted_kbs = sorted(kb_ids, key=str)
+        epochs = await kb_epoch_service.get_epochs(sorted_kbs)
+        if epochs is None:
+            return None
+
+        fingerprint = search_config.model_dump(
+            include={"strategy", "tiers", "enhanced", "parameters", "rerank", "diversity", "expansion", "smallToBig"}
+        )
+        raw = json.dumps({
+            "kbs": [str(k) for k in sorted_kbs],
+            "epochs": epochs,
+            "clearance": clearance,
+            "cfg": fingerprint,
+            "model": settings.LLM_MODEL_NAME,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def lookup(
+        self,
+        db: AsyncSession,
+        scope_key: str,
+        query_vector: List[float],
+        threshold: float,
+        ef_search: Optional[int] = None
+    ) -> Optional[Tuple[SemanticCacheEntry, float]]:
+        """
+        ANN 查找最相近的缓存问题，相似度低于阈值视为未命中
+        """
+        found = await chat_crud.find_semantic_cache_entry(db, scope_key, query_vector, ef_search=ef_search)
+        if not found or found[1] < threshold:
+            return None
+        entry, score = found
+        await chat_crud.touch_semantic_cache_entry(db, entry.id)
+        return entry, score
+
+    async def store(
+        self,
+        db: AsyncSession,
+        scope_key: str,
+        question: str,
+        query_vector: List[float],
+        answer: str,
+        thought_chain: list,
+        citations: list,
+        ttl_seconds: int
+    ):
+        """
+        写入缓存条目，并周期性执行淘汰
+        """
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+        await chat_crud.create_semantic_cache_entry(
+            db, scope_key, question, query_vector, answer, thought_chain, citations, expires_at
+        )
+
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            try:
+                removed = await chat_crud.purge_semantic_cache(db, settings.SEMANTIC_CACHE_MAX_ENTRIES)
+                if removed:
+                    logger.info(f"Semantic cache purged {removed} entries")
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Semantic cache purge failed: {e}")
+
+    def store_later(self, scope_key: str, question: str, query_vector: List[float], answer: str,
+                    thought_chain: list, citations: list, ttl_seconds: int):
+        """
+        在后台使用独立会话写入缓存条目，不阻塞问答响应；写入失败仅记录日志
+        """
+        async def _write():
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.store(
+                        db, scope_key, question, query_vector, answer, thought_chain, citations, ttl_seconds
+                    )
+            except Exception as e:
+                logger.error(f"Semantic cache write failed: {e}")
+
+        task = asyncio.create_task(_write())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.cache import cache
+from app.core.config import settings
+from app.schemas.admin import GlobalSearchConfig
+from app.services.retrieval_cache import normalize_query
+from app.services.semantic_cache import semantic_cache
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """
+    领头请求的句柄：计算完成后 publish 结果，失败 / 取消时 abandon 释放跟随者
+    """
+
+    def __init__(self, owner: "SingleFlight", key: str, future: asyncio.Future, locked: bool):
+        self._owner = owner
+        self.key = key
+        self._future = future
+        # 是否持有 Redis 锁 (Redis 不可用或接替其他 Worker 时不持有)
+        self._locked = locked
+        self.done = False
+
+    async def publish(self, result: Dict[str, Any]):
+        if self.done:
+            return
+        self.done = True
+        if not self._future.done():
+            self._future.set_result(result)
+        self._owner._release_local(self.key, self._future)
+        if self._locked:
+            # 先写结果再释放锁，其他 Worker 观察到锁消失时结果已可读
+            await cache.set(self._owner._result_key(self.key), result, expire=self._owner.RESULT_TTL)
+            await cache.delete(self._owner._lock_key(self.key))
+
+    async def abandon(self):
+        if self.done:
+            return
+        self.done = True
+        if not self._future.done():
+            self._future.set_result(None)
+        self._owner._release_local(self.key, self._future)
+        if self._locked:
+            await cache.delete(self._owner._lock_key(self.key))
+
+
+class SingleFlight:
+    """
+    进行中请求合并 (Singleflight)
+    键 = (规范化问题, 知识库集合, 密级, 各库 Epoch, 检索 / 模型配置)。
+    - 进程内：同键请求共享一个 Future，首个请求 (领头) 计算，其余等待其结果
+    - 跨 Worker：领头以 SET NX 持有 Redis 锁，完成后将结果写入短期结果键；
+      其他 Worker 的同键请求轮询结果键，锁消失而无结果 (领头失败) 或等待超时则自行计算
+    Redis 不可用时退化为仅进程内合并。
+    """
+
+    LOCK_PREFIX = "rag:inflight:lock:"
+    RESULT_PREFIX = "rag:inflight:result:"
+    # 结果键保留时间 (秒)，覆盖跟随者的轮询间隔即可
+    RESULT_TTL = 30
+    POLL_INTERVAL = 0.1
+
+    def __init__(self):
+        self._local: Dict[str, asyncio.Future] = {}
+
+    async def build_key(
+        self,
+        query: str,
+        kb_ids: List[uuid.UUID],
+        clearance: int,
+        search_config: GlobalSearchConfig
+    ) -> str:
+        """
+        构造合并键
+        无法获取 Epoch (Redis 不可用) 时也无法跨 Worker 合并，改用不含 Epoch 的进程内键
+        (仅合并同时在途的请求，结果不会保留到之后的知识库更新)。
+        """
+        scope_key = await semantic_cache.build_scope_key(kb_ids, clearance, search_config)
+        if scope_key is None:
+            scope_key = "local:" + json.dumps({
+                "kbs": sorted(str(k) for k in kb_ids),
+                "clearance": clearance,
+                "cfg": search_config.model_dump(mode="json"),
+            }, sort_keys=True)
+        raw = f"{scope_key}:{normalize_query(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def acquire(self, key: str) -> Tuple[Optional[Flight], Optional[Dict[str, Any]]]:
+        """
+        返回 (领头句柄, None) 或 (None, 共享结果)
+        """
+        wait = settings.SINGLEFLIGHT_WAIT_SECONDS
+        future = self._local.get(key)
+        if future is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), timeout=wait)
+            except asyncio.TimeoutError:
+                result = None
+            if result is not None:
+                return None, result
+            # 领头失败或超时：自行计算 (不再参与合并)
+            return Flight(self, key, asyncio.get_running_loop().create_future(), locked=False), None
+
+        future = asyncio.get_running_loop().create_future()
+        self._local[key] = future
+        locked = await cache.set_nx(self._lock_key(key), "1", expire=wait + self.RESULT_TTL)
+        if locked is False:
+            # 其他 Worker 正在计算：轮询其结果，本进程的同键请求挂在本地 Future 上一并等待
+            result = await self._wait_remote(key, wait)
+            if result is not None:
+                future.set_result(result)
+                self._release_local(key, future)
+                return None, result
+        return Flight(self, key, future, locked=bool(locked)), None
+
+    async def _wait_remote(self, key: str, wait: float) -> Optional[Dict[str, Any]]:
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            result = await cache.get(self._result_key(key))
+            if isinstance(result, dict):
+                return result
+            if await cache.get(self._lock_key(key)) is None:
+                # 锁已释放：领头刚完成 (再读一次结果) 或已失败
+                result = await cache.get(self._result_key(key))
+                return result if isinstance(result, dict) else None
+            await asyncio.sleep(self.POLL_INTERVAL)
+        logger.warning(f"Singleflight wait timed out for {key[:12]}")
+        return None
+
+    def _release_local(self, key: str, future: asyncio.Future):
+        if self._local.get(key) is future:
+            del self._local[key]
+
+    def _lock_key(self, key: str) -> str:
+        return self.LOCK_PREFIX + key
+
+    def _result_key(self, key: str) -> str:
+        return self.RESULT_PREFIX + key
+
+singleflight = SingleFlight()
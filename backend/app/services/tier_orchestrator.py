@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TierOutcome:
+    """
+    单个召回源的执行结果
+    status: pending (未完成) / ok (完成) / hit (高置信命中) / cancelled (被命中源提前结束) /
+            timeout (超出预算被跳过) / failed (异常)
+    """
+    name: str
+    status: str = "pending"
+    value: Any = None
+    duration_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class TierRun:
+    """
+    一次多源召回的汇总：各召回源结果与提前返回的命中源
+    """
+    outcomes: Dict[str, TierOutcome] = field(default_factory=dict)
+    winner: Optional[str] = None
+
+    def value(self, name: str) -> Any:
+        """
+        召回源的结果，未启用 / 未完成 / 失败时为 None
+        """
+        outcome = self.outcomes.get(name)
+        if outcome is None or outcome.status not in ("ok", "hit"):
+            return None
+        return outcome.value
+
+
+class TierOrchestrator:
+    """
+    多源召回编排
+    各召回源并发执行，按传入顺序确定优先级：
+    - 可判定高置信的召回源 (decisive) 命中，且更高优先级的可判定源均已完成未命中时，立即返回并取消其余召回源
+    - 整体受单次请求延迟预算约束，预算耗尽时未完成的召回源被取消跳过 (降级)，已完成的结果照常使用
+    """
+
+    async def run(
+        self,
+        tiers: Dict[str, Callable[[], Awaitable[Any]]],
+        budget: float,
+        decisive: Optional[Dict[str, Callable[[Any], bool]]] = None
+    ) -> TierRun:
+        """
+        tiers: {召回源名称: 协程工厂}，按优先级排列
+        budget: 剩余预算 (秒)
+        decisive: {召回源名称: 结果是否为高置信命中}
+        """
+        decisive = decisive or {}
+        run = TierRun(outcomes={name: TierOutcome(name) for name in tiers})
+        tasks = {
+            asyncio.create_task(self._run_tier(run.outcomes[name], factory)): name
+            for name, factory in tiers.items()
+        }
+        pending = set(tasks)
+        deadline = time.perf_counter() + budget
+        try:
+            while pending:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    self._record(run.outcomes[tasks[task]], task, decisive)
+                run.winner = self._winner(tiers, run, decisive)
+                if run.winner is not None:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        for task in pending:
+            run.outcomes[tasks[task]].status = "cancelled" if run.winner else "timeout"
+        if pending and run.winner is None:
+            logger.warning(f"Tier budget exceeded, skipped: {', '.join(tasks[t] for t in pending)}")
+        return run
+
+    async def _run_tier(self, outcome: TierOutcome, factory: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        with tracer.span(f"tier.{outcome.name}"):
+            try:
+                return await factory()
+            finally:
+                outcome.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _record(self, outcome: TierOutcome, task: asyncio.Task, decisive: Dict[str, Callable[[Any], bool]]):
+        if task.exception() is not None:
+            logger.error(f"Retrieval tier {outcome.name} failed: {task.exception()}")
+            outcome.status = "failed"
+            outcome.error = str(task.exception())
+            return
+        outcome.value = task.result()
+        check = decisive.get(outcome.name)
+        outcome.status = "hit" if check is not None and check(outcome.value) else "ok"
+
+    def _winner(
+        self,
+        tiers: Dict[str, Any],
+        run: TierRun,
+        decisive: Dict[str, Callable[[Any], bool]]
+    ) -> Optional[str]:
+        """
+        按优先级检查可判定召回源：遇到命中即返回，遇到仍在执行的更高优先级源则继续等待
+        """
+        for name in tiers:
+            if name not in decisive:
+                continue
+            status = run.outcomes[name].status
+            if status == "hit":
+                return name
+            if status == "pending":
+                return None
+        return None
+
+tier_orchestrator = TierOrchestrator()
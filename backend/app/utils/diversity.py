@@ -0,0 +1,101 @@
+import hashlib
+import re
+from typing import List, Optional, Sequence, Set
+import numpy as np
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize_text(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+def _shingles(text: str, size: int) -> Set[str]:
+    """
+    字符级 n-gram 切分 (对中文无需分词)
+    """
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def dedupe_passages(texts: Sequence[str], threshold: float = 0.8, shingle_size: int = 5) -> List[int]:
+    """
+    去除重复与近似重复段落，返回保留段落的下标 (保持输入顺序)
+
+    1. 精确去重：规范化空白后的内容哈希相同 (同一文档上传到多个知识库)
+    2. 近似去重：字符 shingle 集合的 Jaccard 相似度 >= threshold
+    输入应已按相关度排序，冲突时保留排名靠前者。
+    """
+    kept: List[int] = []
+    seen_hashes: Set[str] = set()
+    kept_shingles: List[Set[str]] = []
+
+    for idx, text in enumerate(texts):
+        normalized = _normalize_text(text)
+        digest = hashlib.md5(normalized.encode("utf-8")).hexdigest()
+        if digest in seen_hashes:
+            continue
+
+        shingles = _shingles(normalized, shingle_size)
+        is_near_dup = False
+        for other in kept_shingles:
+            union = len(shingles | other)
+            if union and len(shingles & other) / union >= threshold:
+                is_near_dup = True
+                break
+        if is_near_dup:
+            continue
+
+        seen_hashes.add(digest)
+        kept_shingles.append(shingles)
+        kept.append(idx)
+
+    return kept
+
+
+def mmr_select(
+    vectors: Sequence[Optional[Sequence[float]]],
+    relevance: Sequence[float],
+    k: int,
+    lambda_mult: float = 0.7
+) -> List[int]:
+    """
+    Maximal Marginal Relevance 选择，返回选中候选的下标 (按选中顺序)
+
+    score(d) = λ · relevance(d) - (1 - λ) · max_{s∈S} cos(d, s)
+    缺失向量的候选不参与多样性惩罚 (视为与已选集合无相似度)。
+    """
+    n = len(relevance)
+    if n <= 1 or k <= 0:
+        return list(range(min(n, max(k, 0))))
+
+    dim = next((len(v) for v in vectors if v is not None), 0)
+    if dim == 0:
+        return list(range(min(n, k)))
+
+    matrix = np.zeros((n, dim), dtype=np.float32)
+    for i, vec in enumerate(vectors):
+        if vec is not None:
+            matrix[i] = np.asarray(vec, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    similarity = matrix @ matrix.T
+
+    rel = np.asarray(relevance, dtype=np.float32)
+    selected: List[int] = [int(np.argmax(rel))]
+    # 各候选与已选集合的最大相似度
+    max_sim = similarity[selected[0]].copy()
+    remaining = np.ones(n, dtype=bool)
+    remaining[selected[0]] = False
+
+    while len(selected) < min(k, n):
+        scores = lambda_mult * rel - (1 - lambda_mult) * max_sim
+        scores[~remaining] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        remaining[best] = False
+        np.maximum(max_sim, similarity[best], out=max_sim)
+
+    return selected
@@ -0,0 +1,36 @@
+import json
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict
+
+# 可选依赖：安装 orjson 时使用其编码器 (Rust 实现，显著快于标准库)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    紧凑 JSON 编码为 UTF-8 字节 (支持 UUID / datetime)
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def dumps_with_raw(obj: Dict[str, Any], key: str, raw: bytes) -> bytes:
+    """
+    编码字典并将已序列化的 JSON 片段 raw 原样作为 key 的值追加 (不解析、不校验)
+    """
+    encoded = dumps(obj)
+    prefix = encoded[:-1] + (b"," if obj else b"")
+    return prefix + dumps(key) + b":" + raw + b"}"
@@ -0,0 +1,5 @@
+"""
+检索性能基准测试 (Benchmarks)
+需连接带 pgvector 扩展的 PostgreSQL (读取 .env 中的 DATABASE_URL)。
+在 backend 目录下以模块方式运行，例如: python -m benchmarks.bench_filtered_ann
+"""
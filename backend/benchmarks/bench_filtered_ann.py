@@ -0,0 +1,98 @@
+"""
+高选择性过滤 ANN 基准测试
+
+场景：用户只勾选一个小库，而库表中还有大量其他库的切片。
+对比以下检索方式在目标小库上的结果完整度、召回率与延迟：
+  1. DEFAULT 分区 + 关闭迭代扫描 (全局 HNSW 扫描后过滤)
+  2. DEFAULT 分区 + 迭代扫描 (pgvector >= 0.8.0)
+  3. 目标库迁出为独立分区 (独立 HNSW 索引)
+
+用法:
+    python -m benchmarks.bench_filtered_ann --large-kbs 20 --large-size 2000 --small-size 100
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict
+
+from app.core.config import settings
+from app.crud.crud_document import document_crud
+from app.db.session import AsyncSessionLocal
+from benchmarks.corpus import CorpusSpec, drop_corpus, load_corpus, perturb
+from benchmarks.metrics import percentile
+from benchmarks.queries import exact_top_k
+
+
+async def run_mode(name: str, target_kb, queries, truths, k: int) -> Dict[str, float]:
+    latencies, recalls, returned = [], [], []
+    async with AsyncSessionLocal() as db:
+        for query, truth in zip(queries, truths):
+            start = time.perf_counter()
+            rows = await document_crud.search_similar_chunks(db, query, [target_kb], limit=k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            await db.rollback()
+
+            hit_ids = {row.id for row in rows}
+            returned.append(len(rows))
+            recalls.append(len(hit_ids & set(truth)) / len(truth))
+
+    return {
+        "mode": name,
+        "avg_returned": statistics.mean(returned),
+        "recall": statistics.mean(recalls),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+
+async def main(args):
+    spec = CorpusSpec(
+        kb_sizes=[args.small_size] + [args.large_size] * args.large_kbs,
+        topics=args.topics,
+    )
+    async with AsyncSessionLocal() as db:
+        print(f"Loading corpus: {sum(spec.kb_sizes)} chunks in {len(spec.kb_sizes)} KBs ...")
+        corpus = await load_corpus(db, spec)
+
+    target_kb = corpus.kb_ids[0]
+    rng = random.Random(7)
+    queries, truths = [], []
+    for _ in range(args.queries):
+        base = rng.choice(corpus.vectors[target_kb])
+        query = perturb(rng, base, 0.5)
+        queries.append(query)
+        truths.append(exact_top_k(corpus, [target_kb], query, args.k))
+
+    results = []
+    try:
+        settings.VECTOR_ITERATIVE_SCAN = "off"
+        results.append(await run_mode("default / no iterative scan", target_kb, queries, truths, args.k))
+
+        settings.VECTOR_ITERATIVE_SCAN = "strict_order"
+        results.append(await run_mode("default / iterative scan", target_kb, queries, truths, args.k))
+
+        async with AsyncSessionLocal() as db:
+            await document_crud.promote_kb_partition(db, target_kb)
+        results.append(await run_mode("dedicated partition", target_kb, queries, truths, args.k))
+    finally:
+        if not args.keep:
+            async with AsyncSessionLocal() as db:
+                await drop_corpus(db, corpus)
+
+    print(f"\n{'mode':<32}{'returned':>10}{'recall@' + str(args.k):>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for r in results:
+        print(f"{r['mode']:<32}{r['avg_returned']:>10.1f}{r['recall']:>12.3f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Selective-filter ANN benchmark")
+    parser.add_argument("--small-size", type=int, default=100, help="目标小库切片数")
+    parser.add_argument("--large-kbs", type=int, default=20, help="干扰大库数量")
+    parser.add_argument("--large-size", type=int, default=2000, help="每个干扰库切片数")
+    parser.add_argument("--topics", type=int, default=1, help="库间共享的主题数 (越少越交叠)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="保留合成数据")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,144 @@
+import math
+import random
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from sqlalchemy import delete, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.kms import KnowledgeBase, Document, DocumentChunk
+
+BENCH_KB_PREFIX = "__bench__"
+
+
+@dataclass
+class CorpusSpec:
+    """
+    合成语料规模定义
+    kb_sizes: 每个知识库的切片数量，例如 [100] + [2000] * 20 表示 1 个小库 + 20 个大库
+    topics: 主题中心数量，库之间共享主题 (topics 越少，库间向量越交叠，过滤检索越困难)；0 表示每库独立主题
+    切片文本由所属主题词表与全局词表的随机词构成，使全文检索 (keyword / hybrid) 同样可评测。
+    """
+    kb_sizes: List[int]
+    docs_per_kb: int = 10
+    topics: int = 1
+    noise: float = 1.0
+    seed: int = 42
+    vocab_size: int = 500
+    words_per_chunk: int = 40
+
+    @classmethod
+    def uniform(cls, kbs: int, chunks_per_kb: int, **kwargs) -> "CorpusSpec":
+        return cls(kb_sizes=[chunks_per_kb] * kbs, **kwargs)
+
+
+@dataclass
+class Corpus:
+    """
+    已加载的合成语料 (保留向量以便生成带标注的查询)
+    """
+    kb_ids: List[uuid.UUID] = field(default_factory=list)
+    vectors: Dict[uuid.UUID, List[List[float]]] = field(default_factory=dict)
+    chunk_ids: Dict[uuid.UUID, List[uuid.UUID]] = field(default_factory=dict)
+    texts: Dict[uuid.UUID, List[str]] = field(default_factory=dict)
+
+
+def _normalize(vec: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+    return [x / norm for x in vec]
+
+
+def topic_vocab(topic: int, size: int) -> List[str]:
+    """
+    主题词表 (形如 t3w17，simple 分词配置下为单个词元)
+    """
+    return [f"t{topic}w{i}" for i in range(size)]
+
+
+def random_unit_vector(rng: random.Random, dim: int) -> List[float]:
+    return _normalize([rng.gauss(0.0, 1.0) for _ in range(dim)])
+
+
+def perturb(rng: random.Random, base: List[float], noise: float) -> List[float]:
+    """
+    在基向量附近采样 (用于构造聚簇切片与近似查询)
+    noise 为扰动向量的期望模长，1.0 时与基向量的余弦相似度约为 0.7
+    """
+    return _normalize([x + rng.gauss(0.0, noise / math.sqrt(len(base))) for x in base])
+
+
+async def load_corpus(db: AsyncSession, spec: CorpusSpec, batch_size: int = 500) -> Corpus:
+    """
+    写入合成知识库、文档与切片
+    每个库拥有独立的主题中心向量，切片围绕中心分布，模拟真实语料的库间区分度。
+    """
+    rng = random.Random(spec.seed)
+    dim = settings.EMBEDDING_DIMENSION
+    corpus = Corpus()
+    topic_pool = [random_unit_vector(rng, dim) for _ in range(spec.topics)]
+    common_vocab = topic_vocab(-1, spec.vocab_size)
+
+    for kb_no, kb_size in enumerate(spec.kb_sizes):
+        kb_id = uuid.uuid4()
+        await db.execute(insert(KnowledgeBase).values(
+            id=kb_id, name=f"{BENCH_KB_PREFIX}{kb_no}", base_clearance=0, settings={}
+        ))
+
+        doc_ids = [uuid.uuid4() for _ in range(spec.docs_per_kb)]
+        await db.execute(insert(Document), [
+            {"id": d, "kb_id": kb_id, "title": f"bench-{kb_no}-{i}.txt", "s3_key": f"bench/{d}",
+             "clearance": 0, "status": "READY"}
+            for i, d in enumerate(doc_ids)
+        ])
+
+        topic = kb_no % spec.topics if topic_pool else len(spec.kb_sizes) + kb_no
+        centroid = topic_pool[topic] if topic_pool else random_unit_vector(rng, dim)
+        vocab = topic_vocab(topic, spec.vocab_size)
+        corpus.kb_ids.append(kb_id)
+        corpus.vectors[kb_id] = []
+        corpus.chunk_ids[kb_id] = []
+        corpus.texts[kb_id] = []
+
+        rows = []
+        for i in range(kb_size):
+            chunk_id = uuid.uuid4()
+            vec = perturb(rng, centroid, spec.noise)
+            words = rng.choices(vocab, k=spec.words_per_chunk * 3 // 4) + \
+                rng.choices(common_vocab, k=spec.words_per_chunk // 4)
+            rng.shuffle(words)
+            content = " ".join(words)
+            corpus.vectors[kb_id].append(vec)
+            corpus.chunk_ids[kb_id].append(chunk_id)
+            corpus.texts[kb_id].append(content)
+            rows.append({
+                "id": chunk_id,
+                "doc_id": doc_ids[i % len(doc_ids)],
+                "kb_id": kb_id,
+                "content": content,
+                "embedding": vec,
+                "chunk_idx": i // len(doc_ids),
+                "page_idx": 0,
+                "clearance": 0,
+            })
+            if len(rows) >= batch_size:
+                await db.execute(insert(DocumentChunk), rows)
+                rows = []
+        if rows:
+            await db.execute(insert(DocumentChunk), rows)
+        await db.commit()
+
+    return corpus
+
+
+async def drop_corpus(db: AsyncSession, corpus: Corpus):
+    """
+    清理合成语料 (切片随文档级联删除，独立分区一并移除)
+    """
+    await db.execute(delete(Document).where(Document.kb_id.in_(corpus.kb_ids)))
+    await db.execute(delete(KnowledgeBase).where(KnowledgeBase.id.in_(corpus.kb_ids)))
+    for kb_id in corpus.kb_ids:
+        # 分区名由 UUID 十六进制构成，不含用户输入
+        await db.execute(text(f"DROP TABLE IF EXISTS kms.document_chunks_{kb_id.hex}"))
+    await db.commit()
@@ -0,0 +1,45 @@
+"""
+检索评测指标
+"""
+import statistics
+from typing import Dict, Iterable, List, Sequence
+
+
+def recall_at_k(retrieved: Sequence, relevant: Sequence, k: int) -> float:
+    """
+    recall@k = |Top-k 结果 ∩ 真实 Top-k| / |真实 Top-k|
+    """
+    truth = set(relevant[:k])
+    if not truth:
+        return 1.0
+    return len(set(retrieved[:k]) & truth) / len(truth)
+
+
+def reciprocal_rank(retrieved: Sequence, target) -> float:
+    """
+    目标条目 (查询的来源切片) 首次出现位置的倒数，未召回为 0
+    """
+    for rank, item in enumerate(retrieved, start=1):
+        if item == target:
+            return 1.0 / rank
+    return 0.0
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(latencies_ms: List[float], recalls: Iterable[float], rrs: Iterable[float], returned: Iterable[int]) -> Dict[str, float]:
+    """
+    汇总一组查询的质量与延迟指标
+    """
+    return {
+        "recall": statistics.mean(recalls),
+        "mrr": statistics.mean(rrs),
+        "avg_returned": statistics.mean(returned),
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+    }
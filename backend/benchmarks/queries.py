@@ -0,0 +1,71 @@
+"""
+带标注的查询集
+
+每条查询由语料中随机抽取的来源切片派生：向量为来源切片向量的扰动，文本为来源切片中的若干词。
+标注包含两部分：
+  - truth: 查询范围 (所选知识库) 内按余弦相似度精确计算的 Top-K，用于 recall@k
+  - source_chunk_id: 来源切片，用于 MRR (已知条目检索)
+"""
+import random
+import uuid
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from benchmarks.corpus import Corpus, perturb
+
+
+@dataclass
+class LabeledQuery:
+    text: str
+    vector: List[float]
+    kb_ids: List[uuid.UUID]
+    source_chunk_id: uuid.UUID
+    truth: List[uuid.UUID]
+
+
+def exact_top_k(corpus: Corpus, kb_ids: List[uuid.UUID], query: List[float], k: int) -> List[uuid.UUID]:
+    """
+    暴力计算范围内的真实近邻 (向量均已归一化，点积即余弦相似度)
+    """
+    ids: List[uuid.UUID] = []
+    blocks = []
+    for kb_id in kb_ids:
+        ids.extend(corpus.chunk_ids[kb_id])
+        blocks.append(np.asarray(corpus.vectors[kb_id], dtype=np.float32))
+    scores = np.concatenate(blocks) @ np.asarray(query, dtype=np.float32)
+    top = np.argsort(-scores)[:k]
+    return [ids[i] for i in top]
+
+
+def build_queries(
+    corpus: Corpus,
+    n: int,
+    selectivity: float,
+    k: int,
+    noise: float = 0.5,
+    words: int = 3,
+    seed: int = 7
+) -> List[LabeledQuery]:
+    """
+    生成 n 条带标注查询
+    selectivity: 查询范围占全部知识库的比例 (至少 1 个库)，越小过滤越严格
+    """
+    rng = random.Random(seed)
+    scope = max(1, round(len(corpus.kb_ids) * selectivity))
+    queries = []
+    for _ in range(n):
+        kb_ids = rng.sample(corpus.kb_ids, scope)
+        source_kb = rng.choice(kb_ids)
+        idx = rng.randrange(len(corpus.chunk_ids[source_kb]))
+        vector = perturb(rng, corpus.vectors[source_kb][idx], noise)
+        text = " ".join(rng.sample(corpus.texts[source_kb][idx].split(), words))
+        queries.append(LabeledQuery(
+            text=text,
+            vector=vector,
+            kb_ids=kb_ids,
+            source_chunk_id=corpus.chunk_ids[source_kb][idx],
+            truth=exact_top_k(corpus, kb_ids, vector, k),
+        ))
+    return queries
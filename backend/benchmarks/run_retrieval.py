@@ -0,0 +1,160 @@
+"""
+检索质量与延迟基准测试
+
+在本地 Postgres (pgvector) 中加载合成语料与带标注查询集，按参数网格评测：
+  - ef_search:   HNSW 候选队列长度
+  - limit (k):   返回切片数
+  - selectivity: 查询范围占全部知识库的比例 (过滤选择性)
+  - strategy:    crud (直接调用 search_similar_chunks) / vector / keyword / hybrid (RAGEngine 召回流水线)
+输出 recall@k (相对范围内精确 Top-K)、MRR (来源切片) 与 p50 / p95 / p99 延迟。
+
+用法:
+    python -m benchmarks.run_retrieval --kbs 10 --docs-per-kb 20 --chunks-per-kb 2000 \\
+        --ef-search 40,100,200 --limits 5,10,20 --selectivity 0.1,1.0 --strategies crud,vector,hybrid
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import time
+from typing import Dict, List, Optional
+
+from app.crud.crud_document import document_crud
+from app.db.session import AsyncSessionLocal
+from app.schemas.admin import GlobalSearchConfig
+from app.services.rag_engine import rag_engine
+from benchmarks.corpus import CorpusSpec, drop_corpus, load_corpus
+from benchmarks.metrics import recall_at_k, reciprocal_rank, summarize
+from benchmarks.queries import LabeledQuery, build_queries
+
+# 合成语料密级为 0，以最高密级检索避免密级过滤干扰评测
+BENCH_CLEARANCE = 3
+
+
+def build_config(strategy: str, k: int, ef_search: Optional[int], threshold: float, diversity: bool) -> GlobalSearchConfig:
+    """
+    构造评测用检索配置：关闭依赖 LLM 的查询扩展与重排，只保留被测参数
+    """
+    return GlobalSearchConfig.model_validate({
+        "strategy": "vector" if strategy == "crud" else strategy,
+        "enhanced": {"queryRewrite": False, "multiQuery": False, "hyde": False, "stepback": False},
+        "parameters": {"topK": k, "threshold": threshold, "efSearch": ef_search or 40},
+        "rerank": {"enabled": False},
+        "diversity": {"enabled": diversity},
+    })
+
+
+async def run_case(
+    queries: List[LabeledQuery],
+    strategy: str,
+    k: int,
+    ef_search: Optional[int],
+    threshold: float,
+    diversity: bool,
+    warmup: int
+) -> Dict[str, float]:
+    config = build_config(strategy, k, ef_search, threshold, diversity)
+    latencies, recalls, rrs, returned = [], [], [], []
+
+    async with AsyncSessionLocal() as db:
+        for i, q in enumerate(queries[:warmup] + queries):
+            start = time.perf_counter()
+            if strategy == "crud":
+                rows = await document_crud.search_similar_chunks(
+                    db, q.vector, q.kb_ids, limit=k, score_threshold=threshold,
+                    ef_search=ef_search, max_clearance=BENCH_CLEARANCE
+                )
+                ids = [row.id for row in rows]
+            else:
+                hits = await rag_engine._retrieve_hits(
+                    db, q.text, q.kb_ids, BENCH_CLEARANCE, config, query_vec=q.vector
+                )
+                ids = [chunk.id for chunk, _ in hits]
+            elapsed = (time.perf_counter() - start) * 1000
+            # 结束事务，释放 SET LOCAL 参数
+            await db.rollback()
+
+            if i < warmup:
+                continue
+            latencies.append(elapsed)
+            recalls.append(recall_at_k(ids, q.truth, k))
+            rrs.append(reciprocal_rank(ids, q.source_chunk_id))
+            returned.append(len(ids))
+
+    return summarize(latencies, recalls, rrs, returned)
+
+
+def parse_list(raw: str, cast):
+    return [cast(x) for x in raw.split(",") if x.strip()]
+
+
+async def main(args):
+    spec = CorpusSpec.uniform(
+        args.kbs, args.chunks_per_kb,
+        docs_per_kb=args.docs_per_kb,
+        topics=args.topics,
+        noise=args.noise,
+    )
+    async with AsyncSessionLocal() as db:
+        print(f"Loading corpus: {sum(spec.kb_sizes)} chunks in {len(spec.kb_sizes)} KBs ...")
+        corpus = await load_corpus(db, spec)
+
+    ef_values = parse_list(args.ef_search, int)
+    limits = parse_list(args.limits, int)
+    selectivities = parse_list(args.selectivity, float)
+    strategies = parse_list(args.strategies, str)
+
+    print(
+        f"\n{'strategy':<9}{'select':>7}{'k':>5}{'ef':>6}{'recall':>9}{'mrr':>8}{'ret':>7}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    )
+    results = []
+    try:
+        for selectivity in selectivities:
+            queries = build_queries(corpus, args.queries, selectivity, k=max(limits), noise=args.query_noise)
+            for strategy, k in itertools.product(strategies, limits):
+                # 纯全文检索不受 ef_search 影响
+                efs = [None] if strategy == "keyword" else ef_values
+                for ef in efs:
+                    metrics = await run_case(
+                        queries, strategy, k, ef, args.threshold, args.diversity, args.warmup
+                    )
+                    row = {"strategy": strategy, "selectivity": selectivity, "k": k, "ef_search": ef or "-", **metrics}
+                    results.append(row)
+                    print(
+                        f"{strategy:<9}{selectivity:>7.2f}{k:>5}{str(ef or '-'):>6}"
+                        f"{metrics['recall']:>9.3f}{metrics['mrr']:>8.3f}{metrics['avg_returned']:>7.1f}"
+                        f"{metrics['p50_ms']:>9.2f}{metrics['p95_ms']:>9.2f}{metrics['p99_ms']:>9.2f}"
+                    )
+    finally:
+        if not args.keep:
+            async with AsyncSessionLocal() as db:
+                await drop_corpus(db, corpus)
+
+    if args.csv and results:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"\nResults written to {args.csv}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval quality & latency benchmark")
+    parser.add_argument("--kbs", type=int, default=10, help="知识库数量")
+    parser.add_argument("--docs-per-kb", type=int, default=20)
+    parser.add_argument("--chunks-per-kb", type=int, default=2000)
+    parser.add_argument("--topics", type=int, default=3, help="库间共享的主题数 (越少越交叠)")
+    parser.add_argument("--noise", type=float, default=1.0, help="切片围绕主题中心的扰动幅度")
+    parser.add_argument("--queries", type=int, default=50, help="每个选择性档位的查询数")
+    parser.add_argument("--query-noise", type=float, default=0.5, help="查询向量相对来源切片的扰动幅度")
+    parser.add_argument("--ef-search", default="40,100,200")
+    parser.add_argument("--limits", default="5,10,20")
+    parser.add_argument("--selectivity", default="0.1,1.0")
+    parser.add_argument("--strategies", default="crud,vector,keyword,hybrid")
+    parser.add_argument("--threshold", type=float, default=0.0, help="相似度阈值 (0 表示不截断)")
+    parser.add_argument("--diversity", action="store_true", help="开启去重 / MMR 后处理")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--csv", help="结果导出 CSV 路径")
+    parser.add_argument("--keep", action="store_true", help="保留合成数据")
+    asyncio.run(main(parser.parse_args()))
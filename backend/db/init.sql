@@ -108,18 +108,30 @@ CREATE INDEX idx_docs_meta ON kms.documents USING GIN (meta);
 CREATE INDEX idx_docs_hash ON kms.documents (file_hash);
 
 -- Document Chunks (Vector Store)
+-- 按 kb_id 列表分区: 小库共享 DEFAULT 分区，大库通过 kms.promote_kb_chunk_partition()
+-- 迁出为独立分区。带 kb_id 过滤的 ANN 查询只扫描命中分区的 HNSW 索引，
+-- 避免全局图遍历返回的近邻大多被过滤掉。
 CREATE TABLE kms.document_chunks (
-    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
     doc_id UUID REFERENCES kms.documents(id) ON DELETE CASCADE,
-    kb_id UUID NOT NULL, -- Denormalized for partitioning/filtering
+    kb_id UUID NOT NULL, -- Partition Key
     content TEXT NOT NULL,
     embedding VECTOR(1536), -- Dimension matches OpenAI/modern embedding models
     page_idx INT,
     chunk_idx INT,
-    created_at TIMESTAMPTZ DEFAULT NOW()
-);
+    clearance SMALLINT NOT NULL DEFAULT 1, -- 冗余文档密级，检索时在 ANN 查询内过滤
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (id, kb_id)
+) PARTITION BY LIST (kb_id);
+
+CREATE TABLE kms.document_chunks_default PARTITION OF kms.document_chunks DEFAULT;
+
+CREATE INDEX idx_chunks_kb ON kms.document_chunks (kb_id);
+-- Small-to-Big 窗口扩展按 (doc_id, chunk_idx 区间) 批量回表
+CREATE INDEX idx_chunks_doc_idx ON kms.document_chunks (doc_id, chunk_idx);
 
 -- Vector Index (HNSW)
+-- 在分区父表上创建，自动传播到每个分区 (包括之后 ATTACH 的分区)
 CREATE INDEX idx_chunks_embedding ON kms.document_chunks 
 USING hnsw (embedding vector_cosine_ops) 
 WITH (m = 16, ef_construction = 64);
@@ -127,6 +139,37 @@ WITH (m = 16, ef_construction = 64);
 -- Full Text Search Index
 CREATE INDEX idx_chunks_content_fts ON kms.document_chunks USING GIN (to_tsvector('simple', content));
 
+-- 将指定知识库的切片从 DEFAULT 分区迁出为独立分区 (幂等)
+-- ATTACH 时父表上的索引 (HNSW / GIN / B-Tree) 与外键会自动在新分区上建立
+CREATE OR REPLACE FUNCTION kms.promote_kb_chunk_partition(p_kb_id UUID)
+RETURNS TEXT AS $$
+DECLARE
+    part_name TEXT := 'document_chunks_' || replace(p_kb_id::text, '-', '');
+BEGIN
+    -- 串行化同一知识库的并发迁移
+    PERFORM pg_advisory_xact_lock(hashtext(part_name));
+
+    IF to_regclass(format('kms.%I', part_name)) IS NOT NULL THEN
+        RETURN part_name;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE kms.%I (LIKE kms.document_chunks INCLUDING DEFAULTS, CHECK (kb_id = %L))',
+        part_name, p_kb_id
+    );
+    EXECUTE format(
+        'INSERT INTO kms.%I SELECT * FROM kms.document_chunks_default WHERE kb_id = %L',
+        part_name, p_kb_id
+    );
+    DELETE FROM kms.document_chunks_default WHERE kb_id = p_kb_id;
+    EXECUTE format(
+        'ALTER TABLE kms.document_chunks ATTACH PARTITION kms.%I FOR VALUES IN (%L)',
+        part_name, p_kb_id
+    );
+    RETURN part_name;
+END;
+$$ LANGUAGE plpgsql;
+
 ----------------------------------------------------------------
 -- SCHEMA: CHAT (Conversations & RAG)
 ----------------------------------------------------------------
@@ -150,10 +193,52 @@ CREATE TABLE chat.messages (
     content TEXT,
     thought_chain JSONB, -- For Chain-of-Thought
     citations JSONB, -- Provenance
-    tokens_usage INT,
+    tokens_usage INT, -- prompt + completion
+    prompt_tokens INT,
+    completion_tokens INT,
+    latency_ms JSONB, -- {"embed", "retrieve", "generate", "total"}
+    response_json TEXT, -- 完整 QAResponse 的紧凑 JSON (历史回放原样输出)
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
-CREATE INDEX idx_msg_conv_time ON chat.messages (conversation_id, created_at);
+-- 消息历史按 (created_at, id) 游标分页
+CREATE INDEX idx_msg_conv_time ON chat.messages (conversation_id, created_at, id);
+
+-- Semantic Answer Cache
+-- 释义相近的重复提问直接复用已生成回答 (跳过 LLM)，scope_key 包含知识库 Epoch
+CREATE TABLE chat.semantic_cache (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    scope_key VARCHAR(64) NOT NULL,
+    question TEXT NOT NULL,
+    embedding VECTOR(1536) NOT NULL,
+    answer TEXT NOT NULL,
+    thought_chain JSONB,
+    citations JSONB,
+    hit_count INT DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX idx_semcache_embedding ON chat.semantic_cache USING hnsw (embedding vector_cosine_ops);
+CREATE INDEX idx_semcache_scope ON chat.semantic_cache (scope_key);
+CREATE INDEX idx_semcache_expires ON chat.semantic_cache (expires_at);
+
+-- Usage Rollups
+-- 问答资源消耗按 (日期, 用户, 知识库) 日汇总，随问答落库同事务 UPSERT
+CREATE TABLE chat.usage_rollups (
+    day DATE NOT NULL,
+    user_id UUID NOT NULL,
+    kb_id UUID NOT NULL, -- 全零 UUID 为 (day, user_id) 总计行，其余为各知识库行
+    questions INT NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    embedding_tokens BIGINT NOT NULL DEFAULT 0,
+    embed_ms BIGINT NOT NULL DEFAULT 0,
+    retrieve_ms BIGINT NOT NULL DEFAULT 0,
+    generate_ms BIGINT NOT NULL DEFAULT 0,
+    total_ms BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, user_id, kb_id)
+);
+CREATE INDEX idx_usage_user_day ON chat.usage_rollups (user_id, day);
+CREATE INDEX idx_usage_kb_day ON chat.usage_rollups (kb_id, day);
 
 -- Feedback (RLHF)
 CREATE TABLE chat.feedback (
@@ -0,0 +1,50 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+from app.schemas.admin import GlobalSearchConfig
+from app.services import rag_engine as rag_module
+from app.utils.diversity import dedupe_passages, mmr_select
+
+
+def test_dedupe_drops_exact_and_near_duplicates_keeping_first():
+    base = "15式轻型坦克采用1000马力涡轮增压柴油发动机，适应高原环境。"
+    texts = [
+        base,
+        "  " + base + "\n",  # 仅首尾空白不同
+        base + "据公开资料。",  # 近似重复
+        "99A主战坦克装备125毫米滑膛炮。",
+    ]
+    assert dedupe_passages(texts, threshold=0.8) == [0, 3]
+
+
+def test_mmr_prefers_diverse_candidate_over_redundant_one():
+    vectors = [[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]]
+    relevance = [1.0, 0.9, 0.8]
+    assert mmr_select(vectors, relevance, k=2, lambda_mult=0.5) == [0, 2]
+    # λ = 1 时只看相关度
+    assert mmr_select(vectors, relevance, k=2, lambda_mult=1.0) == [0, 1]
+
+
+def test_mmr_without_vectors_keeps_relevance_order():
+    assert mmr_select([None, None, None], [0.9, 0.8, 0.7], k=2) == [0, 1]
+
+
+def test_diversify_fetches_embeddings_only_for_deduped_pool(monkeypatch):
+    chunks = [
+        SimpleNamespace(id=uuid.uuid4(), content=text)
+        for text in ["甲型装甲车参数说明", "甲型装甲车参数说明", "乙型火炮射程说明", "丙型雷达探测距离说明"]
+    ]
+    hits = [(chunk, 1.0 - i * 0.1) for i, chunk in enumerate(chunks)]
+    requested = []
+
+    async def fake_embeddings(db, chunk_ids, kb_ids):
+        requested.extend(chunk_ids)
+        return {chunks[0].id: [1.0, 0.0], chunks[2].id: [0.99, 0.01], chunks[3].id: [0.0, 1.0]}
+
+    monkeypatch.setattr(rag_module.document_crud, "get_chunk_embeddings", fake_embeddings)
+    config = GlobalSearchConfig.model_validate({"diversity": {"enabled": True, "mmrLambda": 0.5}})
+
+    selected = asyncio.run(rag_module.rag_engine._diversify(None, hits, 2, [uuid.uuid4()], config))
+
+    assert requested == [chunks[0].id, chunks[2].id, chunks[3].id]
+    assert [chunk.id for chunk, _ in selected] == [chunks[0].id, chunks[3].id]
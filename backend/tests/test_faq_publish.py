@@ -0,0 +1,59 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+import pytest
+from app.services import admin_service as admin_module
+from app.services.admin_service import admin_service
+from app.services.embedding_service import embedding_service
+
+
+class _FailingEmbeddings:
+    async def create(self, **kwargs):
+        raise RuntimeError("embedding backend down")
+
+
+class _Session:
+    def __init__(self):
+        self.commits = 0
+
+    async def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture
+def faq(monkeypatch):
+    faq = SimpleNamespace(id=uuid.uuid4(), question="15式坦克发动机功率？", status="PENDING", embedding=None)
+
+    async def get_faq(db, faq_id):
+        return faq
+
+    monkeypatch.setattr(admin_module.gov_crud, "get_faq", get_faq)
+    return faq
+
+
+@pytest.mark.parametrize("client", [None, SimpleNamespace(embeddings=_FailingEmbeddings())])
+def test_approve_without_embedding_leaves_vector_empty(monkeypatch, faq, client):
+    monkeypatch.setattr(embedding_service, "client", client)
+    db = _Session()
+
+    assert asyncio.run(admin_service.approve_faq(db, faq.id)) is True
+    assert faq.status == "APPROVED"
+    # 不写入伪随机向量，留空由回填补齐
+    assert faq.embedding is None
+    assert db.commits == 1
+
+
+def test_backfill_stops_when_embedding_unavailable(monkeypatch, faq):
+    monkeypatch.setattr(embedding_service, "client", SimpleNamespace(embeddings=_FailingEmbeddings()))
+    calls = []
+
+    async def get_faqs_without_embedding(db, limit=64):
+        calls.append(limit)
+        return [faq]
+
+    monkeypatch.setattr(admin_module.gov_crud, "get_faqs_without_embedding", get_faqs_without_embedding)
+    db = _Session()
+
+    assert asyncio.run(admin_service.backfill_faq_embeddings(db, batch_size=1)) == 0
+    assert calls == [1]
+    assert faq.embedding is None and db.commits == 0
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import uuid
+from sqlalchemy.dialects import postgresql
+from app.crud.crud_graph import graph_crud
+
+
+def _vertex(vid, name):
+    return json.dumps({"id": vid, "label": "Weapon", "properties": {"name": name}})
+
+
+def _edge(eid, start, end):
+    return json.dumps({"id": eid, "label": "DEVELOPED_BY", "start_id": start, "end_id": end, "properties": {}})
+
+
+class _FakeSession:
+    """
+    依次返回 cypher 查询结果与可访问文档 ID
+    """
+
+    def __init__(self, fact_rows, accessible):
+        self._results = [fact_rows, accessible]
+        self.statements = []
+
+    async def execute(self, stmt, params=None):
+        self.statements.append((stmt, params))
+        rows = self._results.pop(0)
+
+        class _Result:
+            def all(self):
+                return rows
+
+            def scalars(self):
+                return self
+        return _Result()
+
+
+def test_facts_outside_caller_scope_are_dropped():
+    visible, secret = uuid.uuid4(), uuid.uuid4()
+    rows = [
+        (_vertex(1, "15式"), _edge(10, 1, 2), _vertex(2, "北方工业"), json.dumps([str(visible)]), json.dumps([str(visible)])),
+        # 相邻实体仅出现在无权访问的文档中
+        (_vertex(1, "15式"), _edge(11, 1, 3), _vertex(3, "某型发动机"), json.dumps([str(visible)]), json.dumps([str(secret)])),
+        # 无来源文档
+        (_vertex(1, "15式"), _edge(12, 1, 4), _vertex(4, "高原"), json.dumps([str(visible)]), json.dumps([])),
+    ]
+    session = _FakeSession(rows, [visible])
+
+    facts = asyncio.run(graph_crud.search_facts(session, "15式坦克的研制单位", [uuid.uuid4()], 1, limit=10))
+
+    assert [(n.label, e.id, m.label) for n, e, m in facts] == [("15式", "10", "北方工业")]
+
+
+def test_question_is_passed_as_cypher_parameter():
+    session = _FakeSession([], [])
+    asyncio.run(graph_crud.search_facts(session, "15式", [uuid.uuid4()], 2, limit=3))
+
+    stmt, params = session.statements[0]
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    # 问题文本经 agtype 参数映射传入，$$ 字面量内没有 SQL 绑定参数
+    assert set(compiled.params) == {"params", "candidates"}
+    assert "$question" in compiled.string
+    assert json.loads(params["params"]) == {"question": "15式"}
+    assert params["candidates"] == 3 * graph_crud.FACT_CANDIDATE_FACTOR
+
+
+def test_no_knowledge_base_means_no_facts():
+    session = _FakeSession([], [])
+    assert asyncio.run(graph_crud.search_facts(session, "15式", [], 3)) == []
+    assert session.statements == []
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from app.api.v1.endpoints import chat as chat_endpoints
+from app.crud.crud_chat import chat_crud
+
+BASE_TIME = datetime(2024, 5, 1, 8, 0, tzinfo=timezone.utc)
+CONVERSATION_ID = uuid.uuid4()
+
+
+def _messages(count):
+    # 倒序 (最新在前)，与 get_messages 的返回顺序一致
+    return [
+        SimpleNamespace(
+            id=uuid.uuid4(), role="user" if i % 2 else "assistant", content=f"m{i}",
+            created_at=BASE_TIME + timedelta(seconds=i), conversation_id=CONVERSATION_ID,
+            response_json=None, thought_chain=None, citations=None
+        )
+        for i in reversed(range(count))
+    ]
+
+
+def test_cursor_round_trip():
+    message_id = uuid.uuid4()
+    cursor = chat_endpoints._encode_cursor(BASE_TIME, message_id)
+    assert chat_endpoints._decode_cursor(cursor) == (BASE_TIME, message_id)
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm8tc2VwYXJhdG9y", "5pe26Ze0fG5vdC1hLXV1aWQ="])
+def test_invalid_cursor_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        chat_endpoints._decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+def _fetch_page(monkeypatch, stored, limit=None, cursor=None, **params):
+    calls = []
+
+    async def fake_get_session(db, session_id, user_id):
+        return object()
+
+    async def fake_get_messages(db, conversation_id, limit=None, before=None, with_details=False):
+        calls.append((limit, before, with_details))
+        rows = stored
+        if before is not None:
+            rows = [m for m in rows if (m.created_at, m.id) < before]
+        return rows[:limit] if limit is not None else rows
+
+    monkeypatch.setattr(chat_crud, "get_session", fake_get_session)
+    monkeypatch.setattr(chat_crud, "get_messages", fake_get_messages)
+
+    async def main():
+        response = await chat_endpoints.get_messages(
+            uuid.uuid4(), None, SimpleNamespace(id=uuid.uuid4()),
+            limit=limit, cursor=cursor, detail=params.get("detail", True)
+        )
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        return json.loads(body)["data"], response.headers.get(chat_endpoints.NEXT_CURSOR_HEADER)
+
+    data, next_cursor = asyncio.run(main())
+    return data, next_cursor, calls
+
+
+def test_default_returns_full_history_as_list(monkeypatch):
+    stored = _messages(3)
+    stored[0].response_json = '{"answer":"m2","thought_process":[]}'  # 最新一条 (assistant)
+
+    data, next_cursor, calls = _fetch_page(monkeypatch, stored)
+    # 兼容原响应：消息数组，含完整 qaResponse，不分页
+    assert [m["content"] for m in data] == ["m0", "m1", "m2"]
+    assert data[2]["qaResponse"] == {"answer": "m2", "thought_process": []}
+    assert data[1]["qaResponse"] is None  # user 消息
+    assert next_cursor is None
+    assert calls == [(None, None, True)]
+
+
+def test_pages_walk_backwards_until_exhausted(monkeypatch):
+    stored = _messages(5)
+
+    data, cursor, calls = _fetch_page(monkeypatch, stored, limit=2, detail=False)
+    assert [m["content"] for m in data] == ["m3", "m4"]  # 页内按时间正序
+    assert all(m["qaResponse"] is None for m in data)
+    assert calls == [(3, None, False)]
+    assert chat_endpoints._decode_cursor(cursor) == (stored[1].created_at, stored[1].id)
+
+    data, cursor, _ = _fetch_page(monkeypatch, stored, limit=2, cursor=cursor)
+    assert [m["content"] for m in data] == ["m1", "m2"]
+
+    data, cursor, _ = _fetch_page(monkeypatch, stored, limit=2, cursor=cursor)
+    assert [m["content"] for m in data] == ["m0"]
+    assert cursor is None
+
+
+def test_exact_page_has_no_next_cursor(monkeypatch):
+    data, cursor, _ = _fetch_page(monkeypatch, _messages(2), limit=2)
+    assert len(data) == 2
+    assert cursor is None
+
+
+def test_get_messages_query_uses_row_comparison_and_defers_details():
+    class _CapturingSession:
+        statement = None
+
+        async def execute(self, stmt):
+            self.statement = stmt
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: []))
+
+    session = _CapturingSession()
+    asyncio.run(chat_crud.get_messages(session, uuid.uuid4(), limit=3, before=(BASE_TIME, uuid.uuid4())))
+    sql = str(session.statement.compile(dialect=postgresql.dialect()))
+
+    assert "(chat.messages.created_at, chat.messages.id) < (" in sql
+    assert "ORDER BY chat.messages.created_at DESC, chat.messages.id DESC" in sql
+    assert "response_json" not in sql
+    assert "thought_chain" not in sql
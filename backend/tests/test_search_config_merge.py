@@ -0,0 +1,48 @@
+import uuid
+from app.schemas.admin import GlobalSearchConfig
+from app.schemas.chat import ChatConfig
+from app.services.rag_engine import rag_engine
+
+
+def _global_config() -> GlobalSearchConfig:
+    return GlobalSearchConfig.model_validate({
+        "strategy": "vector",
+        "tiers": {"faq": False, "graph": False, "docs": True, "llm": True},
+        "enhanced": {"queryRewrite": True, "multiQuery": True, "hyde": True, "stepback": False},
+    })
+
+
+def test_no_chat_config_keeps_global():
+    global_config = _global_config()
+    assert rag_engine._resolve_search_config(global_config, None) is global_config
+
+
+def test_only_kb_selection_keeps_global_switches():
+    resolved = rag_engine._resolve_search_config(
+        _global_config(), ChatConfig(selected_kb_ids=[uuid.uuid4()])
+    )
+    assert resolved.strategy == "vector"
+    assert resolved.tiers.faq is False
+    assert resolved.enhanced.multiQuery is True
+    assert resolved.enhanced.hyde is True
+
+
+def test_nested_fields_merge_individually():
+    chat_config = ChatConfig.model_validate({
+        "selected_kb_ids": [str(uuid.uuid4())],
+        "tiers": {"graph": True},
+        "enhanced": {"hyde": False},
+    })
+    resolved = rag_engine._resolve_search_config(_global_config(), chat_config)
+    assert resolved.tiers.model_dump() == {"faq": False, "graph": True, "docs": True, "llm": True}
+    assert resolved.enhanced.multiQuery is True
+    assert resolved.enhanced.hyde is False
+    # 数值参数不受请求影响
+    assert resolved.parameters == _global_config().parameters
+
+
+def test_explicit_strategy_overrides():
+    chat_config = ChatConfig(selected_kb_ids=[], strategy="keyword")
+    resolved = rag_engine._resolve_search_config(_global_config(), chat_config)
+    assert resolved.strategy == "keyword"
+    assert resolved.enhanced.multiQuery is True
@@ -0,0 +1,187 @@
+import asyncio
+import pytest
+from app.services import singleflight as singleflight_module
+from app.services.singleflight import SingleFlight
+
+
+class FakeCache:
+    """
+    进程内模拟 Redis：available=False 时模拟 Redis 不可用 (set_nx 返回 None)
+    """
+
+    def __init__(self, available=True):
+        self.available = available
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, expire=3600):
+        self.data[key] = value
+
+    async def set_nx(self, key, value, expire):
+        if not self.available:
+            return None
+        if key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def fake_cache(monkeypatch):
+    fake = FakeCache()
+    monkeypatch.setattr(singleflight_module, "cache", fake)
+    monkeypatch.setattr(SingleFlight, "POLL_INTERVAL", 0.01)
+    return fake
+
+
+def test_concurrent_identical_requests_share_leader_result(fake_cache):
+    flights = SingleFlight()
+
+    async def main():
+        leader, shared = await flights.acquire("k")
+        assert leader is not None and shared is None
+        followers = [asyncio.create_task(flights.acquire("k")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        await leader.publish({"answer": "42"})
+        return await asyncio.gather(*followers)
+
+    results = asyncio.run(main())
+    assert results == [(None, {"answer": "42"})] * 3
+    # 结果写入共享结果键，锁已释放，本地 Future 已移除
+    assert fake_cache.data == {SingleFlight.RESULT_PREFIX + "k": {"answer": "42"}}
+    assert flights._local == {}
+
+
+def test_abandoned_leader_releases_followers_to_compute(fake_cache):
+    flights = SingleFlight()
+
+    async def main():
+        leader, _ = await flights.acquire("k")
+        follower = asyncio.create_task(flights.acquire("k"))
+        await asyncio.sleep(0.01)
+        await leader.abandon()
+        return await follower
+
+    flight, shared = asyncio.run(main())
+    assert shared is None
+    assert flight is not None
+    assert SingleFlight.LOCK_PREFIX + "k" not in fake_cache.data
+
+
+def test_remote_leader_result_is_polled(fake_cache):
+    flights = SingleFlight()
+    fake_cache.data[SingleFlight.LOCK_PREFIX + "k"] = "1"
+
+    async def main():
+        waiter = asyncio.create_task(flights.acquire("k"))
+        await asyncio.sleep(0.03)
+        fake_cache.data[SingleFlight.RESULT_PREFIX + "k"] = {"answer": "remote"}
+        del fake_cache.data[SingleFlight.LOCK_PREFIX + "k"]
+        return await waiter
+
+    assert asyncio.run(main()) == (None, {"answer": "remote"})
+
+
+def test_remote_leader_failure_falls_back_to_local_compute(fake_cache):
+    flights = SingleFlight()
+    fake_cache.data[SingleFlight.LOCK_PREFIX + "k"] = "1"
+
+    async def main():
+        waiter = asyncio.create_task(flights.acquire("k"))
+        await asyncio.sleep(0.03)
+        del fake_cache.data[SingleFlight.LOCK_PREFIX + "k"]
+        return await waiter
+
+    flight, shared = asyncio.run(main())
+    assert shared is None and flight is not None
+
+
+def test_without_redis_only_local_coalescing(fake_cache):
+    fake_cache.available = False
+    flights = SingleFlight()
+
+    async def main():
+        leader, _ = await flights.acquire("k")
+        follower = asyncio.create_task(flights.acquire("k"))
+        await asyncio.sleep(0.01)
+        await leader.publish({"answer": "local"})
+        return await follower
+
+    assert asyncio.run(main()) == (None, {"answer": "local"})
+    # 未持有锁时不写共享结果
+    assert fake_cache.data == {}
+
+
+def test_follower_thought_chain_excludes_leader_user_steps(monkeypatch):
+    import uuid
+    from types import SimpleNamespace
+    from app.schemas.admin import GlobalSearchConfig
+    from app.schemas.chat import ChatConfig, ChatMessageCreate
+    from app.services import rag_engine as rag_module
+    from app.services.history_manager import ConversationHistory
+
+    kb_id = uuid.uuid4()
+    config = GlobalSearchConfig.model_validate({
+        "tiers": {"faq": False, "graph": False, "docs": False, "llm": False},
+        "semanticCache": {"enabled": False},
+    })
+    saved = {}
+
+    async def get_config(db):
+        return config
+
+    async def filter_authorized_kb_ids(db, user, kb_ids):
+        return list(kb_ids)
+
+    async def load(db, conversation_id):
+        return ConversationHistory()
+
+    async def build_key(query, kb_ids, clearance, search_config):
+        return "same-question"
+
+    original_run = rag_module.tier_orchestrator.run
+
+    async def slow_run(*args, **kwargs):
+        # 领头请求在召回阶段停留，使跟随者在其发布结果前加入合并
+        await asyncio.sleep(0.05)
+        return await original_run(*args, **kwargs)
+
+    async def save_exchange(db, conversation_id, question, answer, asked_at, thought_chain, **kwargs):
+        saved[conversation_id] = thought_chain
+
+    monkeypatch.setattr(singleflight_module, "cache", FakeCache(available=False))
+    monkeypatch.setattr(rag_module.search_config_service, "get_config", get_config)
+    monkeypatch.setattr(rag_module.document_crud, "filter_authorized_kb_ids", filter_authorized_kb_ids)
+    monkeypatch.setattr(rag_module.history_manager, "load", load)
+    monkeypatch.setattr(rag_module.history_manager, "refresh_later", lambda conversation_id: None)
+    monkeypatch.setattr(rag_module.singleflight, "build_key", build_key)
+    monkeypatch.setattr(rag_module.tier_orchestrator, "run", slow_run)
+    monkeypatch.setattr(rag_module.chat_crud, "save_exchange", save_exchange)
+
+    leader_user = SimpleNamespace(id=uuid.uuid4(), username="leader", clearance_level=1)
+    follower_user = SimpleNamespace(id=uuid.uuid4(), username="follower", clearance_level=1)
+    leader_conv, follower_conv = uuid.uuid4(), uuid.uuid4()
+    query_in = ChatMessageCreate(query="15式坦克发动机功率", config=ChatConfig(selected_kb_ids=[kb_id]))
+
+    async def main():
+        leader = asyncio.create_task(
+            rag_module.rag_engine.process_query(None, leader_user, leader_conv, query_in)
+        )
+        await asyncio.sleep(0.01)
+        follower = await rag_module.rag_engine.process_query(None, follower_user, follower_conv, query_in)
+        await leader
+        return follower
+
+    response = asyncio.run(main())
+
+    chain = saved[follower_conv]
+    titles = [step["title"] for step in chain]
+    assert titles == ["安全围栏检查", "请求合并", "证据直出"]
+    assert "follower" in chain[0]["content"]
+    assert all("leader" not in step["content"] for step in chain)
+    assert [step.title for step in response.thought_process] == titles
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from app.api import streaming
+from app.api.streaming import cancel_on_disconnect
+
+
+class FakeRequest:
+    url = SimpleNamespace(path="/test")
+
+    def __init__(self, disconnect_after: float):
+        self._deadline = time.monotonic() + disconnect_after
+
+    async def is_disconnected(self) -> bool:
+        return time.monotonic() > self._deadline
+
+
+def test_forwards_all_events(monkeypatch):
+    async def source():
+        for i in range(5):
+            yield i
+
+    async def main():
+        return [item async for item in cancel_on_disconnect(FakeRequest(60), source())]
+
+    assert asyncio.run(main()) == [0, 1, 2, 3, 4]
+
+
+def test_upstream_error_propagates():
+    async def source():
+        yield 1
+        raise ValueError("boom")
+
+    async def main():
+        items = []
+        try:
+            async for item in cancel_on_disconnect(FakeRequest(60), source()):
+                items.append(item)
+        except ValueError as e:
+            return items, str(e)
+
+    assert asyncio.run(main()) == ([1], "boom")
+
+
+def test_disconnect_cancels_and_waits_for_upstream_cleanup(monkeypatch):
+    monkeypatch.setattr(streaming, "DISCONNECT_POLL_SECONDS", 0.01)
+    log = []
+
+    async def source():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield "token"
+        finally:
+            await asyncio.sleep(0.02)
+            log.append("upstream cleaned")
+
+    async def main():
+        items = [item async for item in cancel_on_disconnect(FakeRequest(0.05), source())]
+        log.append("consumer done")
+        return items
+
+    items = asyncio.run(main())
+    assert 0 < len(items) < 50
+    assert log == ["upstream cleaned", "consumer done"]
+
+
+def test_disconnect_closes_upstream_blocked_on_slow_consumer(monkeypatch):
+    monkeypatch.setattr(streaming, "DISCONNECT_POLL_SECONDS", 0.01)
+    log = []
+
+    async def source():
+        try:
+            i = 0
+            while True:
+                # 不主动让出：上游停在 yield 处，由生产者阻塞在队列写入上
+                yield i
+                i += 1
+        finally:
+            log.append("upstream cleaned")
+
+    async def main():
+        items = []
+        async for item in cancel_on_disconnect(FakeRequest(0.05), source()):
+            items.append(item)
+            await asyncio.sleep(0.03)
+        log.append("consumer done")
+        return items
+
+    items = asyncio.run(main())
+    assert items
+    assert log == ["upstream cleaned", "consumer done"]
@@ -0,0 +1,94 @@
+import asyncio
+from app.db.session import budgeted_session, start_session_budget
+from app.services.tier_orchestrator import tier_orchestrator
+
+
+def _tier(value, delay, log=None, name=None):
+    async def run():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(name)
+            raise
+        return value
+    return run
+
+
+def test_decisive_hit_cancels_remaining_tiers():
+    cancelled = []
+
+    async def main():
+        return await tier_orchestrator.run(
+            {"faq": _tier("answer", 0.01), "docs": _tier(["chunk"], 5, cancelled, "docs")},
+            budget=5,
+            decisive={"faq": lambda v: v is not None},
+        )
+
+    run = asyncio.run(main())
+    assert run.winner == "faq"
+    assert run.value("faq") == "answer"
+    assert run.outcomes["docs"].status == "cancelled"
+    assert run.value("docs") is None
+    assert cancelled == ["docs"]
+
+
+def test_lower_priority_hit_waits_for_higher_priority_tier():
+    async def main():
+        return await tier_orchestrator.run(
+            {"faq": _tier(None, 0.05), "cache": _tier("cached", 0.01), "docs": _tier(["chunk"], 0.02)},
+            budget=5,
+            decisive={"faq": lambda v: v is not None, "cache": lambda v: v is not None},
+        )
+
+    run = asyncio.run(main())
+    # FAQ 完成且未命中后才采用缓存命中
+    assert run.winner == "cache"
+    assert run.outcomes["faq"].status == "ok"
+    assert run.outcomes["cache"].status == "hit"
+
+
+def test_budget_exhausted_skips_slow_tiers():
+    async def main():
+        return await tier_orchestrator.run(
+            {"faq": _tier(None, 0.01), "docs": _tier(["chunk"], 5)},
+            budget=0.1,
+            decisive={"faq": lambda v: v is not None},
+        )
+
+    run = asyncio.run(main())
+    assert run.winner is None
+    assert run.outcomes["faq"].status == "ok"
+    assert run.outcomes["docs"].status == "timeout"
+
+
+def test_failed_tier_does_not_abort_run():
+    async def broken():
+        raise RuntimeError("boom")
+
+    async def main():
+        return await tier_orchestrator.run({"graph": broken, "docs": _tier(["chunk"], 0.01)}, budget=5)
+
+    run = asyncio.run(main())
+    assert run.outcomes["graph"].status == "failed"
+    assert run.outcomes["graph"].error == "boom"
+    assert run.value("docs") == ["chunk"]
+
+
+def test_session_budget_caps_concurrent_sessions():
+    active, peak = 0, 0
+
+    async def use_session():
+        nonlocal active, peak
+        async with budgeted_session():
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    async def main():
+        start_session_budget(2)
+        await asyncio.gather(*[use_session() for _ in range(6)])
+
+    asyncio.run(main())
+    assert peak == 2
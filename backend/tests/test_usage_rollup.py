@@ -0,0 +1,56 @@
+import uuid
+from datetime import date
+from sqlalchemy.dialects import postgresql
+from app.core.llm.usage import UsageMeter
+from app.crud.crud_chat import USAGE_TOTAL_KB_ID, chat_crud
+
+
+def _meter(kb_ids):
+    meter = UsageMeter(user_id=uuid.uuid4(), kb_ids=kb_ids, prompt_tokens=100, completion_tokens=20)
+    meter.add_stage("generate", 300)
+    meter.add_stage("total", 500)
+    return meter
+
+
+def test_multi_kb_question_counted_once_in_total_row():
+    kb_a, kb_b, kb_c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    rows = chat_crud._usage_rollup_rows(date(2024, 5, 1), _meter([kb_a, kb_b, kb_c, kb_a]))
+
+    totals = [r for r in rows if r["kb_id"] == USAGE_TOTAL_KB_ID]
+    per_kb = [r for r in rows if r["kb_id"] != USAGE_TOTAL_KB_ID]
+    assert len(totals) == 1
+    assert totals[0]["questions"] == 1
+    assert totals[0]["prompt_tokens"] == 100
+    assert totals[0]["total_ms"] == 500
+    assert {r["kb_id"] for r in per_kb} == {kb_a, kb_b, kb_c}
+
+
+def test_question_without_kb_writes_only_total_row():
+    rows = chat_crud._usage_rollup_rows(date(2024, 5, 1), _meter([]))
+    assert [r["kb_id"] for r in rows] == [USAGE_TOTAL_KB_ID]
+
+
+class _CapturingSession:
+    def __init__(self):
+        self.statement = None
+
+    async def execute(self, stmt):
+        self.statement = stmt
+
+        class _Result:
+            def all(self):
+                return []
+        return _Result()
+
+
+def _summary_sql(group_by: str) -> str:
+    import asyncio
+    session = _CapturingSession()
+    asyncio.run(chat_crud.get_usage_summary(session, group_by, date(2024, 5, 1), date(2024, 5, 31)))
+    return str(session.statement.compile(dialect=postgresql.dialect()))
+
+
+def test_summary_filters_total_rows_by_grouping():
+    assert "chat.usage_rollups.kb_id = " in _summary_sql("user")
+    assert "chat.usage_rollups.kb_id = " in _summary_sql("day")
+    assert "chat.usage_rollups.kb_id != " in _summary_sql("kb")